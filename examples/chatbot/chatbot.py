@@ -70,8 +70,7 @@ else:
 #
 
 kernal = AIKernal.from_ini_file()
-for skill in kernal.all_skills:
-    kernal.consult_skill (skill)
+kernal.setup_skills()
 kernal.setup_nlp_model()
 ctx  = kernal.create_context()
 logging.debug ('AI kernal initialized.')
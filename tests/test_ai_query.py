@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# Copyright 2018 Guenter Bartsch
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import unittest
+import logging
+
+from zamiaai.ai_query import Var, pl_quote, pl_float, pl_arg, pl_goal, pl_functors, pl_atom_goals, pl_variables
+
+class TestAIQuery (unittest.TestCase):
+
+    def test_quote(self):
+
+        self.assertEqual (pl_quote(u"wdeBerlin"),       u"'wdeBerlin'")
+        self.assertEqual (pl_quote(u"O'Brien"),         u"'O''Brien'")
+        self.assertEqual (pl_quote(u"C:\\temp"),        u"'C:\\\\temp'")
+        self.assertEqual (pl_quote(u"\\'"),             u"'\\\\'''")
+        self.assertEqual (pl_quote(u"Müller"),          u"'Müller'")
+        self.assertEqual (pl_quote(u"a, b). evil(X"),   u"'a, b). evil(X'")
+
+    def test_var(self):
+
+        self.assertEqual (Var().name, u'_')
+        self.assertEqual (Var('L').name, u'L')
+        self.assertEqual (Var('_Tmp').name, u'_Tmp')
+
+        with self.assertRaises(Exception):
+            Var('l')
+        with self.assertRaises(Exception):
+            Var('X), evil(Y')
+
+    def test_float(self):
+
+        self.assertEqual (pl_float(1.5),     u'1.5')
+        self.assertEqual (pl_float(-2.0),    u'-2.0')
+        self.assertEqual (pl_float(1e20),    u'1.0e20')
+        self.assertEqual (pl_float(1e-7),    u'1.0e-07')
+        self.assertEqual (pl_float(2.5e-300), u'2.5e-300')
+
+        with self.assertRaises(Exception):
+            pl_float(float('inf'))
+        with self.assertRaises(Exception):
+            pl_float(float('-inf'))
+        with self.assertRaises(Exception):
+            pl_float(float('nan'))
+
+    def test_arg(self):
+
+        self.assertEqual (pl_arg(Var('X')),          u'X')
+        self.assertEqual (pl_arg(u"de"),             u"'de'")
+        self.assertEqual (pl_arg(True),              u'true')
+        self.assertEqual (pl_arg(False),             u'false')
+        self.assertEqual (pl_arg(42),                u'42')
+        self.assertEqual (pl_arg(-7),                u'-7')
+        self.assertEqual (pl_arg(1e20),              u'1.0e20')
+        self.assertEqual (pl_arg([1, u'a', Var()]),  u"[1, 'a', _]")
+        self.assertEqual (pl_arg((u"x", [2.5])),     u"['x', [2.5]]")
+        self.assertEqual (pl_arg([]),                u'[]')
+
+        with self.assertRaises(Exception):
+            pl_arg(None)
+
+    def test_goal(self):
+
+        self.assertEqual (pl_goal('rdfsLabel', [u'wdeBerlin', u'en', Var('L')]), u"rdfsLabel('wdeBerlin', 'en', L)")
+        self.assertEqual (pl_goal('rdfsLabel', [u'wdeParis', u'de', Var('L')]),  u"rdfsLabel('wdeParis', 'de', L)")
+        self.assertEqual (pl_goal('rdfsLabel', [Var('E'), u'de', u"it's"]),      u"rdfsLabel(E, 'de', 'it''s')")
+
+        # values containing format characters must not interfere with the cached template
+
+        self.assertEqual (pl_goal('label', [u'100%s', Var('X')]),                u"label('100%s', X)")
+
+        # functors that are no plain atoms are quoted
+
+        self.assertEqual (pl_goal('Foo', [1]),                                   u"'Foo'(1)")
+        self.assertEqual (pl_goal('a%b', [1]),                                   u"'a%b'(1)")
+        self.assertEqual (pl_goal('halt', []),                                   u'halt')
+
+    def test_functors(self):
+
+        self.assertEqual (pl_functors(u"rdfsLabel(X, en, L), wdpdAuthor(X, Y)."), set(['rdfsLabel', 'wdpdAuthor']))
+        self.assertEqual (pl_functors(u"once((age(X, 42)))."),                     set(['once', 'age']))
+
+        # functors inside quoted atoms and strings are no calls
+
+        self.assertEqual (pl_functors(u"label(X, 'evil(Y)', \"bad(Z)\")."),       set(['label']))
+        self.assertEqual (pl_functors(u"label(X, 'it''s ok(1)')."),                set(['label']))
+
+        # variables are no functors
+
+        self.assertEqual (pl_functors(u"call(G), X = f(1)."),                      set(['call', 'f']))
+
+    def test_atom_goals(self):
+
+        meta = set(['once', 'findall'])
+
+        self.assertEqual (pl_atom_goals(u"foo.", meta),                                set(['foo']))
+        self.assertEqual (pl_atom_goals(u"rdfsLabel(X, en, L).", meta),                set())
+        self.assertEqual (pl_atom_goals(u"rdfsLabel(X, en, L), dyn.", meta),           set(['dyn']))
+        self.assertEqual (pl_atom_goals(u"once((a, b ; c)).", meta),                   set(['a', 'b', 'c']))
+        self.assertEqual (pl_atom_goals(u"findall(X, (p(X), q), L).", meta),           set(['q']))
+        self.assertEqual (pl_atom_goals(u"(a -> b ; c).", meta),                       set(['a', 'b', 'c']))
+        self.assertEqual (pl_atom_goals(u"X = foo, \\+ bar.", meta),                   set(['bar']))
+
+        # arguments of other predicates, numbers and quoted atoms are no goals
+
+        self.assertEqual (pl_atom_goals(u"p((a, b)), q(a(b), c).", meta),              set())
+        self.assertEqual (pl_atom_goals(u"x(1.5e10, y), label(X, 'foo').", meta),      set())
+
+    def test_variables(self):
+
+        self.assertEqual (pl_variables(u"rdfsLabel(X, en, L), foo(L, Y, _, _Z)."), [u'X', u'L', u'Y', u'_Z'])
+        self.assertEqual (pl_variables(u"label(X, 'Angela Merkel', \"Text\")."),   [u'X'])
+        self.assertEqual (pl_variables(u"label(wdeBerlin, en, 'X')."),             [])
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.ERROR)
+
+    unittest.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# Copyright 2018 Guenter Bartsch
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import unittest
+import logging
+
+from zamiaai.ai_stats import LatencyHistogram, StageStats, LATENCY_BUCKETS, query_pattern, PrologProfiler, CodeStats
+
+class TestStageStats (unittest.TestCase):
+
+    def test_histogram_buckets(self):
+
+        h = LatencyHistogram()
+
+        h.add(0.0005)   # first bucket
+        h.add(0.001)    # upper bounds are inclusive
+        h.add(0.003)    # <= 0.005
+        h.add(100.0)    # overflow bucket
+
+        self.assertEqual (h.count, 4)
+        self.assertEqual (h.buckets[0], 2)
+        self.assertEqual (h.buckets[LATENCY_BUCKETS.index(0.005)], 1)
+        self.assertEqual (h.buckets[-1], 1)
+        self.assertEqual (sum(h.buckets), 4)
+        self.assertEqual (h.max, 100.0)
+        self.assertAlmostEqual (h.avg(), (0.0005+0.001+0.003+100.0)/4)
+
+    def test_histogram_empty(self):
+        self.assertEqual (LatencyHistogram().avg(), 0.0)
+
+    def test_stage_stats(self):
+
+        s = StageStats()
+
+        s.record('lookup', 0.002)
+        s.record('lookup', 0.004)
+        s.record('total', 0.01)
+        s.record('custom', 0.01)
+        s.count_path('exact')
+        s.count_path('exact')
+        s.count_path('nn')
+
+        self.assertEqual (s.stages['lookup'].count, 2)
+        self.assertEqual (s.paths['exact'], 2)
+        self.assertEqual (s.paths['nn'], 1)
+        self.assertEqual (s.paths['eliza'], 0)
+
+        lines = s.report()
+
+        # header, known stages in PROCESS_STAGES order, unknown stages after them, path counters
+
+        self.assertTrue (lines[1].startswith('lookup'))
+        self.assertTrue (lines[2].startswith('total'))
+        self.assertTrue (lines[3].startswith('custom'))
+        self.assertTrue ('66.7%' in [l for l in lines if l.startswith('path exact')][0])
+
+        s.reset()
+        self.assertEqual (s.stages, {})
+        self.assertEqual (s.paths['exact'], 0)
+
+class TestPrologProfiler (unittest.TestCase):
+
+    def test_query_pattern(self):
+
+        self.assertEqual (query_pattern(u"rdfsLabel(wdeAngelaMerkel, en, L)."), u"rdfsLabel(_, _, L).")
+        self.assertEqual (query_pattern(u"age(X, 42), X is 3 mod 2"), u"age(X, _), X is _ mod _")
+        self.assertEqual (query_pattern(u"label(X, 'Angela (Merkel)', \"text\")"), u"label(X, _, _)")
+        self.assertEqual (query_pattern(u"x(1.5e10, _Y)"), u"x(_, _Y)")
+
+        # same pattern for different constants
+
+        self.assertEqual (query_pattern(u"rdfsLabel(wdeBerlin, de, L)."), query_pattern(u"rdfsLabel(wdeParis,  en, L)."))
+
+    def test_profiler(self):
+
+        p = PrologProfiler()
+
+        p.record(u"rdfsLabel(wdeBerlin, de, L).", 'geo',  0.002, 1)
+        p.record(u"rdfsLabel(wdeParis, en, L).",  'geo',  0.004, 3)
+        p.record(u"rdfsLabel(wdeParis, en, L).",  None,   0.001, 0)
+        p.record(u"age(X, 42).",                  'bio',  0.1,   2)
+        p.record(u"age(X, 42).",                  'bio',  0.0,   2, cached=True)
+
+        self.assertEqual (len(p.patterns), 2)
+
+        st = p.patterns[u"rdfsLabel(_, _, L)."]
+        self.assertEqual (st.count, 3)
+        self.assertEqual (st.solutions, 4)
+        self.assertAlmostEqual (st.max, 0.004)
+        self.assertEqual (sorted(p.callers[u"rdfsLabel(_, _, L)."]), ['?', 'geo'])
+
+        # query cache hits are calls as well, counted separately
+
+        self.assertEqual (p.patterns[u"age(X, _)."].count,  2)
+        self.assertEqual (p.patterns[u"age(X, _)."].cached, 1)
+        self.assertEqual (p.callers[u"age(X, _)."]['bio'].cached, 1)
+        self.assertEqual (st.cached, 0)
+
+        # most expensive pattern first, limit
+
+        lines = p.report(limit=1)
+        self.assertTrue (lines[0].endswith(u'age(X, _).'))
+        self.assertEqual (len(lines), 2)
+
+        p.reset()
+        self.assertEqual (p.report(), [])
+
+class TestCodeStats (unittest.TestCase):
+
+    def test_code_stats(self):
+
+        locations = {'md5a': ('weather', 'weather.py', 42)}
+
+        def locate(md5s):
+            return locations.get(md5s, (None, '?', 0))
+
+        cs = CodeStats()
+
+        cs.record('md5a', 0.010, 1)
+        cs.record('md5a', 0.030, 0)
+        cs.record('md5b', 0.001, 2)
+
+        self.assertEqual (cs.code['md5a'].count, 2)
+        self.assertEqual (cs.code['md5a'].solutions, 1)
+
+        # slowest snippet (by total time) first, located by md5s
+
+        lines = cs.report(locate)
+        self.assertEqual (len(lines), 2)
+        self.assertTrue (u'md5a' in lines[0] and u'weather.py:42' in lines[0])
+        self.assertTrue (u'md5b' in lines[1] and u'?:0' in lines[1])
+
+        self.assertEqual (len(cs.report(locate, limit=1)), 1)
+
+        cs.reset()
+        self.assertEqual (cs.report(locate), [])
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.ERROR)
+
+    unittest.main()
@@ -0,0 +1,535 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# Copyright 2018 Guenter Bartsch
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+#
+# kernal prolog interface tests, run against a tiny skill written to a temp dir.
+# the XSB session is process-global, so all tests share one kernal.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+import logging
+import codecs
+
+from pyxsb               import pyxsb_command, xsb_to_json, XSBAtom
+from zamiaai             import model
+from zamiaai.ai_kernal   import AIKernal
+from zamiaai.mem_backend import LocalMemBackend
+from zamiaai.lru_cache   import LRUCache
+
+UNITTEST_SKILL = 'kernaltest'
+
+SKILL_INIT = u"""
+from kernaltest import util
+
+DEPENDS    = [ ]
+
+PL_SOURCES = [ 'facts' ]
+
+STATIC_PREDICATES = [ 'num', 'rdfsLabel' ]
+"""
+
+SKILL_FACTS = u"""
+num(1).
+num(2).
+num(3).
+
+rdfsLabel(wdeBerlin,   en, "Berlin").
+rdfsLabel(wdeBerlin,   de, "Berlin").
+rdfsLabel(wdeBerlinNH, en, "Berlin").
+rdfsLabel(wdeMunich,   en, "Munich").
+rdfsLabel(wdeMunich,   de, "München").
+
+:- dynamic(flag/0).
+flag.
+"""
+
+SKILL_UTIL = u"""
+VALUE = 1
+"""
+
+LAZY_SKILL = 'kernaltestlazy'
+
+LAZY_INIT = u"""
+DEPENDS    = [ ]
+
+PL_SOURCES = [ 'lazy' ]
+"""
+
+LAZY_FACTS = u"""
+lazyfact(42).
+"""
+
+SKILL_FILES = { UNITTEST_SKILL + '/__init__.py' : SKILL_INIT,
+                UNITTEST_SKILL + '/facts.pl'    : SKILL_FACTS,
+                UNITTEST_SKILL + '/util.py'     : SKILL_UTIL,
+                LAZY_SKILL     + '/__init__.py' : LAZY_INIT,
+                LAZY_SKILL     + '/lazy.pl'     : LAZY_FACTS }
+
+tmpdir = None
+kernal = None
+
+class NNModel(object):
+
+    """ the part of the NLP models nn_predict uses, counts predictions """
+
+    def __init__(self):
+        self.version = 1
+        self.inputs  = []
+
+    def predict_batch(self, inputs, beam_width=1):
+        self.inputs.extend(inputs)
+        return [[(-0.5, [u'md5%d' % self.version, u'_STOP'])] for inp in inputs]
+
+def write_skill_file(fn, src):
+    with codecs.open(os.path.join(tmpdir, fn), 'w', 'utf8') as f:
+        f.write(src)
+
+def setUpModule():
+
+    global tmpdir, kernal
+
+    tmpdir = tempfile.mkdtemp()
+
+    for skill_name in [UNITTEST_SKILL, LAZY_SKILL]:
+        os.makedirs(os.path.join(tmpdir, skill_name))
+    for fn in SKILL_FILES:
+        write_skill_file(fn, SKILL_FILES[fn])
+
+    # PL_SOURCES entries come without extension: consulted through the KB cache
+
+    kernal = AIKernal(db_url       = 'sqlite:///%s/kernal.db' % tmpdir,
+                      toplevel     = UNITTEST_SKILL,
+                      skill_paths  = [tmpdir],
+                      kb_cache_dir = os.path.join(tmpdir, 'kb_cache'))
+
+    kernal.consult_skill(UNITTEST_SKILL)
+
+def tearDownModule():
+    shutil.rmtree(tmpdir)
+
+class TestKernal (unittest.TestCase):
+
+    def test_query_limit(self):
+
+        self.assertEqual (len(kernal.prolog_query_limit(u'num(X).', 2)), 2)
+        self.assertEqual (len(kernal.prolog_query_limit(u'num(X).', 5)), 3)
+        self.assertEqual (kernal.prolog_query_limit(u'num(X).', 0), [])
+
+    def test_query_limit_nested(self):
+
+        # the inner zamia_limit must not reset the solution counter of the outer one
+
+        res = kernal.prolog_query(u'zamia_limit(2, (num(X), zamia_limit(1, num(Y)))).')
+
+        self.assertEqual ([r[0] for r in res], [1, 2])
+        self.assertEqual ([r[1] for r in res], [1, 1])
+
+        res = kernal.prolog_query(u'zamia_limit(1, (num(X), zamia_limit(2, num(Y)))).')
+
+        self.assertEqual (len(res), 1)
+
+    def test_static_query(self):
+
+        self.assertTrue  (kernal._is_static_query(u'num(X).'))
+        self.assertTrue  (kernal._is_static_query(u'once((num(X), X > 1)).'))
+        self.assertTrue  (kernal._is_static_query(u'findall(X, num(X), L).'))
+        self.assertTrue  (kernal._is_static_query(u'num(X), true.'))
+
+        self.assertFalse (kernal._is_static_query(u'flag.'))
+        self.assertFalse (kernal._is_static_query(u'num(X), flag.'))
+        self.assertFalse (kernal._is_static_query(u'once((flag ; num(X))).'))
+        self.assertFalse (kernal._is_static_query(u'num(X), other(X).'))
+
+    def test_query_cache(self):
+
+        kernal.query_cache_clear()
+        kernal.query_cache.reset_stats()
+
+        res = kernal.prolog_query(u'num(X).')
+        self.assertEqual (len(res), 3)
+        self.assertEqual (kernal.prolog_query(u'num(X).'), res)
+        self.assertEqual (kernal.query_cache.hits, 1)
+
+        # dynamic goals are never cached
+
+        kernal.prolog_query(u'num(X), flag.')
+        kernal.prolog_query(u'num(X), flag.')
+        self.assertEqual (kernal.query_cache.hits, 1)
+
+        # clearing works on an empty cache as well
+
+        kernal.query_cache_clear()
+        self.assertEqual (len(kernal.query_cache), 0)
+        kernal.prolog_query(u'num(X).')
+        self.assertEqual (kernal.query_cache.hits, 1)
+
+    def test_prolog_profile(self):
+
+        kernal.query_cache_clear()
+        kernal.prolog_profile_reset()
+        kernal.prolog_profile()
+
+        try:
+            kernal.prolog_query(u'num(X).')
+            kernal.prolog_query(u'num(X).')
+            kernal.prolog_query(u'num(X), flag.')
+        finally:
+            kernal.prolog_profile(False)
+
+        # cache hits are profiled too
+
+        st = kernal.prolog_profiler.patterns[u'num(X).']
+        self.assertEqual (st.count,     2)
+        self.assertEqual (st.cached,    1)
+        self.assertEqual (st.solutions, 6)
+
+        self.assertEqual (kernal.prolog_profiler.patterns[u'num(X), flag.'].cached, 0)
+
+        kernal.prolog_profile_reset()
+
+    def test_label_index(self):
+
+        # index and plain queries must give the same answers
+
+        try:
+            for use_index in [False, True]:
+
+                kernal.use_label_index = use_index
+                kernal.query_cache_clear()
+
+                self.assertEqual (kernal._label_text(kernal.label(u'wdeMunich', u'de')), u'München')
+                self.assertEqual (kernal._label_text(kernal.label(u'wdeMunich', u'en')), u'Munich')
+                self.assertEqual (kernal.label(u'wdeMunich', u'fr'),                      None)
+                self.assertEqual (kernal.label(u'wdeParis',  u'en'),                      None)
+
+                self.assertEqual (kernal.lookup_label_entities(u'Berlin'),  set([u'wdeBerlin', u'wdeBerlinNH']))
+                self.assertEqual (kernal.lookup_label_entities(u'München'), set([u'wdeMunich']))
+                self.assertEqual (kernal.lookup_label_entities(u'Paris'),   set())
+
+            self.assertTrue (kernal.label_index is not None)
+
+            # index is rebuilt after the KB changed
+
+            kernal.query_cache_clear()
+            self.assertEqual (kernal.label_index, None)
+
+        finally:
+            kernal.use_label_index = False
+
+    def test_query_multi(self):
+
+        res = kernal.prolog_query_multi([u'num(X), X > 1.', u'rdfsLabel(wdeMunich, de, L).', u'num(4).'])
+
+        self.assertEqual (len(res), 3)
+        self.assertEqual ([r[0] for r in res[0]], [2, 3])
+        self.assertEqual (kernal._label_text(res[1][0][0]), u'München')
+        self.assertEqual (res[2], [])
+
+        res = kernal.prolog_query_multi([u'num(X).', u'num(4).'], first=True)
+
+        self.assertEqual (res[0][0], 1)
+        self.assertEqual (res[1], None)
+
+        self.assertEqual (kernal.prolog_query_multi([]), [])
+
+    def test_query_multi_fail(self):
+
+        # no solution at all: every query still gets a list of its own
+
+        kernal._pyxsb_query = lambda query: []
+        try:
+            res = kernal.prolog_query_multi([u'num(X).', u'num(Y).'])
+        finally:
+            del kernal._pyxsb_query
+
+        self.assertEqual (res, [[], []])
+        res[0].append(1)
+        self.assertEqual (res[1], [])
+
+    def test_kb_cache(self):
+
+        skill_dir = os.path.join(tmpdir, UNITTEST_SKILL)
+
+        # extensionless source resolved like XSB does (facts -> facts.pl)
+
+        obj = kernal.kb_object(os.path.join(skill_dir, 'facts'))
+        self.assertEqual (obj, kernal.kb_object(os.path.join(skill_dir, 'facts.pl')))
+        self.assertTrue (os.path.exists(obj + '.xwam'))
+        self.assertEqual (kernal.prolog_query_limit(u'num(X).', 5)[0][0], 1)
+
+        with self.assertRaises(Exception):
+            kernal.kb_object(os.path.join(skill_dir, 'nosuchfile'))
+
+        # compiled in place: no object left next to the source
+
+        self.assertFalse (os.path.exists(os.path.join(skill_dir, 'facts.xwam')))
+
+        # included files are part of the cache key
+
+        write_skill_file('inctest.pl', u":- include('inctest_inc.pl').\n")
+        write_skill_file('inctest_inc.pl', u"incfact(1).\n")
+
+        inc_obj = kernal.kb_object(os.path.join(tmpdir, 'inctest'))
+
+        write_skill_file('inctest_inc.pl', u"incfact(2).\n")
+
+        self.assertNotEqual (kernal.kb_object(os.path.join(tmpdir, 'inctest')), inc_obj)
+
+        pyxsb_command(u"consult('%s')." % kernal.kb_object(os.path.join(tmpdir, 'inctest')))
+        self.assertEqual (kernal.prolog_query(u'incfact(X).'), [[2]])
+
+        # stale objects (here also both inctest ones) are pruned, current ones kept
+
+        stale = os.path.join(kernal.kb_cache_dir, os.path.basename(obj)[:-32] + '0' * 32 + '.xwam')
+        with open(stale, 'w') as f:
+            f.write('stale')
+
+        self.assertEqual (kernal.kb_cache_build([UNITTEST_SKILL], prune=True), (1, 3))
+        self.assertFalse (os.path.exists(stale))
+        self.assertTrue (os.path.exists(obj + '.xwam'))
+
+    def test_mem_restore(self):
+
+        realm = u'restoretest'
+
+        for i in range(5):
+            kernal.session.add(model.Mem(realm=realm, k=u'k%d' % i, v=xsb_to_json(XSBAtom(u'v%d' % i)), score=1.0))
+        kernal.session.commit()
+
+        try:
+            # batches of 2: two full batches plus a partial one
+
+            kernal.mem_restore(batch_size=2)
+
+            for i in range(5):
+                self.assertEqual (kernal.mem_get(realm, u'k%d' % i).name, u'v%d' % i)
+            self.assertEqual (len(kernal.mem_dump(realm)), 5)
+
+        finally:
+            kernal.session.query(model.Mem).filter(model.Mem.realm==realm).delete()
+            kernal.session.commit()
+            kernal.mem_clear(realm)
+
+    def test_lazy_skills(self):
+
+        kernal.session.add(model.Code(md5s=u'0123456789abcdef0123456789abcdef', skill=LAZY_SKILL, code=u'', fn=u'lazy.py'))
+        kernal.session.commit()
+
+        kernal.lazy_skills = True
+        try:
+            self.assertFalse (LAZY_SKILL in kernal.consulted_skills)
+
+            # unknown code: nothing to consult
+
+            kernal.consult_code_skill(u'fedcba9876543210fedcba9876543210')
+            self.assertFalse (LAZY_SKILL in kernal.consulted_skills)
+
+            # first use of the skill's code consults it
+
+            kernal.consult_code_skill(u'0123456789abcdef0123456789abcdef')
+            self.assertTrue (LAZY_SKILL in kernal.consulted_skills)
+            self.assertEqual (kernal.code_skills[u'0123456789abcdef0123456789abcdef'], LAZY_SKILL)
+            self.assertEqual (kernal.prolog_query(u'lazyfact(X).')[0][0], 42)
+
+        finally:
+            kernal.lazy_skills = False
+
+    def test_reload(self):
+
+        m  = kernal.skills[UNITTEST_SKILL]
+        fn = os.path.join(tmpdir, UNITTEST_SKILL, 'util.py')
+        t  = os.path.getmtime(fn)
+
+        self.assertEqual (kernal.reload_skill_modules(m), [])
+
+        # touched but unchanged: no reload
+
+        os.utime(fn, (t+10, t+10))
+        self.assertEqual (kernal.reload_skill_modules(m), [])
+
+        # changed submodule is reloaded first, then the module importing it
+
+        write_skill_file(UNITTEST_SKILL + '/util.py', u'VALUE = 2\n')
+        os.utime(fn, (t+20, t+20))
+
+        self.assertEqual (kernal.reload_skill_modules(m), [UNITTEST_SKILL + '.util', UNITTEST_SKILL])
+        self.assertEqual (m.util.VALUE, 2)
+
+        self.assertEqual (kernal.reload_skill_modules(m), [])
+
+    def test_langs(self):
+
+        self.assertEqual (kernal.langs, ['en'])
+        self.assertEqual (kernal.create_context().lang, 'en')
+        self.assertEqual (kernal._lang_model_args({'model_dir': 'model', 'batch_size': 64}, 'en'),
+                          {'model_dir': 'model', 'batch_size': 64})
+
+        with self.assertRaises(Exception):
+            kernal.create_context(lang='de')
+
+        # test contexts may use any language
+
+        self.assertEqual (kernal.create_context(lang='de', test_mode=True).lang, 'de')
+
+        kernal.langs = ['en', 'de']
+        try:
+            self.assertEqual (kernal.create_context(lang='de').lang, 'de')
+            self.assertEqual (kernal._lang_model_args({'model_dir': 'model_{lang}'}, 'de')['model_dir'], 'model_de')
+
+            # multiple languages must not share model files
+
+            with self.assertRaises(Exception):
+                kernal._lang_model_args({'model_dir': 'model'}, 'de')
+
+        finally:
+            kernal.langs = ['en']
+
+        with self.assertRaises(Exception):
+            AIKernal(langs=['en', 'xx'])
+
+        # the caller's list is left alone
+
+        langs = ['xx']
+        with self.assertRaises(Exception):
+            AIKernal(langs=langs)
+        self.assertEqual (langs, ['xx'])
+
+    def test_mem_evict(self):
+
+        realm = u'evicttest'
+
+        # local backend in TTL mode: realms are loaded on first access
+
+        mem_backend = kernal.mem_backend
+        kernal.mem_backend = LocalMemBackend(kernal, kernal.session)
+        kernal.mem_backend.restore()
+        kernal.mem_ttl     = 3600
+        kernal.mem_access  = {}
+
+        try:
+            kernal.mem_touch(realm)
+            kernal.mem_set(realm, u'k', XSBAtom(u'v'))
+
+            # recently accessed realms stay
+
+            self.assertEqual (kernal.mem_evict(), [])
+
+            # evicted: persisted first, then gone from the KB
+
+            self.assertEqual (kernal.mem_evict(ttl=0), [realm])
+            self.assertEqual (kernal.mem_get(realm, u'k'), None)
+            self.assertEqual (kernal.session.query(model.Mem).filter(model.Mem.realm==realm).count(), 1)
+
+            # re-hydrated on next access
+
+            kernal.mem_touch(realm)
+            self.assertEqual (kernal.mem_get(realm, u'k').name, u'v')
+
+        finally:
+            kernal.mem_backend = mem_backend
+            kernal.mem_ttl     = 0
+            kernal.mem_access  = {}
+            kernal.session.query(model.Mem).filter(model.Mem.realm==realm).delete()
+            kernal.session.commit()
+            kernal.mem_clear(realm)
+
+    def test_mem_unloaded_realm(self):
+
+        realm = u'unloadedtest'
+
+        # stored memory of a realm this kernal never touched
+
+        for k in [u'a', u'b']:
+            kernal.session.add(model.Mem(realm=realm, k=k, v=xsb_to_json(XSBAtom(u'stored')), score=1.0))
+        kernal.session.commit()
+
+        mem_backend = kernal.mem_backend
+        kernal.mem_backend = LocalMemBackend(kernal, kernal.session)
+        kernal.mem_ttl     = 3600
+        kernal.mem_backend.restore()
+
+        try:
+            # writing one key without mem_touch() must not lose the others
+
+            kernal.mem_set(realm, u'a', XSBAtom(u'new'))
+            kernal.mem_backend.persist()
+
+            rows = dict( (m.k, m.v) for m in kernal.session.query(model.Mem).filter(model.Mem.realm==realm) )
+
+            self.assertEqual (rows, {u'a': xsb_to_json(XSBAtom(u'new')), u'b': xsb_to_json(XSBAtom(u'stored'))})
+            self.assertEqual (kernal.mem_get(realm, u'b').name, u'stored')
+
+        finally:
+            kernal.mem_backend = mem_backend
+            kernal.mem_ttl     = 0
+            kernal.session.query(model.Mem).filter(model.Mem.realm==realm).delete()
+            kernal.session.commit()
+            kernal.mem_clear(realm)
+
+    def test_nn_cache(self):
+
+        nlp_model = NNModel()
+
+        kernal.nn_cache = LRUCache(4)
+
+        try:
+            hyps = kernal.nn_predict(nlp_model, 'en', [u'hello', u'world'])
+
+            self.assertEqual (hyps, [(-0.5, [u'md51', u'_STOP'])])
+            self.assertEqual (nlp_model.inputs, [u'hello world'])
+
+            # cached per language and tokens
+
+            self.assertEqual (kernal.nn_predict(nlp_model, 'en', [u'hello', u'world']), hyps)
+            self.assertEqual (len(nlp_model.inputs), 1)
+            self.assertEqual (kernal.nn_cache.hits, 1)
+
+            kernal.nn_predict(nlp_model, 'de', [u'hello', u'world'])
+            self.assertEqual (len(nlp_model.inputs), 2)
+
+            # a retrained / rebuilt model has a new version: old entries are not used
+
+            nlp_model.version = 2
+            self.assertEqual (kernal.nn_predict(nlp_model, 'en', [u'hello', u'world']), [(-0.5, [u'md52', u'_STOP'])])
+            self.assertEqual (len(nlp_model.inputs), 3)
+
+            kernal.nn_cache_clear()
+            self.assertEqual (len(kernal.nn_cache), 0)
+            kernal.nn_predict(nlp_model, 'en', [u'hello', u'world'])
+            self.assertEqual (len(nlp_model.inputs), 4)
+
+            # no cache configured
+
+            kernal.nn_cache = None
+            kernal.nn_cache_clear()
+            kernal.nn_predict(nlp_model, 'en', [u'hello', u'world'])
+            kernal.nn_predict(nlp_model, 'en', [u'hello', u'world'])
+            self.assertEqual (len(nlp_model.inputs), 6)
+
+        finally:
+            kernal.nn_cache = None
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.ERROR)
+
+    unittest.main()
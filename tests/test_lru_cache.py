@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# Copyright 2018 Guenter Bartsch
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import unittest
+import logging
+
+from zamiaai.lru_cache import LRUCache
+
+class TestLRUCache (unittest.TestCase):
+
+    def test_get_put(self):
+
+        c = LRUCache(2)
+
+        self.assertEqual (c.get('a'), None)
+        self.assertEqual (c.get('a', 42), 42)
+
+        c.put('a', 1)
+        c.put('b', [])
+
+        self.assertEqual (c.get('a'), 1)
+        self.assertEqual (c.get('b', 42), [])   # falsy values are hits, too
+        self.assertEqual (len(c), 2)
+        self.assertEqual (c.hits, 2)
+        self.assertEqual (c.misses, 2)
+
+    def test_eviction(self):
+
+        c = LRUCache(2)
+
+        c.put('a', 1)
+        c.put('b', 2)
+        c.get('a')          # b is now the least recently used entry
+        c.put('c', 3)
+
+        self.assertEqual (len(c), 2)
+        self.assertEqual (c.get('b'), None)
+        self.assertEqual (c.get('a'), 1)
+        self.assertEqual (c.get('c'), 3)
+
+        # overwriting an entry never evicts another one
+
+        c.put('a', 4)
+        self.assertEqual (len(c), 2)
+        self.assertEqual (c.get('a'), 4)
+        self.assertEqual (c.get('c'), 3)
+
+    def test_clear_report(self):
+
+        c = LRUCache(10)
+
+        c.put('a', 1)
+        c.get('a')
+        c.get('b')
+
+        self.assertTrue ('1/10 entries, 1 hits, 1 misses' in c.report())
+        self.assertTrue ('50.0% hit rate' in c.report())
+
+        c.clear()
+        self.assertEqual (len(c), 0)
+        self.assertEqual (c.hits, 1)
+
+        c.reset_stats()
+        self.assertEqual (c.hits, 0)
+        self.assertEqual (c.misses, 0)
+        self.assertTrue ('0.0% hit rate' in c.report())
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.ERROR)
+
+    unittest.main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# Copyright 2018 Guenter Bartsch
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+#
+# SQLMemBackend tests: two backends sharing one sqlite db play two kernals,
+# each kernal's KB memory is a plain dict here
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+import logging
+
+from sqlalchemy.orm      import sessionmaker
+from pyxsb               import xsb_to_json, json_to_xsb
+
+from zamiaai             import model
+from zamiaai.mem_backend import SQLMemBackend, create_mem_backend, _merge_entries
+
+REALM = u'realm'
+
+class MemKernal(object):
+
+    """ the part of AIKernal memory backends use """
+
+    def __init__(self, Session):
+        self.Session = Session
+        self.session = Session()
+        self.memory  = {}   # (realm, k) -> [(v, score), ...]
+
+    def mem_put(self, realm, k, entries, track=True):
+        self.memory[(realm, k)] = list(entries)
+
+    def mem_get_multi(self, realm, k):
+        return self.memory.get((realm, k), [])
+
+    def values(self, k):
+        return sorted([xsb_to_json(v) for v, score in self.mem_get_multi(REALM, k)])
+
+def _v(s):
+    return json_to_xsb(s)
+
+class TestMemBackend (unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.mkdtemp()
+        engine      = model.data_engine_setup('sqlite:///%s/mem.db' % self.tmpdir)
+        Session     = sessionmaker(bind=engine)
+
+        self.k1 = MemKernal(Session)
+        self.k2 = MemKernal(Session)
+        self.b1 = create_mem_backend('sql', self.k1, self.k1.session)
+        self.b2 = create_mem_backend('sql', self.k2, self.k2.session)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _set(self, kernal, backend, k, values):
+        kernal.mem_put(REALM, k, [(_v(v), 1.0) for v in values])
+        backend.changed(REALM, k)
+
+    def test_merge_entries(self):
+
+        base   = [[u'a', 1.0], [u'b', 1.0]]
+        ours   = [[u'b', 0.5], [u'c', 1.0]]          # a removed, b re-scored, c added
+        theirs = [[u'a', 1.0], [u'b', 1.0], [u'd', 1.0]] # d added
+
+        self.assertEqual (_merge_entries(base, ours, theirs), [[u'b', 0.5], [u'd', 1.0], [u'c', 1.0]])
+        self.assertEqual (_merge_entries([], ours, []), ours)
+        self.assertEqual (_merge_entries(base, base, theirs), theirs)
+
+    def test_share(self):
+
+        self._set(self.k1, self.b1, u'k', [u'x'])
+        self.b1.persist()
+        self.assertEqual (self.b1.versions[(REALM, u'k')], 1)
+
+        self.b2.load(REALM)
+        self.assertEqual (self.k2.values(u'k'), [u'x'])
+        self.assertEqual (self.b2.versions[(REALM, u'k')], 1)
+
+        # nothing changed: load() keeps our copy
+
+        self.k2.memory.clear()
+        self.b2.load(REALM)
+        self.assertEqual (self.k2.values(u'k'), [])
+
+        # dirty keys are not overwritten by load()
+
+        self._set(self.k1, self.b1, u'k', [u'y'])
+        self.b1.persist()
+        self._set(self.k2, self.b2, u'k', [u'z'])
+        self.b2.load(REALM)
+        self.assertEqual (self.k2.values(u'k'), [u'z'])
+
+    def test_conflict_merge(self):
+
+        self._set(self.k1, self.b1, u'k', [u'x'])
+        self.b1.persist()
+        self.b2.load(REALM)
+
+        # both kernals change the same key
+
+        self._set(self.k1, self.b1, u'k', [u'x', u'y'])
+        self.b1.persist()
+
+        self._set(self.k2, self.b2, u'k', [u'z'])
+        self.b2.persist()
+
+        # k2's changes (x removed, z added) merged on top of k1's (y added)
+
+        self.assertEqual (self.k2.values(u'k'), [u'y', u'z'])
+        self.assertEqual (self.b2.versions[(REALM, u'k')], 3)
+
+        self.b1.load(REALM)
+        self.assertEqual (self.k1.values(u'k'), [u'y', u'z'])
+
+    def test_concurrent_create(self):
+
+        self._set(self.k1, self.b1, u'k', [u'x'])
+        self._set(self.k2, self.b2, u'k', [u'y'])
+
+        self.b1.persist()
+        self.b2.persist()
+
+        self.assertEqual (self.k2.values(u'k'), [u'x', u'y'])
+
+        self.b1.load(REALM)
+        self.assertEqual (self.k1.values(u'k'), [u'x', u'y'])
+
+    def test_delete(self):
+
+        self._set(self.k1, self.b1, u'k', [u'x'])
+        self._set(self.k1, self.b1, u'l', [u'x'])
+        self.b1.persist()
+        self.b2.load(REALM)
+
+        # deleted by k1: k2 drops the key on its next load
+
+        self._set(self.k1, self.b1, u'k', [])
+        self.b1.persist()
+
+        self.b2.load(REALM)
+        self.assertEqual (self.k2.values(u'k'), [])
+        self.assertFalse ((REALM, u'k') in self.b2.versions)
+
+        # deleted by k2 after k1 changed it: k1's additions survive
+
+        self._set(self.k1, self.b1, u'l', [u'x', u'y'])
+        self.b1.persist()
+
+        self._set(self.k2, self.b2, u'l', [])
+        self.b2.persist()
+
+        self.assertEqual (self.k2.values(u'l'), [u'y'])
+        self.b1.load(REALM)
+        self.assertEqual (self.k1.values(u'l'), [u'y'])
+
+    def test_own_session(self):
+
+        # conflicts roll back the backend's session, the kernal's pending work must survive
+
+        self.assertFalse (self.b1.session is self.k1.session)
+
+        self.k1.session.add(model.Mem(realm=REALM, k=u'pending', v=u'"x"', score=1.0))
+
+        self._set(self.k2, self.b2, u'k', [u'y'])
+        self.b2.persist()
+        self._set(self.k1, self.b1, u'k', [u'x'])
+        self.b1.persist()
+
+        self.assertEqual (len(self.k1.session.new), 1)
+        self.assertEqual (self.k1.values(u'k'), [u'x', u'y'])
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.ERROR)
+
+    unittest.main()
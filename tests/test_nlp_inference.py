@@ -0,0 +1,316 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# Copyright 2018 Guenter Bartsch
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+#
+# tensorflow-free inference tests, the keras reference comparison is in test_nlp_model.py
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+import logging
+import codecs
+
+import numpy as np
+
+from zamiaai.nlp_inference import NumpyLSTM, NumpySeq2Seq, load_decoder_dict, log_softmax
+from zamiaai.nlp_inference import beam_search, split_commands, decode_hypotheses, START_ID, STOP_ID, _STOP, _OR
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+def _hard_sigmoid(x):
+    return np.clip(0.2 * x + 0.5, 0.0, 1.0)
+
+def lstm_reference(x, kernel, recurrent_kernel, bias, ract):
+
+    """ textbook LSTM over x (batch, time, dim), keras gate order i, f, c, o, float64 """
+
+    u = recurrent_kernel.shape[0]
+    h = np.zeros((x.shape[0], u))
+    c = np.zeros((x.shape[0], u))
+
+    for t in range(x.shape[1]):
+        z = np.dot(x[:, t], kernel) + np.dot(h, recurrent_kernel) + bias
+        i = ract(z[:, :u])
+        f = ract(z[:, u:2*u])
+        o = ract(z[:, 3*u:])
+        c = f * c + i * np.tanh(z[:, 2*u:3*u])
+        h = o * np.tanh(c)
+
+    return h, c
+
+def random_weights(dim, units):
+    return (np.random.uniform(-0.5, 0.5, (dim, 4*units)).astype('float32'),
+            np.random.uniform(-0.5, 0.5, (units, 4*units)).astype('float32'),
+            np.random.uniform(-0.5, 0.5, 4*units).astype('float32'))
+
+class TestNumpyLSTM (unittest.TestCase):
+
+    def test_lstm(self):
+
+        np.random.seed(42)
+
+        for ract, ract_ref in [('sigmoid', _sigmoid), ('hard_sigmoid', _hard_sigmoid)]:
+
+            kernel, recurrent_kernel, bias = random_weights(5, 4)
+            lstm = NumpyLSTM(kernel, recurrent_kernel, bias, ract)
+
+            x = np.random.uniform(-1.0, 1.0, (3, 6, 5)).astype('float32')
+
+            h = np.zeros((3, 4), dtype='float32')
+            c = np.zeros((3, 4), dtype='float32')
+            z = np.empty((3, 16), dtype='float32')
+            g = np.empty((3, 16), dtype='float32')
+
+            for t in range(6):
+                lstm.step(np.dot(x[:, t], kernel), h, c, z, g)
+
+            h_ref, c_ref = lstm_reference(x, kernel, recurrent_kernel, bias, ract_ref)
+
+            self.assertTrue (np.allclose(h, h_ref, atol=1e-5))
+            self.assertTrue (np.allclose(c, c_ref, atol=1e-5))
+
+    def test_seq2seq(self):
+
+        np.random.seed(23)
+
+        tmpdir = tempfile.mkdtemp()
+
+        try:
+            enc = random_weights(5, 4)
+            dec = random_weights(7, 4)
+
+            weights_fn = os.path.join(tmpdir, 'seq2seq.npz')
+            np.savez(weights_fn,
+                     enc_kernel=enc[0], enc_recurrent_kernel=enc[1], enc_bias=enc[2],
+                     dec_kernel=dec[0], dec_recurrent_kernel=dec[1], dec_bias=dec[2],
+                     dense_kernel=np.random.uniform(-0.5, 0.5, (4, 7)).astype('float32'),
+                     dense_bias=np.zeros(7, dtype='float32'),
+                     recurrent_activation=np.array('hard_sigmoid'))
+
+            s2s = NumpySeq2Seq(weights_fn)
+
+            self.assertEqual (s2s.units, 4)
+
+            # encoder: same states as the reference
+
+            x = np.random.uniform(-1.0, 1.0, (2, 6, 5)).astype('float32')
+
+            h, c = s2s.encode(x)
+            h_ref, c_ref = lstm_reference(x, enc[0], enc[1], enc[2], _hard_sigmoid)
+
+            self.assertTrue (np.allclose(h, h_ref, atol=1e-5))
+            self.assertTrue (np.allclose(c, c_ref, atol=1e-5))
+
+            # decoder step: the kernel row lookup equals a one-hot input
+
+            tokens = np.array([0, 3])
+            onehot = np.zeros((2, 1, 7), dtype='float32')
+            onehot[[0, 1], 0, tokens] = 1.0
+
+            z      = np.empty((2, 16), dtype='float32')
+            g      = np.empty((2, 16), dtype='float32')
+            logits = np.empty((2, 7), dtype='float32')
+
+            hd = h.copy()
+            cd = c.copy()
+            s2s.decoder_logits(tokens, hd, cd, z, g, logits)
+
+            u = 4
+            zr = np.dot(onehot[:, 0], dec[0]) + np.dot(h, dec[1]) + dec[2]
+            cr = _hard_sigmoid(zr[:, u:2*u]) * c + _hard_sigmoid(zr[:, :u]) * np.tanh(zr[:, 2*u:3*u])
+            hr = _hard_sigmoid(zr[:, 3*u:]) * np.tanh(cr)
+
+            self.assertTrue (np.allclose(hd, hr, atol=1e-5))
+            self.assertTrue (np.allclose(logits, np.dot(hr, s2s.dense_w) + s2s.dense_b, atol=1e-5))
+
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_log_softmax(self):
+
+        logits = np.array([[1.0, 2.0, 3.0], [1000.0, 0.0, -1000.0]], dtype='float32')
+        lp     = log_softmax(logits)
+
+        self.assertTrue (np.allclose(np.exp(lp).sum(axis=1), 1.0))
+        self.assertTrue (np.isfinite(lp[1, :2]).all())
+        self.assertAlmostEqual (float(lp[1, 0]), 0.0, places=5)
+
+    def test_decoder_dict(self):
+
+        tmpdir = tempfile.mkdtemp()
+
+        try:
+            fn = os.path.join(tmpdir, 'decoder_dict.csv')
+            with codecs.open(fn, 'w', 'utf8') as f:
+                f.write(u"7\n0;_START\n1;_STOP\n2;__OR__\n3;\"München\"\n")
+
+            max_resp_len, decoder_dict, reverse_decoder_dict = load_decoder_dict(fn)
+
+            self.assertEqual (max_resp_len, 7)
+            self.assertEqual (decoder_dict[u'"München"'], 3)
+            self.assertEqual (reverse_decoder_dict[1], u'_STOP')
+
+        finally:
+            shutil.rmtree(tmpdir)
+
+class TestBeamSearch (unittest.TestCase):
+
+    """ toy decoder: the next token distribution depends on the previous token (transition matrix)
+        and on a per sequence bias carried in h """
+
+    def setUp(self):
+
+        np.random.seed(7)
+
+        self.num_tokens = 4
+        self.trans      = np.random.uniform(-2.0, 2.0, (self.num_tokens, self.num_tokens)).astype('float32')
+        self.h          = np.random.uniform(-2.0, 2.0, (3, self.num_tokens)).astype('float32')
+        self.c          = np.zeros((3, 1), dtype='float32')
+
+    def step(self, tokens, h, c):
+        return log_softmax(self.trans[tokens] + h), h, c
+
+    def brute_force(self, h, max_len):
+
+        """ all sequences (stopped at _STOP or cut at max_len) -> score """
+
+        res = {}
+
+        def expand(seq, score):
+            if len(seq) == max_len or (seq and seq[-1] == STOP_ID):
+                res[tuple(seq)] = score
+                return
+            lp = log_softmax((self.trans[seq[-1] if seq else START_ID] + h)[None, :].astype('float64'))[0]
+            for token in range(self.num_tokens):
+                expand(seq + [token], score + lp[token])
+
+        expand([], 0.0)
+
+        return res
+
+    def hypotheses(self, ids, scores, i):
+
+        res = {}
+        for seq, score in zip(ids[i], scores[i]):
+            if score == -np.inf:
+                continue
+            seq = list(seq)
+            if STOP_ID in seq:
+                seq = seq[:seq.index(STOP_ID)+1]
+            res[tuple(seq)] = float(score)
+        return res
+
+    def test_greedy(self):
+
+        ids, scores = beam_search(self.step, self.h, self.c, 5)
+
+        self.assertEqual (ids.shape[:2], (3, 1))
+
+        for i in range(3):
+
+            seq   = []
+            score = 0.0
+            token = START_ID
+            for t in range(5):
+                lp     = log_softmax((self.trans[token] + self.h[i])[None, :])[0]
+                token  = int(np.argmax(lp))
+                score += lp[token]
+                seq.append(token)
+                if token == STOP_ID:
+                    break
+
+            self.assertEqual (list(self.hypotheses(ids, scores, i)), [tuple(seq)])
+            self.assertAlmostEqual (float(scores[i, 0]), score, places=4)
+
+    def test_exhaustive(self):
+
+        # beams wide enough to hold every hypothesis: beam search is exact
+
+        ids, scores = beam_search(self.step, self.h, self.c, 3, beam_width=self.num_tokens ** 3)
+
+        for i in range(3):
+
+            ref  = self.brute_force(self.h[i], 3)
+            hyps = self.hypotheses(ids, scores, i)
+
+            self.assertEqual (sorted(hyps), sorted(ref))
+            for seq in ref:
+                self.assertAlmostEqual (hyps[seq], ref[seq], places=4)
+
+            # best first
+
+            self.assertTrue ((np.diff(scores[i][np.isfinite(scores[i])]) <= 1e-6).all())
+
+    def test_beam(self):
+
+        # narrow beam: best hypotheses among the exhaustive ones, each batch row independent
+
+        ids, scores = beam_search(self.step, self.h, self.c, 4, beam_width=3)
+
+        self.assertEqual (scores.shape, (3, 3))
+
+        for i in range(3):
+
+            ref  = self.brute_force(self.h[i], 4)
+            hyps = self.hypotheses(ids, scores, i)
+
+            self.assertEqual (len(hyps), 3)
+            for seq in hyps:
+                self.assertAlmostEqual (hyps[seq], ref[seq], places=4)
+
+            ids1, scores1 = beam_search(self.step, self.h[i:i+1], self.c[i:i+1], 4, beam_width=3)
+            self.assertEqual (self.hypotheses(ids1, scores1, 0), hyps)
+
+            # the greedy hypothesis never beats the best beam
+
+            ids_g, scores_g = beam_search(self.step, self.h[i:i+1], self.c[i:i+1], 4)
+            self.assertTrue (scores[i, 0] >= scores_g[0, 0] - 1e-6)
+
+class TestDecoding (unittest.TestCase):
+
+    def test_split_commands(self):
+
+        self.assertEqual (split_commands([u'md5a', u'"x"', _OR, u'md5b', _STOP]), [(u'md5a', u'"x"'), (u'md5b',)])
+        self.assertEqual (split_commands([u'md5a', _STOP, u'md5b', _STOP]),     [(u'md5a',)])
+        self.assertEqual (split_commands([_OR, u'md5a', _OR, _OR, _STOP]),      [(u'md5a',)])
+
+        # unterminated commands are dropped
+
+        self.assertEqual (split_commands([u'md5a', _OR, u'md5b']),              [(u'md5a',)])
+        self.assertEqual (split_commands([]),                                   [])
+
+    def test_decode_hypotheses(self):
+
+        rdd    = {0: u'_START', 1: _STOP, 2: _OR, 3: u'md5a'}
+        ids    = np.array([[[3, 1, 1], [3, 3, 3]], [[1, 1, 1], [3, 1, 1]]])
+        scores = np.array([[-0.5, -1.0], [-0.1, -np.inf]])
+
+        res = decode_hypotheses(ids, scores, rdd)
+
+        self.assertEqual (res, [[(-0.5, [u'md5a', _STOP]), (-1.0, [u'md5a', u'md5a', u'md5a'])],
+                                [(-0.1, [_STOP])]])
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.ERROR)
+
+    unittest.main()
@@ -0,0 +1,362 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# Copyright 2018 Guenter Bartsch
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+#
+# keras seq2seq model tests (need tensorflow), tiny models in temp dirs
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+import logging
+import codecs
+
+import numpy as np
+
+from tensorflow import keras
+
+from zamiaai.nlp_model        import NLPModel, TrainingSequence
+from zamiaai.train_checkpoint import TrainingCheckpoint
+from zamiaai.nlp_inference    import NumpyNLPModel, _START, _STOP, _OR
+
+VEC = u"""6 4
+hello 1.0 0.0 0.0 0.5
+world 0.0 1.0 0.0 -0.5
+how 0.0 0.0 1.0 0.0
+are 0.5 0.5 0.0 0.0
+you 0.0 0.5 0.5 1.0
+computer -1.0 0.0 0.5 0.0
+"""
+
+INPUTS = [u'hello world', u'how are you', u'hello computer', u'you', u'unknown words only']
+
+def model_args(model_dir):
+    return {'model_dir'       : model_dir,
+            'lstm_latent_dim' : 8,
+            'batch_size'      : 2,
+            'max_input_len'   : 5,
+            'patience'        : 0}
+
+def write_embeddings(model_dir):
+    with codecs.open(os.path.join(model_dir, 'word_embeddings.vec'), 'w', 'utf8') as f:
+        f.write(VEC)
+
+class SequenceModel(object):
+
+    """ the NLPModel attributes TrainingSequence uses """
+
+    def __init__(self):
+        self.max_inp_len    = 3
+        self.embed_dim      = 2
+        self.decoder_dict   = {_START: 0, _STOP: 1, _OR: 2, u'a': 3, u'b': 4}
+        self.embedding_dict = {u'hello': np.array([1.0, 2.0], dtype='float32')}
+
+class TestTrainingSequence (unittest.TestCase):
+
+    def test_batch(self):
+
+        samples = [([u'hello', u'unknown'], np.array([0, 3, 4, 1], dtype='int32')),
+                   ([u'hello'],             np.array([0, 3, 1],    dtype='int32'))]
+
+        seq = TrainingSequence(SequenceModel(), samples, 2, do_shuffle=False)
+
+        self.assertEqual (len(seq), 1)
+
+        (enc, dec), target, weights = seq[0]
+
+        # sorted by response length: the short response comes first
+
+        self.assertEqual (enc.shape,     (2, 3, 2))
+        self.assertEqual (dec.shape,     (2, 3, 5))
+        self.assertEqual (target.shape,  (2, 3, 1))
+        self.assertEqual (weights.shape, (2, 3))
+
+        self.assertEqual (enc[1, 0].tolist(), [1.0, 2.0])
+        self.assertEqual (enc[1, 1].tolist(), [0.0, 0.0])   # no word vector
+        self.assertEqual (enc[1, 2].tolist(), [0.0, 0.0])   # padding
+
+        # decoder input: response without _STOP, one-hot; target: response without _START, sparse
+
+        self.assertEqual (np.argmax(dec[1], axis=1).tolist(), [0, 3, 4])
+        self.assertEqual (target[1, :, 0].tolist(),           [3, 4, 1])
+        self.assertEqual (weights[1].tolist(),                [1.0, 1.0, 1.0])
+
+        self.assertEqual (np.argmax(dec[0, :2], axis=1).tolist(), [0, 3])
+        self.assertEqual (dec[0, 2].sum(),                        0.0)
+        self.assertEqual (target[0, :2, 0].tolist(),              [3, 1])
+        self.assertEqual (weights[0].tolist(),                    [1.0, 1.0, 0.0])
+
+    def test_bucketing(self):
+
+        # responses of 2..7 tokens, 4 samples each
+
+        samples = []
+        for l in range(2, 8):
+            for i in range(4):
+                samples.append(([u'hello'], np.array([0] + [3] * (l-2) + [1], dtype='int32')))
+
+        seq = TrainingSequence(SequenceModel(), samples, 4, do_shuffle=True)
+
+        for epoch in range(3):
+
+            self.assertEqual (len(seq), 6)
+            self.assertEqual (sorted(sum(seq.batches, [])), list(range(len(samples))))
+
+            # equal response lengths end up in one batch, padded to that length only
+
+            for idx in range(len(seq)):
+                lens = set([len(samples[i][1]) for i in seq.batches[idx]])
+                self.assertEqual (len(lens), 1)
+                (enc, dec), target, weights = seq[idx]
+                self.assertEqual (dec.shape[1], lens.pop() - 1)
+                self.assertEqual (weights.min(), 1.0)
+
+            seq.on_epoch_end()
+
+        # unshuffled: shortest responses first
+
+        seq = TrainingSequence(SequenceModel(), samples, 4, do_shuffle=False)
+        self.assertEqual ([seq[idx][0][1].shape[1] for idx in range(len(seq))], [1, 2, 3, 4, 5, 6])
+
+def dense_model():
+    model = keras.models.Sequential([keras.layers.Dense(2, input_shape=(3,))])
+    model.compile(optimizer='adam', loss='mse')
+    return model
+
+class TestTrainingCheckpoint (unittest.TestCase):
+
+    def setUp(self):
+
+        np.random.seed(42)
+
+        self.tmpdir     = tempfile.mkdtemp()
+        self.weights_fn = os.path.join(self.tmpdir, 'weights.h5')
+        self.x          = np.random.uniform(-1.0, 1.0, (8, 3)).astype('float32')
+        self.y          = np.random.uniform(-1.0, 1.0, (8, 2)).astype('float32')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _fit(self, model, checkpoint, epochs, initial_epoch=0):
+        model.fit(self.x, self.y, batch_size=4, epochs=epochs, initial_epoch=initial_epoch,
+                  callbacks=[checkpoint], verbose=0)
+
+    def test_resume(self):
+
+        model      = dense_model()
+        checkpoint = TrainingCheckpoint(self.weights_fn)
+        self.assertFalse (checkpoint.can_resume())
+
+        self._fit(model, checkpoint, 2)
+
+        # one set of epoch files, the previous epoch's are gone
+
+        self.assertEqual (sorted(os.listdir(self.tmpdir)),
+                          ['weights.h5', 'weights.latest.2.h5', 'weights.optimizer.2.npz', 'weights.state.json'])
+
+        # a fresh model continues with weights and optimizer state of epoch 2
+
+        model2      = dense_model()
+        checkpoint2 = TrainingCheckpoint(self.weights_fn)
+
+        self.assertTrue (checkpoint2.can_resume())
+        self.assertEqual (checkpoint2.resume(model2, (self.x[:4], self.y[:4])), 2)
+
+        for w, w2 in zip(model.get_weights(), model2.get_weights()):
+            self.assertTrue (np.allclose(w, w2))
+        for w, w2 in zip(model.optimizer.get_weights(), model2.optimizer.get_weights()):
+            self.assertTrue (np.allclose(w, w2))
+
+        self._fit(model2, checkpoint2, 3, initial_epoch=2)
+        self.assertEqual (checkpoint2.state['epoch'], 3)
+        self.assertFalse (os.path.exists(os.path.join(self.tmpdir, 'weights.latest.2.h5')))
+
+    def test_incomplete(self):
+
+        self._fit(dense_model(), TrainingCheckpoint(self.weights_fn), 1)
+
+        # the state file points to epoch files that are missing
+
+        os.remove(os.path.join(self.tmpdir, 'weights.optimizer.1.npz'))
+
+        checkpoint = TrainingCheckpoint(self.weights_fn)
+        self.assertFalse (checkpoint.can_resume())
+
+        checkpoint.clear()
+        self.assertEqual (os.listdir(self.tmpdir), ['weights.h5'])
+
+class TestGrow (unittest.TestCase):
+
+    """ incremental training with new skills: decoder dict and model grow, existing tokens keep their ids and weights """
+
+    def setUp(self):
+
+        np.random.seed(42)
+
+        self.tmpdir = tempfile.mkdtemp()
+        write_embeddings(self.tmpdir)
+
+        self.m = NLPModel('en', None, model_args(self.tmpdir))
+        self.m._load_word_embeddings()
+
+        self.m.decoder_dict         = {_START: 0, _STOP: 1, _OR: 2, u'a': 3, u'b': 4}
+        self.m.reverse_decoder_dict = dict( (i, token) for token, i in self.m.decoder_dict.items() )
+        self.m.max_resp_len         = 4
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_grow_decoder_dict(self):
+
+        self.m.training_data = [([u'hello'], [u'a', u'c']), ([u'world'], [u'b', _OR, u'd', u'c'])]
+
+        self.assertEqual (self.m._grow_decoder_dict(), 2)
+
+        self.assertEqual (self.m.decoder_dict, {_START: 0, _STOP: 1, _OR: 2, u'a': 3, u'b': 4, u'c': 5, u'd': 6})
+        self.assertEqual (self.m.reverse_decoder_dict[6], u'd')
+
+        # nothing new
+
+        self.assertEqual (self.m._grow_decoder_dict(), 0)
+        self.assertEqual (len(self.m.decoder_dict), 7)
+
+    def test_grow_keras_model(self):
+
+        self.m._create_keras_model()
+        self.m.keras_model_train.save_weights(self.m.weights_fn)
+
+        enc_weights                                = self.m.encoder_lstm.get_weights()
+        dec_kernel, dec_recurrent_kernel, dec_bias = self.m.decoder_lstm.get_weights()
+        dense_kernel, dense_bias                   = self.m.decoder_dense.get_weights()
+
+        self.m.decoder_dict[u'c'] = 5
+        self.m.decoder_dict[u'd'] = 6
+
+        self.m._grow_keras_model(5)
+
+        # encoder and the rows / columns of existing tokens unchanged
+
+        for w, w_grown in zip(enc_weights, self.m.encoder_lstm.get_weights()):
+            self.assertTrue (np.array_equal(w, w_grown))
+
+        dec_kernel_grown, dec_recurrent_kernel_grown, dec_bias_grown = self.m.decoder_lstm.get_weights()
+        dense_kernel_grown, dense_bias_grown                         = self.m.decoder_dense.get_weights()
+
+        self.assertEqual (dec_kernel_grown.shape,   (7, dec_kernel.shape[1]))
+        self.assertEqual (dense_kernel_grown.shape, (dense_kernel.shape[0], 7))
+
+        self.assertTrue (np.array_equal(dec_kernel_grown[:5],      dec_kernel))
+        self.assertTrue (np.array_equal(dec_recurrent_kernel_grown, dec_recurrent_kernel))
+        self.assertTrue (np.array_equal(dec_bias_grown,             dec_bias))
+        self.assertTrue (np.array_equal(dense_kernel_grown[:, :5],  dense_kernel))
+        self.assertTrue (np.array_equal(dense_bias_grown[:5],       dense_bias))
+
+        # new tokens: glorot uniform kernels, zero bias
+
+        self.assertEqual (dense_bias_grown[5:].tolist(), [0.0, 0.0])
+        self.assertTrue (np.abs(dense_kernel_grown[:, 5:]).max() > 0.0)
+        self.assertTrue (np.abs(dec_kernel_grown[5:]).max() > 0.0)
+
+        # the grown weights are saved, they fit a model created for the grown dict
+
+        self.m._create_keras_model()
+        self.m.keras_model_train.load_weights(self.m.weights_fn)
+
+        self.assertTrue (np.array_equal(self.m.decoder_dense.get_weights()[0], dense_kernel_grown))
+
+class TestNumpyInference (unittest.TestCase):
+
+    """ numpy inference (NumpyNLPModel) against the keras model it was exported from """
+
+    @classmethod
+    def setUpClass(cls):
+
+        np.random.seed(42)
+
+        cls.tmpdir = tempfile.mkdtemp()
+        write_embeddings(cls.tmpdir)
+
+        m = NLPModel('en', None, model_args(cls.tmpdir))
+        m._load_word_embeddings()
+
+        m.decoder_dict         = {_START: 0, _STOP: 1, _OR: 2, u'a': 3, u'b': 4, u'c': 5}
+        m.reverse_decoder_dict = dict( (i, token) for token, i in m.decoder_dict.items() )
+        m.max_resp_len         = 4
+        m._save_decoder_dict()
+
+        m._create_keras_model()
+
+        # sharpen the untrained output distribution, near-ties would make comparisons of decoded tokens fragile
+
+        dense_kernel, dense_bias = m.decoder_dense.get_weights()
+        m.decoder_dense.set_weights([dense_kernel * 8.0, np.random.uniform(-1.0, 1.0, dense_bias.shape)])
+
+        m.keras_model_train.save_weights(m.weights_fn)
+        m.export_numpy()
+
+        cls.keras_model = m
+        cls.numpy_model = NumpyNLPModel('en', None, model_args(cls.tmpdir))
+        cls.numpy_model.restore()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def test_lstm(self):
+
+        x = np.random.uniform(-1.0, 1.0, (3, 5, 4)).astype('float32')
+
+        h_keras, c_keras = self.keras_model.keras_model_encoder.predict(x)
+        h, c             = self.numpy_model.seq2seq.encode(x)
+
+        self.assertTrue (np.allclose(h, h_keras, atol=1e-5))
+        self.assertTrue (np.allclose(c, c_keras, atol=1e-5))
+
+    def test_predict(self):
+
+        for inp in INPUTS:
+            self.assertEqual (self.numpy_model.predict(inp), self.keras_model.predict(inp))
+
+    def test_predict_batch(self):
+
+        res_keras = self.keras_model.predict_batch(INPUTS)
+        res       = self.numpy_model.predict_batch(INPUTS)
+
+        self.assertEqual (len(res), len(INPUTS))
+
+        for hyps, hyps_keras in zip(res, res_keras):
+            self.assertEqual ([h[1] for h in hyps], [h[1] for h in hyps_keras])
+            self.assertTrue (np.allclose([h[0] for h in hyps], [h[0] for h in hyps_keras], atol=1e-4))
+
+    def test_predict_beam(self):
+
+        res_keras = self.keras_model.predict_batch(INPUTS, beam_width=3)
+        res       = self.numpy_model.predict_batch(INPUTS, beam_width=3)
+
+        for hyps, hyps_keras in zip(res, res_keras):
+            self.assertEqual (len(hyps), 3)
+            self.assertEqual ([h[1] for h in hyps], [h[1] for h in hyps_keras])
+            self.assertTrue (np.allclose([h[0] for h in hyps], [h[0] for h in hyps_keras], atol=1e-4))
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.ERROR)
+
+    unittest.main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# Copyright 2018 Guenter Bartsch
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+#
+# embedding retrieval fallback tests: tiny training data db and word vectors in a temp dir
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+import logging
+import codecs
+
+import numpy as np
+
+from sqlalchemy.orm        import sessionmaker
+
+from zamiaai               import model
+from zamiaai.nlp_retrieval import RetrievalModel
+from zamiaai.nlp_inference import _STOP, _OR
+
+VEC = u"""5 3
+hello 1.0 0.0 0.0
+world 0.0 1.0 0.0
+good 0.0 0.0 1.0
+night 0.0 0.5 1.0
+moon 0.0 0.0 -1.0
+"""
+
+# lang, inp, md5s, args
+
+TRAINING_DATA = [ ('en', u'hello world',  'md5a', '[]'),
+                  ('en', u'hello world',  'md5b', '["x"]'),
+                  ('en', u'good night',   'md5c', '[]'),
+                  ('en', u'unknownword',  'md5d', '[]'),
+                  ('de', u'hello',        'md5e', '[]') ]
+
+RESP_HELLO_WORLD = [u'md5a', _OR, u'md5b', u'"x"', _STOP]
+RESP_GOOD_NIGHT  = [u'md5c', _STOP]
+
+class TestRetrievalModel (unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.mkdtemp()
+
+        with codecs.open(os.path.join(self.tmpdir, 'word_embeddings.vec'), 'w', 'utf8') as f:
+            f.write(VEC)
+
+        engine  = model.data_engine_setup('sqlite:///%s/retrieval.db' % self.tmpdir)
+        session = sessionmaker(bind=engine)()
+
+        for lang, inp, md5s, args in TRAINING_DATA:
+            session.add(model.TrainingData(lang=lang, skill=u'test', inp=inp, md5s=md5s, args=args))
+        session.commit()
+
+        model_args = {'model_dir': self.tmpdir, 'batch_size': 3}
+
+        RetrievalModel('en', session, model_args).build()
+
+        self.m = RetrievalModel('en', session, model_args)
+        self.m.restore()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_build(self):
+
+        # inputs without word vectors and other languages are skipped
+
+        self.assertEqual (self.m.inps, [u'good night', u'hello world'])
+        self.assertEqual (self.m.resps, [RESP_GOOD_NIGHT, RESP_HELLO_WORLD])
+
+        self.assertEqual (self.m.matrix.shape, (2, 3))
+        self.assertTrue (np.allclose(np.linalg.norm(self.m.matrix, axis=1), 1.0))
+        self.assertEqual (self.m.version, os.path.getmtime(self.m.matrix_fn))
+
+    def test_predict_batch(self):
+
+        # 4 inputs in batches of 3
+
+        res = self.m.predict_batch([u'hello world', u'good night', u'unknownword', u'hello'], beam_width=2)
+
+        self.assertEqual (len(res), 4)
+
+        self.assertEqual ([h[1] for h in res[0]], [RESP_HELLO_WORLD, RESP_GOOD_NIGHT])
+        self.assertAlmostEqual (res[0][0][0], 1.0, places=5)
+        self.assertAlmostEqual (res[0][1][0], 0.5 / np.sqrt(2.0) / np.sqrt(4.25), places=5)
+
+        self.assertEqual ([h[1] for h in res[1]], [RESP_GOOD_NIGHT, RESP_HELLO_WORLD])
+
+        # no word vectors: no hypotheses
+
+        self.assertEqual (res[2], [])
+
+        self.assertEqual (res[3][0][1], RESP_HELLO_WORLD)
+        self.assertAlmostEqual (res[3][0][0], 1.0 / np.sqrt(2.0), places=5)
+
+        # beam width 1: nearest input only
+
+        self.assertEqual (self.m.predict_batch([u'hello']), [[(res[3][0][0], RESP_HELLO_WORLD)]])
+
+    def test_min_similarity(self):
+
+        self.m.min_similarity = 0.5
+
+        res = self.m.predict_batch([u'hello world', u'moon'], beam_width=2)
+
+        self.assertEqual ([h[1] for h in res[0]], [RESP_HELLO_WORLD])
+        self.assertEqual (res[1], [])
+
+        self.assertEqual (self.m.predict(u'moon'), [_STOP])
+
+    def test_holdout(self):
+
+        res = self.m.predict_batch([u'hello world', u'hello'], beam_width=2, holdout=True)
+
+        # the identical training input is left out, others are not affected
+
+        self.assertEqual ([h[1] for h in res[0]], [RESP_GOOD_NIGHT])
+        self.assertEqual ([h[1] for h in res[1]], [RESP_HELLO_WORLD, RESP_GOOD_NIGHT])
+
+    def test_predict(self):
+
+        self.assertEqual (self.m.predict(u'good night'),  RESP_GOOD_NIGHT)
+        self.assertEqual (self.m.predict(u'unknownword'), [_STOP])
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.ERROR)
+
+    unittest.main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# Copyright 2018 Guenter Bartsch
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+import logging
+import codecs
+
+import numpy as np
+
+from zamiaai import word_embeddings
+from zamiaai.word_embeddings import load_word_embeddings, convert_vec, build_pruned_embeddings, EMBEDDINGS_BASENAME, PRUNED_SUFFIX
+
+# fastText text format: header (number of words, dimension), then one word + vector per line
+
+VEC = u"""5 3
+the 1.0 0.0 0.0
+a 0.0 1.0 0.0
+über 0.0 0.0 1.0
+broken 1.0
+berlin 0.5 0.5 0.0
+"""
+
+class TestWordEmbeddings (unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.base   = os.path.join(self.tmpdir, EMBEDDINGS_BASENAME)
+
+        with codecs.open(self.base + '.vec', 'w', 'utf8') as f:
+            f.write(VEC)
+
+        word_embeddings._loaded.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        word_embeddings._loaded.clear()
+
+    def test_convert(self):
+
+        convert_vec(self.base + '.vec', self.base + '.npy', self.base + '.vocab')
+
+        matrix = np.load(self.base + '.npy')
+
+        # malformed lines are skipped
+
+        self.assertEqual (matrix.shape, (4, 3))
+        self.assertEqual (matrix.dtype, np.float32)
+
+        with codecs.open(self.base + '.vocab', 'r', 'utf8') as f:
+            self.assertEqual (f.read().split(u'\n'), [u'the', u'a', u'über', u'berlin', u''])
+
+    def test_load(self):
+
+        emb = load_word_embeddings(self.tmpdir)
+
+        # converted on first load
+
+        self.assertTrue (os.path.exists(self.base + '.npy'))
+
+        self.assertEqual (len(emb), 4)
+        self.assertEqual (emb.embed_dim, 3)
+        self.assertTrue (u'über' in emb)
+        self.assertFalse (u'paris' in emb)
+        self.assertEqual (list(emb[u'berlin']), [0.5, 0.5, 0.0])
+        self.assertEqual (emb.get(u'paris'), None)
+
+        with self.assertRaises(KeyError):
+            emb[u'paris']
+
+        # memory mapped, shared within the process
+
+        self.assertTrue (isinstance(emb.matrix, np.memmap))
+        self.assertTrue (load_word_embeddings(self.tmpdir) is emb)
+
+    def test_reconvert(self):
+
+        load_word_embeddings(self.tmpdir)
+        word_embeddings._loaded.clear()
+
+        # a newer .vec replaces the binary store
+
+        with codecs.open(self.base + '.vec', 'w', 'utf8') as f:
+            f.write(u"1 3\nparis 0.0 1.0 1.0\n")
+        t = os.path.getmtime(self.base + '.npy')
+        os.utime(self.base + '.vec', (t+10, t+10))
+
+        emb = load_word_embeddings(self.tmpdir)
+        self.assertEqual (len(emb), 1)
+        self.assertTrue (u'paris' in emb)
+
+    def test_pruned(self):
+
+        # berlin plus the most frequent word (the)
+
+        self.assertEqual (build_pruned_embeddings(self.tmpdir, [u'berlin', u'paris'], num_extra=1), (2, 1))
+
+        word_embeddings._loaded.clear()
+
+        emb = load_word_embeddings(self.tmpdir)
+
+        self.assertEqual (len(emb), 2)
+        self.assertEqual (list(emb[u'berlin']), [0.5, 0.5, 0.0])
+        self.assertTrue (u'the' in emb)
+
+        # words missing from the pruned store come from the full binary store
+
+        self.assertTrue (u'über' in emb)
+        self.assertEqual (list(emb[u'über']), [0.0, 0.0, 1.0])
+        self.assertFalse (u'paris' in emb)
+
+    def test_pruned_no_conversion(self):
+
+        build_pruned_embeddings(self.tmpdir, [u'berlin'])
+        word_embeddings._loaded.clear()
+
+        # only the .vec is left: the fallback treats missing words as OOV instead of converting it
+
+        os.remove(self.base + '.npy')
+        os.remove(self.base + '.vocab')
+
+        emb = load_word_embeddings(self.tmpdir)
+
+        self.assertTrue (u'berlin' in emb)
+        self.assertFalse (u'über' in emb)
+        self.assertEqual (emb.get(u'the'), None)
+        self.assertFalse (os.path.exists(self.base + '.npy'))
+
+        # the full store is loaded as it is, even if older than the .vec
+
+        convert_vec(self.base + '.vec', self.base + '.npy', self.base + '.vocab')
+        t = os.path.getmtime(self.base + '.npy')
+        os.utime(self.base + '.vec', (t+10, t+10))
+        word_embeddings._loaded.clear()
+
+        emb = load_word_embeddings(self.tmpdir)
+
+        self.assertTrue (u'über' in emb)
+        self.assertEqual (os.path.getmtime(self.base + '.npy'), t)
+        self.assertTrue (os.path.exists(self.base + PRUNED_SUFFIX + '.npy'))
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.ERROR)
+
+    unittest.main()
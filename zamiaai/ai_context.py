@@ -45,6 +45,7 @@ class AIContext(object):
         self.dlg_log      = []
         self.staged_resps = []
         self.high_score   = 0.0
+        self.num_resps    = 0  # number of resp() calls so far, used for profiling
         self.inp          = u''
         self.user         = user
         self.realm        = realm
@@ -53,6 +54,8 @@ class AIContext(object):
         self.lang         = lang
         self.kernal       = kernal
         self.test_mode    = test_mode
+        self.timings      = [] # per-call breakdown: (stage, detail, seconds)
+        self.answer_path  = None
 
         tz = get_localzone()
         self.current_dt   = tz.localize(datetime.datetime.now())
@@ -61,6 +64,7 @@ class AIContext(object):
         self.inp = inp
 
     def resp(self, resp, score=0.0, action=None, action_arg=None):
+        self.num_resps += 1
         if score < self.high_score:
             return
         if score > self.high_score:
@@ -89,7 +93,9 @@ class AIContext(object):
         self.staged_resps = []
         self.high_score = 0.0
 
+        t0 = time.time()
         self.kernal.prolog_persist()
+        self.kernal.record_timing(self, 'persist', time.time()-t0)
        
     def _ner_learn(self, lang, cls):
 
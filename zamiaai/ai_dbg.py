@@ -44,7 +44,15 @@ class AIDbg(object):
     def print_help(self):
         print (":h          help")
         print (":c <skills> compile <skills>")
+        print (":cd [<n>]   dump code execution profile (top <n> snippets)")
+        print (":cr         reset code execution profile")
+        print (":l <lang>   switch context language (%s)" % ', '.join(self.kernal.langs))
         print (":m          show memory / context")
+        print (":p          %s prolog query profiling" % ('disable' if self.kernal.prolog_profiling else 'enable'))
+        print (":pd [<n>]   dump prolog query profile (top <n> patterns)")
+        print (":pr         reset prolog query profile")
+        print (":s          show latency statistics, answer paths and cache hit rates")
+        print (":sr         reset latency statistics")
         print (":t          %s prolog tracing" % ('disable' if self.run_trace else 'enable'))
         print (":v          verbose logging %s" % ('off' if self.verbose else 'on'))
         print (":q          quit")
@@ -54,7 +62,18 @@ class AIDbg(object):
         if line == ":h":
             self.print_help()
 
-        # FIXME: we'd have to force-reload the python module
+        elif line[:3] == ":cd":
+
+            parts = line.split(' ')
+            limit = int(parts[1]) if len(parts) > 1 else 0
+
+            for l in self.kernal.code_profile_report(limit=limit):
+                print (l)
+
+        elif line == ":cr":
+            self.kernal.code_profile_reset()
+
+        # compile_skill reloads changed skill modules before extracting data
         elif line[:2] == ":c":
 
             parts = line.split(' ')
@@ -65,6 +84,17 @@ class AIDbg(object):
 
             self.kernal.compile_skill_multi (parts[1:])
 
+        elif line[:2] == ":l":
+
+            parts = line.split(' ')
+            if len(parts) != 2 or not parts[1] in self.kernal.langs:
+                logging.error('?usage')
+                self.print_help()
+                return
+
+            self.ctx.lang = parts[1]
+            print ("ctx.lang   = %s" % self.ctx.lang)
+
         elif line == ":m":
 
             print ("ctx.user   = %s" % self.ctx.user)
@@ -77,6 +107,33 @@ class AIDbg(object):
             for k, v, score in memd:
                 print(u'MEM(%-8s):    %-20s: %s (%f)' % (self.ctx.user, k, v, score))
 
+        elif line == ":p":
+            self.kernal.prolog_profile(not self.kernal.prolog_profiling)
+            print ("prolog query profiling %s" % ('enabled' if self.kernal.prolog_profiling else 'disabled'))
+
+        elif line[:3] == ":pd":
+
+            parts = line.split(' ')
+            limit = int(parts[1]) if len(parts) > 1 else 0
+
+            for l in self.kernal.prolog_profile_report(limit=limit):
+                print (l)
+
+        elif line == ":pr":
+            self.kernal.prolog_profile_reset()
+
+        elif line == ":s":
+
+            for l in self.kernal.get_stage_stats().report():
+                print (l)
+            if self.kernal.query_cache is not None:
+                print ('query cache: %s' % self.kernal.query_cache.report())
+            if self.kernal.nn_cache is not None:
+                print ('nn cache   : %s' % self.kernal.nn_cache.report())
+
+        elif line == ":sr":
+            self.kernal.reset_stage_stats()
+
         elif line == ":t":
             self.run_trace = not self.run_trace
 
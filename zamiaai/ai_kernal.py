@@ -25,6 +25,7 @@
 from __future__ import print_function
 
 import os
+import re
 import sys
 import logging
 import traceback
@@ -35,6 +36,9 @@ import codecs
 import datetime
 import pytz
 import json
+import shutil
+import hashlib
+import fcntl
 import ConfigParser
 
 import numpy as np
@@ -53,6 +57,10 @@ from nltools                import misc
 from nltools.tokenizer      import tokenize
 from zamiaai.data_engine    import DataEngine
 from zamiaai.ai_context     import AIContext
+from zamiaai.ai_stats       import StageStats, PrologProfiler, CodeStats
+from zamiaai.ai_query       import Var, pl_goal, pl_functors, pl_atom_goals, pl_variables, pl_quote
+from zamiaai.lru_cache      import LRUCache
+from zamiaai.mem_backend    import create_mem_backend
 from zamiaai                import model
 
 USER_PREFIX                 = u'user'
@@ -71,17 +79,46 @@ DEFAULT_SKILL_PATHS         = None
 DEFAULT_REALM               = '__realm__'
 DEFAULT_NUM_EPOCHS          = 100
 DEFAULT_NUM_EPOCHS_UTTCLASS = 10
+DEFAULT_QUERY_CACHE_SIZE    = 10000
+DEFAULT_KB_CACHE_DIR        = None # precompiled prolog sources, disabled if not set
+DEFAULT_MEM_RESTORE_BATCH   = 1000 # memory entries asserted per pyxsb_command
+MEM_RESTORE_REPORT_INTERVAL = 5.0  # seconds between memory restore progress reports
+DEFAULT_MEM_TTL             = 0    # seconds of inactivity before a realm's memory is evicted, 0: never
+MEM_EVICT_INTERVAL          = 60.0 # seconds between checks for inactive realms
+
+# meta predicates which may wrap static goals without making the query uncacheable,
+# plus control atoms which may appear among them
+CACHE_META_PREDICATES       = set(['once', 'zamia_limit', 'not', 'call', 'findall', 'true', 'fail'])
+
+_MISS                       = object()
+
+KB_OBJECT_PREFIX            = 'kb_'
+KB_LOCK_FN                  = 'compile.lock'
+PL_LOAD_DIRECTIVE_RE        = re.compile(r"^\s*:-\s*(?:include|consult|reconsult|ensure_loaded)\s*\(\s*(.+?)\s*\)\s*\.", re.M)
+_KB_OBJECT_RE               = re.compile(r'^kb_[0-9a-f]{32}\.xwam$')
 
 DEFAULTS             = {'db_url'      : DEFAULT_DB_URL,
                         'xsb_arch_dir': DEFAULT_XSB_ARCH_DIR,
                         'toplevel'    : DEFAULT_TOPLEVEL,
                         'skill_paths' : DEFAULT_SKILL_PATHS,
-                        'lang'        : DEFAULT_LANG }
+                        'lang'        : DEFAULT_LANG,
+                        'query_cache_size' : str(DEFAULT_QUERY_CACHE_SIZE),
+                        'label_index' : 'false',
+                        'kb_cache_dir': DEFAULT_KB_CACHE_DIR,
+                        'lazy_skills' : 'false',
+                        'langs'       : '',
+                        'mem_backend' : 'local',
+                        'mem_ttl'     : str(DEFAULT_MEM_TTL) }
 DEFAULT_NLP_MODEL_ARGS = {
                           'model_dir'       : 'model',
                           'lstm_latent_dim' : 256,
                           'batch_size'      : 64,
                           'max_input_len'   : 20, # tokens
+                          'engine'          : 'keras', # keras, numpy or retrieval (inference only, no tensorflow needed)
+                          'beam_width'      : 1,       # number of decoder hypotheses process_input tries
+                          'patience'        : 5,       # epochs without validation loss improvement before training stops, 0: never
+                          'cache_size'      : 1000,    # max number of cached predictions, 0 disables the cache
+                          'min_similarity'  : 0.7,     # retrieval engine: min cosine similarity of a neighbour
                          }
 DEFAULT_UTTCLASS_MODEL_ARGS = {
                             'model_dir'       : 'model',
@@ -91,6 +128,7 @@ DEFAULT_UTTCLASS_MODEL_ARGS = {
                             'max_input_len'   : 20, # tokens
                             'optimizer'       : 'adam',
                             'dropout'         : 0.5,
+                            'patience'        : 3,
                            }
 
 DEFAULT_SKILL_ARGS   = {}
@@ -128,12 +166,24 @@ class AIKernal(object):
         db_url       = config.get('main', 'db_url')
         skill_paths  = config.get('main', 'skill_paths')
         lang         = config.get('main', 'lang')
+        langs        = [l.strip() for l in config.get('main', 'langs').split(',') if l.strip()]
+        qcache_size  = config.getint('main', 'query_cache_size')
+        label_index  = config.getboolean('main', 'label_index')
+        kb_cache_dir = config.get('main', 'kb_cache_dir')
+        lazy_skills  = config.getboolean('main', 'lazy_skills')
+        mem_backend  = config.get('main', 'mem_backend')
+        mem_ttl      = config.getint('main', 'mem_ttl')
 
         nlp_model_args = {
                           'model_dir'       : config.get('nlpmodel', 'model_dir'),
                           'lstm_latent_dim' : config.getint('nlpmodel', 'lstm_latent_dim'),
                           'batch_size'      : config.getint('nlpmodel', 'batch_size'),
                           'max_input_len'   : config.getint('nlpmodel', 'max_input_len'),
+                          'engine'          : config.get('nlpmodel', 'engine'),
+                          'beam_width'      : config.getint('nlpmodel', 'beam_width'),
+                          'patience'        : config.getint('nlpmodel', 'patience'),
+                          'cache_size'      : config.getint('nlpmodel', 'cache_size'),
+                          'min_similarity'  : config.getfloat('nlpmodel', 'min_similarity'),
                          }
 
         skill_args = {}
@@ -148,10 +198,14 @@ class AIKernal(object):
                             'max_input_len'   : config.getint('uttclassmodel', 'max_input_len'),
                             'optimizer'       : config.get('uttclassmodel', 'optimizer'),
                             'dropout'         : config.getfloat('uttclassmodel', 'dropout'),
+                            'patience'        : config.getint('uttclassmodel', 'patience'),
                            }
 
         return AIKernal(db_url=db_url, xsb_arch_dir=xsb_arch_dir, toplevel=toplevel, skill_paths=skill_paths, lang=lang,
-                        nlp_model_args=nlp_model_args, skill_args=skill_args, uttclass_model_args=uttclass_model_args)
+                        nlp_model_args=nlp_model_args, skill_args=skill_args, uttclass_model_args=uttclass_model_args,
+                        query_cache_size=qcache_size, label_index=label_index, kb_cache_dir=kb_cache_dir,
+                        lazy_skills=lazy_skills, langs=langs, mem_backend=mem_backend,
+                        mem_ttl=mem_ttl)
 
     def __init__(self, 
                  db_url              = DEFAULT_DB_URL, 
@@ -161,9 +215,22 @@ class AIKernal(object):
                  lang                = DEFAULT_LANG, 
                  nlp_model_args      = DEFAULT_NLP_MODEL_ARGS,
                  skill_args          = DEFAULT_SKILL_ARGS,
-                 uttclass_model_args = DEFAULT_UTTCLASS_MODEL_ARGS):
-
-        self.lang                = lang
+                 uttclass_model_args = DEFAULT_UTTCLASS_MODEL_ARGS,
+                 query_cache_size    = DEFAULT_QUERY_CACHE_SIZE,
+                 label_index         = False,
+                 kb_cache_dir        = DEFAULT_KB_CACHE_DIR,
+                 lazy_skills         = False,
+                 langs               = None,
+                 mem_backend         = 'local',
+                 mem_ttl             = DEFAULT_MEM_TTL):
+
+        self.lang                = lang   # default language (contexts, tests, training)
+        self.langs               = list(langs) if langs else [lang] # languages served by this kernal
+        if not lang in self.langs:
+            self.langs.insert(0, lang)
+        for l in self.langs:
+            if not l in LANGUAGES:
+                raise Exception ('Sorry, language %s not supported.' % l)
         self.nlp_model_args      = nlp_model_args
         self.skill_args          = skill_args
         self.uttclass_model_args = uttclass_model_args
@@ -180,9 +247,43 @@ class AIKernal(object):
         # TensorFlow (deferred, as tf can take quite a bit of time to set up)
         #
 
-        self.tf_session     = None
-        self.nlp_model      = None
-        self.uttclass_model = None
+        self.tf_session      = None
+        self.nlp_models      = {}   # lang -> NLPModel
+        self.uttclass_models = {}   # lang -> UttClassModel
+
+        # decoded hypotheses of recent NN fallback inputs: (lang, tokens, model version) -> hypotheses
+
+        nn_cache_size        = nlp_model_args.get('cache_size', 0)
+        self.nn_cache        = LRUCache(nn_cache_size) if nn_cache_size > 0 else None
+
+        #
+        # runtime statistics
+        #
+
+        self.stage_stats     = StageStats()
+        self.prolog_profiler = PrologProfiler()
+        self.prolog_profiling = False
+        self.code_stats      = CodeStats()
+        self.current_skill   = None # skill whose code is currently running, used for profiling
+
+        #
+        # result cache for queries over static (STATIC_PREDICATES) KB predicates
+        #
+
+        self.static_predicates = set()
+        self.query_cache       = LRUCache(query_cache_size) if query_cache_size > 0 else None
+
+        # optional in-process rdfsLabel/3 index, built lazily from the consulted KB
+
+        self.use_label_index   = label_index
+        self.label_index       = None  # entity -> lang -> label
+        self.label_entities    = None  # label text -> set of entities
+
+        # precompiled (content hash keyed) objects of skill prolog sources
+
+        self.kb_cache_dir      = kb_cache_dir
+        if kb_cache_dir and not os.path.exists(kb_cache_dir):
+            os.makedirs(kb_cache_dir)
 
         #
         # skill management, setup
@@ -193,12 +294,17 @@ class AIKernal(object):
         self.consulted_skills   = set()
         self.toplevel           = toplevel
         self.all_skills         = []
+        self.lazy_skills        = lazy_skills # load + consult skills on first use of their code
+        self.code_skills        = {}   # md5s -> skill_name, used in lazy mode and for profiling
+        self.skill_search_paths = []   # module search paths skills are loaded from
+        self.module_sigs        = {}   # skill module name -> (mtime, md5) of its source, for hot reload
         
         # import pdb; pdb.set_trace()
 
         if skill_paths:
             for sp in skill_paths[::-1]:
                 sys.path.insert(0,sp)
+                self.skill_search_paths.append(os.path.abspath(sp))
         else:
             # auto-config
 
@@ -213,10 +319,13 @@ class AIKernal(object):
             # .
             sys.path.insert(0, cwd)
 
+            self.skill_search_paths.extend([mp, cwd + '/skills', cwd])
+
         for mp in sys.path:
             logging.debug ("Module search path: %s" % mp)
 
-        self.load_skill(toplevel)
+        if not lazy_skills:
+            self.load_skill(toplevel)
 
         #
         # Prolog engine, data engine
@@ -228,37 +337,68 @@ class AIKernal(object):
         pyxsb_command('import default_sys_error_handler/1 from error_handler.')
         pyxsb_command('assertz((default_user_error_handler(Ball):-default_sys_error_handler(Ball))).')
 
+        # zamia_limit(N, Goal): succeeds at most N times, cuts Goal's choicepoints after the N-th solution.
+        # solutions are counted under a fresh id per call so nested (or interleaved) calls keep their own counters
+
+        pyxsb_command('dynamic(zamia_limit_next/1).')
+        pyxsb_command('dynamic(zamia_limit_cnt/2).')
+        pyxsb_command('assertz(zamia_limit_next(0)).')
+        pyxsb_command('assertz((zamia_limit_id(Id) :- retract(zamia_limit_next(Id)), Id1 is Id+1, assertz(zamia_limit_next(Id1)))).')
+        pyxsb_command('assertz((zamia_limit(N, G) :- N > 0, zamia_limit_id(Id), assertz(zamia_limit_cnt(Id, 0)), '
+                      '(call(G), retract(zamia_limit_cnt(Id, C0)), C is C0+1, '
+                      '(C >= N -> !, retractall(zamia_limit_cnt(Id, _)) ; assertz(zamia_limit_cnt(Id, C))) '
+                      '; retractall(zamia_limit_cnt(Id, _)), fail))).')
+
         #
-        # restore memory
+        # memory (local: owned by this process, sql: shared between kernals)
         #
 
-        q = u''
-        for m in self.session.query(model.Mem):
+        self.mem_ttl        = mem_ttl
+        self.mem_access     = {}         # realm -> time of last access
+        self.mem_last_evict = time.time()
 
-            v = json_to_xsb(m.v)
+        self.mem_backend = create_mem_backend(mem_backend, self, self.session)
+        self.mem_backend.restore()
 
-            if q:
-                q += ', '
-            q += u"assertz(memory('%s', '%s', %s, %f))" % (m.realm, m.k, unicode(v), m.score)
+    def _lang_model_args (self, model_args, lang):
 
-        if not q:
-            q = u'assertz(memory(self, self, self, 1.0))'
-        q += u'.'
-        pyxsb_command(q)
+        """ per-language copy of model_args, {lang} in model_dir is replaced by lang """
+
+        if len(self.langs) > 1 and not '{lang}' in model_args['model_dir']:
+            raise Exception ('model_dir must contain {lang} when serving multiple languages.')
+
+        res = dict(model_args)
+        res['model_dir'] = model_args['model_dir'].replace('{lang}', lang)
+        return res
 
     # FIXME: this will work only on the first call
-    def setup_nlp_model (self, restore=True):
+    def setup_nlp_model (self, restore=True, lang=None, engine=None):
 
-        if self.nlp_model:
-            raise Exception ('Tensorflow model can be set up only once.')
+        """ set up NLP model for lang, or for all served languages if lang is None.
+            engine: keras, numpy or retrieval (inference only), default: engine from nlp model args """
 
-        from nlp_model import NLPModel
+        engine = engine if engine else self.nlp_model_args.get('engine', 'keras')
 
-        self.nlp_model = NLPModel(lang=self.lang, session=self.session, model_args=self.nlp_model_args)
+        if engine == 'numpy':
+            from nlp_inference import NumpyNLPModel as model_class
+        elif engine == 'retrieval':
+            from nlp_retrieval import RetrievalModel as model_class
+        elif engine == 'keras':
+            from nlp_model import NLPModel as model_class
+        else:
+            raise Exception ('unknown nlp model engine: %s' % engine)
 
-        if restore:
-            self.nlp_model.restore()
+        for l in [lang] if lang else self.langs:
 
+            if l in self.nlp_models:
+                raise Exception ('Tensorflow model can be set up only once.')
+
+            self.nlp_models[l] = model_class(lang=l, session=self.session, model_args=self._lang_model_args(self.nlp_model_args, l))
+
+            if restore:
+                self.nlp_models[l].restore()
+
+        self.nn_cache_clear()
 
     def clean (self, skill_names):
 
@@ -267,40 +407,130 @@ class AIKernal(object):
 
         self.session.commit()
 
-    def rreload(self, module):
-        """Recursively reload modules. 
-           https://stackoverflow.com/questions/15506971/recursive-version-of-reload/17194836#17194836"""
+    def _module_source(self, module):
+        fn = getattr(module, '__file__', None)
+        if not fn:
+            return None
+        fn = os.path.abspath(fn)
+        if fn.endswith('.pyc') or fn.endswith('.pyo'):
+            fn = fn[:-1]
+        return fn
+
+    def _is_skill_module(self, module):
+
+        """ True for modules of loaded skills (and their submodules) living in one of the skill
+            search paths - third party and standard library modules are never reloaded """
+
+        if not module.__name__.split('.')[0] in self.skills:
+            return False
+
+        fn = self._module_source(module)
+        if not fn:
+            return False
+        for sp in self.skill_search_paths:
+            if fn.startswith(sp + os.sep):
+                return True
+        return False
 
-        todo = [module]
-        done = set()
+    def _module_changed(self, module):
+
+        """ compare module source against its recorded signature: cheap mtime check first,
+            md5 only if the mtime differs (so touching a file does not trigger a reload).
+            records the new signature. """
+
+        fn = self._module_source(module)
+        if not fn or not os.path.exists(fn):
+            return False
+
+        mtime = os.path.getmtime(fn)
+        sig   = self.module_sigs.get(module.__name__)
+        if sig and sig[0] == mtime:
+            return False
+
+        with open(fn, 'rb') as f:
+            digest = hashlib.md5(f.read()).hexdigest()
+        self.module_sigs[module.__name__] = (mtime, digest)
+
+        return not sig or sig[1] != digest
+
+    def _skill_module_graph(self, module):
+
+        """ module name -> (module obj, names of skill modules it imports), for all skill
+            modules reachable from module """
+
+        graph = {}
+        todo  = [module]
 
         while todo:
-            module = todo.pop()
-            if module in done:
+            m = todo.pop()
+            if m.__name__ in graph:
                 continue
 
-            logging.info('reloading module %s' % module)
+            deps = []
+            for attribute_name in dir(m):
+                attribute = getattr(m, attribute_name)
+                if type(attribute) is ModuleType and self._is_skill_module(attribute):
+                    deps.append(attribute.__name__)
+                    todo.append(attribute)
+
+            graph[m.__name__] = (m, deps)
+
+        return graph
+
+    def reload_skill_modules(self, module):
+
+        """ reload skill modules reachable from module whose source has changed, plus the
+            modules importing them (dependencies first). returns list of reloaded module names """
+
+        graph = self._skill_module_graph(module)
+
+        dirty = set([n for n in graph if self._module_changed(graph[n][0])])
+        if not dirty:
+            logging.debug('skill modules of %s unchanged, no reload needed' % module.__name__)
+            return []
+
+        # importers of changed modules need a reload, too
+
+        grew = True
+        while grew:
+            grew = False
+            for n in graph:
+                if not n in dirty and dirty.intersection(graph[n][1]):
+                    dirty.add(n)
+                    grew = True
+
+        order   = []
+        visited = set()
+
+        def visit(n):
+            if n in visited:
+                return
+            visited.add(n)
+            for d in graph[n][1]:
+                visit(d)
+            if n in dirty:
+                order.append(n)
+
+        visit(module.__name__)
+
+        for n in order:
+
+            logging.info('reloading module %s' % n)
 
             try:
-                reload(module)
+                reload(graph[n][0])
             except:
-                logging.warn('failed to reload skill "%s"' % module)
+                logging.warn('failed to reload skill module "%s"' % n)
                 logging.warn(traceback.format_exc())
 
-            done.add(module)
-
-            for attribute_name in dir(module):
-                attribute = getattr(module, attribute_name)
-                if type(attribute) is ModuleType:
-                    if not (attribute in done):
-                        todo.append(attribute)
+        return order
 
     def load_skill (self, skill_name, do_reload=False):
 
         if skill_name in self.skills:
             m = self.skills[skill_name]
             if do_reload:
-                self.rreload(m)
+                self.reload_skill_modules(m)
             return m
 
         logging.debug("loading skill '%s'" % skill_name)
@@ -318,6 +548,11 @@ class AIKernal(object):
             self.skills[skill_name]      = m
             self.skill_paths[skill_name] = pathname
 
+            # record source signatures so later reloads can tell which modules changed
+
+            for mm, deps in self._skill_module_graph(m).values():
+                self._module_changed(mm)
+
             for m2 in getattr (m, 'DEPENDS'):
                 self.load_skill(m2)
 
@@ -336,6 +571,47 @@ class AIKernal(object):
 
         return m
 
+    def load_all_skills (self):
+        """ load toplevel skill plus all its dependencies (if not done already), returns all_skills """
+        self.load_skill(self.toplevel)
+        return self.all_skills
+
+    def setup_skills (self):
+
+        """ prepare skills for processing input: consult all skills up front or, in lazy
+            mode, nothing at all - skills are consulted the first time their code runs """
+
+        if self.lazy_skills:
+            logging.debug('lazy skill loading enabled.')
+            return
+
+        for skill_name in self.all_skills:
+            self.consult_skill (skill_name)
+
+    def lookup_code_skill (self, md5s):
+
+        """ name of the skill code md5s belongs to, None if unknown """
+
+        skill_name = self.code_skills.get(md5s)
+        if not skill_name:
+            skill_name = self.dte.lookup_code_skill(md5s)
+            if skill_name:
+                self.code_skills[md5s] = skill_name
+
+        return skill_name
+
+    def consult_code_skill (self, md5s):
+
+        """ lazy mode: load and consult the skill code md5s belongs to, plus its dependencies """
+
+        skill_name = self.lookup_code_skill(md5s)
+        if not skill_name:
+            return
+
+        if not skill_name in self.consulted_skills:
+            logging.info ('lazy loading skill %s' % skill_name)
+            self.consult_skill(skill_name)
+
     def consult_skill (self, skill_name):
 
         if skill_name in self.consulted_skills:
@@ -358,14 +634,23 @@ class AIKernal(object):
             for m2 in getattr (m, 'DEPENDS'):
                 self.consult_skill(m2)
 
+            if hasattr(m, 'STATIC_PREDICATES'):
+                for p in m.STATIC_PREDICATES:
+                    self.static_predicates.add(p.split('/')[0])
+
             if hasattr(m, 'PL_SOURCES'):
 
                 for inputfn in m.PL_SOURCES:
 
                     pl_path = "%s/%s" % (skill_dir, inputfn)
 
+                    if self.kb_cache_dir:
+                        pl_path = self.kb_object(pl_path)
+
                     pyxsb_command("consult('%s')."% pl_path)
 
+                self.query_cache_clear()
+
         except:
             logging.error('failed to load skill "%s"' % skill_name)
             logging.error(traceback.format_exc())
@@ -373,6 +658,131 @@ class AIKernal(object):
 
         return m
 
+    def _pl_source (self, pl_path):
+
+        """ resolve a prolog source path the way XSB's consult() does: the path as given, then .P, then .pl """
+
+        for fn in [pl_path, pl_path + '.P', pl_path + '.pl']:
+            if os.path.isfile(fn):
+                return fn
+
+        raise Exception ('prolog source %s not found.' % pl_path)
+
+    def _pl_dependencies (self, pl_path, res=None):
+
+        """ pl_path plus the local files it includes / consults (recursively), in load order.
+            library modules and files that can not be resolved are left out """
+
+        if res is None:
+            res = []
+
+        res.append(pl_path)
+
+        with codecs.open(pl_path, 'r', 'utf8') as f:
+            src = f.read()
+
+        for m in PL_LOAD_DIRECTIVE_RE.finditer(src):
+            for fn in m.group(1).strip('[]').split(','):
+                fn = fn.strip().strip('\'"')
+                if not fn:
+                    continue
+                try:
+                    dep = self._pl_source(os.path.join(os.path.dirname(pl_path), fn))
+                except Exception:
+                    continue
+                if not dep in res:
+                    self._pl_dependencies(dep, res)
+
+        return res
+
+    def kb_object (self, pl_path):
+
+        """ precompiled object of prolog source pl_path in the KB cache, keyed by the md5
+            of the source and the files it includes so unchanged sources are never compiled
+            twice. compiled on demand, returns the object path without extension (consult()
+            loads the .xwam directly since there is no source next to it) """
+
+        pl_path = self._pl_source(pl_path)
+
+        digest = hashlib.md5()
+        for fn in self._pl_dependencies(pl_path):
+            with open(fn, 'rb') as f:
+                digest.update(hashlib.md5(f.read()).digest())
+
+        obj = os.path.join(os.path.abspath(self.kb_cache_dir), KB_OBJECT_PREFIX + digest.hexdigest())
+
+        if not os.path.exists(obj + '.xwam'):
+
+            # the source is compiled where it is, so relative includes and the module
+            # name are the same as when consulting it. the lock keeps concurrent workers
+            # from compiling the same source at the same time
+
+            with open(os.path.join(self.kb_cache_dir, KB_LOCK_FN), 'w') as lock:
+
+                fcntl.flock(lock, fcntl.LOCK_EX)
+
+                if not os.path.exists(obj + '.xwam'):
+
+                    logging.info ('compiling %s -> %s.xwam' % (pl_path, obj))
+
+                    src_obj = os.path.splitext(pl_path)[0] + '.xwam'
+                    existed = os.path.exists(src_obj)
+
+                    pyxsb_command(u'compile(%s).' % pl_quote(pl_path))
+
+                    # copy under a temporary name so workers never load a partial object
+
+                    tmp = '%s_%d.xwam' % (obj, os.getpid())
+                    shutil.copyfile(src_obj, tmp)
+                    os.rename(tmp, obj + '.xwam')
+
+                    if not existed:
+                        os.remove(src_obj)
+
+        return obj
+
+    def skill_pl_sources (self, skill_name, res=None):
+
+        """ prolog source paths of skill and its dependencies in consult order """
+
+        if res is None:
+            res = []
+
+        m = self.load_skill(skill_name)
+
+        for m2 in getattr (m, 'DEPENDS'):
+            self.skill_pl_sources(m2, res)
+
+        for inputfn in getattr(m, 'PL_SOURCES', []):
+            pl_path = "%s/%s" % (self.skill_paths[skill_name], inputfn)
+            if not pl_path in res:
+                res.append(pl_path)
+
+        return res
+
+    def kb_cache_build (self, skill_names, prune=False):
+
+        """ precompile the prolog sources of skills (plus dependencies) into the KB cache,
+            prune removes cached objects not belonging to any of the current sources """
+
+        if not self.kb_cache_dir:
+            raise Exception ('kb_cache_dir is not configured.')
+
+        objs = set()
+        for skill_name in skill_names:
+            for pl_path in self.skill_pl_sources(skill_name):
+                objs.add(os.path.basename(self.kb_object(pl_path)) + '.xwam')
+
+        cnt_pruned = 0
+        if prune:
+            for fn in os.listdir(self.kb_cache_dir):
+                if _KB_OBJECT_RE.match(fn) and not fn in objs:
+                    logging.info ('pruning stale KB object %s' % fn)
+                    os.remove(os.path.join(self.kb_cache_dir, fn))
+                    cnt_pruned += 1
+
+        return len(objs), cnt_pruned
+
     def compile_skill (self, skill_name):
 
         m = self.load_skill(skill_name, do_reload=True)
@@ -380,6 +790,7 @@ class AIKernal(object):
         # tell prolog engine to consult all prolog files plus their dependencies
 
         self.consult_skill(skill_name)
+        self.query_cache_clear()
 
         # prepare data engine for skill compilation
 
@@ -390,7 +801,11 @@ class AIKernal(object):
             logging.info ('skill %s data extraction...' % skill_name)
 
             get_data = getattr(m, 'get_data')
-            get_data(self)
+            self.current_skill = skill_name
+            try:
+                get_data(self)
+            finally:
+                self.current_skill = None
 
         self.dte.commit()
 
@@ -401,14 +816,17 @@ class AIKernal(object):
 
         for skill_name in skill_names:
             if skill_name == 'all':
-                for mn2 in self.all_skills:
+                for mn2 in self.load_all_skills():
                     self.compile_skill (mn2)
 
             else:
                 self.compile_skill (skill_name)
 
-    def create_context (self, user=DEFAULT_USER, realm=DEFAULT_REALM, test_mode=False):
-        return AIContext(user, self.session, self.lang, realm, self, test_mode=test_mode)
+    def create_context (self, user=DEFAULT_USER, realm=DEFAULT_REALM, test_mode=False, lang=None):
+        lang = lang if lang else self.lang
+        if not test_mode and not lang in self.langs:
+            raise Exception ('language %s is not served by this kernal.' % lang)
+        return AIContext(user, self.session, lang, realm, self, test_mode=test_mode)
 
     def test_skill (self, skill_name, run_trace=False, test_name=None):
 
@@ -418,20 +836,21 @@ class AIKernal(object):
             pyxsb_command("notrace.")
 
         m = self.skills[skill_name]
+        self.current_skill = skill_name
 
         logging.info('running tests of skill %s ...' % (skill_name))
 
         num_tests = 0
         num_fails = 0
         for tc in self.dte.lookup_tests(skill_name):
-            t_name, self.lang, prep_code, prep_fn, rounds, src_fn, self.src_line = tc
+            t_name, t_lang, prep_code, prep_fn, rounds, src_fn, self.src_line = tc
 
             if test_name:
                 if t_name != test_name:
                     logging.info ('skipping test %s' % t_name)
                     continue
 
-            ctx        = self.create_context(user=TEST_USER, realm=TEST_REALM, test_mode=True)
+            ctx        = self.create_context(user=TEST_USER, realm=TEST_REALM, test_mode=True, lang=t_lang)
             round_num  = 0
             num_tests += 1
 
@@ -460,7 +879,7 @@ class AIKernal(object):
                 ctx.set_inp(test_inp)
                 self.mem_set (ctx.realm, 'action', None)
 
-                for lang, d, md5s, args, src_fn, src_line in self.dte.lookup_data_train (test_inp, self.lang):
+                for lang, d, md5s, args, src_fn, src_line in self.dte.lookup_data_train (test_inp, t_lang):
 
                     afn, acode = self.dte.lookup_code(md5s)
                     ecode = '%s\n%s(ctx' % (acode, afn)
@@ -469,11 +888,14 @@ class AIKernal(object):
                             ecode += ',%s' % repr(arg)
                     ecode += ')\n'
                     # import pdb; pdb.set_trace()
+                    n_resps = ctx.num_resps
+                    t0      = time.time()
                     try:
                         exec (ecode, globals(), locals())
                     except:
                         logging.error('test_skill: %s round %d EXCEPTION CAUGHT %s' % (t_name, round_num, traceback.format_exc()))
                         logging.error(ecode)
+                    self.code_stats.record(md5s, time.time()-t0, ctx.num_resps-n_resps)
 
                 if acode is None:
                     logging.error (u'Error: %s: no training data for test_in "%s" found in DB!' % (t_name, test_inp))
@@ -488,7 +910,7 @@ class AIKernal(object):
 
                     if len(test_out) > 0:
                         if len(actual_out)>0:
-                            actual_out = u' '.join(tokenize(actual_out, self.lang))
+                            actual_out = u' '.join(tokenize(actual_out, t_lang))
                         logging.info("test_skill: %s round %d actual_out  : %s (score: %f)" % (t_name, round_num, actual_out, score) )
                         if actual_out != test_out:
                             logging.info("test_skill: %s round %d UTTERANCE MISMATCH." % (t_name, round_num))
@@ -506,6 +928,7 @@ class AIKernal(object):
                         if test_action_arg:
                             ecode += ',%s' % repr(test_action_arg)
                         ecode += ')\n'
+                        # test harness code, not part of any answer path: not profiled
                         exec (ecode, globals(), locals())
 
                     break
@@ -517,6 +940,8 @@ class AIKernal(object):
 
                 round_num   += 1
 
+        self.current_skill = None
+
         return num_tests, num_fails
 
     def run_tests_multi (self, skill_names, run_trace=False, test_name=None):
@@ -528,7 +953,7 @@ class AIKernal(object):
 
             if skill_name == 'all':
 
-                for mn2 in self.all_skills:
+                for mn2 in self.load_all_skills():
                     self.consult_skill (mn2)
                     n, f = self.test_skill (mn2, run_trace=run_trace, test_name=test_name)
                     num_tests += n
@@ -543,15 +968,42 @@ class AIKernal(object):
         return num_tests, num_fails
 
 
+    def record_timing (self, ctx, stage, dt, detail=None):
+
+        """ account dt seconds spent in stage, both in the per-call breakdown of ctx and the kernal histograms """
+
+        if ctx:
+            ctx.timings.append((stage, detail, dt))
+        self.stage_stats.record(stage, dt)
+
+    def get_stage_stats (self):
+        return self.stage_stats
+
+    def reset_stage_stats (self):
+        self.stage_stats.reset()
+
+    def code_profile_report (self, limit=0):
+        """ wall time and c.resp() calls per executed code snippet, slowest first """
+        return self.code_stats.report(self.dte.lookup_code_location, limit=limit)
+
+    def code_profile_reset (self):
+        self.code_stats.reset()
+
     def process_input (self, ctx, inp_raw, run_trace=False, do_eliza=True):
 
         """ process user input, return score, responses, actions, solutions, context """
 
+        t_start = time.time()
+        ctx.timings     = []
+        ctx.answer_path = None
+
         if run_trace:
             pyxsb_command("trace.")
         else:
             pyxsb_command("notrace.")
 
+        t0 = time.time()
+
         tokens_raw  = tokenize(inp_raw, ctx.lang)
         tokens = []
         for t in tokens_raw:
@@ -560,7 +1012,15 @@ class AIKernal(object):
             tokens.append(t)
         inp = u" ".join(tokens)
 
+        self.record_timing(ctx, 'tokenize', time.time()-t0)
+
         ctx.set_inp(inp)
+
+        self.mem_touch(ctx.realm)
+        self.mem_touch(ctx.user)
+        if self.mem_ttl and time.time() - self.mem_last_evict > MEM_EVICT_INTERVAL:
+            self.mem_evict()
+
         self.mem_set (ctx.realm, 'action', None)
 
         logging.debug('===============================================================================')
@@ -570,10 +1030,17 @@ class AIKernal(object):
         # do we have an exact match in our training data for this input?
         #
 
+        t0 = time.time()
+        tds = self.dte.lookup_data_train (inp, ctx.lang)
+        self.record_timing(ctx, 'lookup', time.time()-t0)
+
         found_resp = False
-        for lang, d, md5s, args, src_fn, src_line in self.dte.lookup_data_train (inp, ctx.lang):
+        for lang, d, md5s, args, src_fn, src_line in tds:
 
+            t0 = time.time()
             afn, acode = self.dte.lookup_code(md5s)
+            self.record_timing(ctx, 'code_lookup', time.time()-t0, md5s)
+
             ecode = '%s\n%s(ctx' % (acode, afn)
             if args:
                 for arg in args:
@@ -584,24 +1051,38 @@ class AIKernal(object):
             logging.debug (ecode)
 
             # import pdb; pdb.set_trace()
+            if self.lazy_skills:
+                self.consult_code_skill(md5s)
+            if self.prolog_profiling:
+                self.current_skill = self.lookup_code_skill(md5s)
+            n_resps = ctx.num_resps
+            t0      = time.time()
             try:
                 exec (ecode, globals(), locals())
                 found_resp = True
             except:
                 logging.error('EXCEPTION CAUGHT %s' % traceback.format_exc())
                 logging.error(ecode)
+            dt = time.time()-t0
+            self.record_timing(ctx, 'exec', dt, md5s)
+            self.code_stats.record(md5s, dt, ctx.num_resps-n_resps)
 
         if not found_resp:
             logging.debug('no exact training data match for this input found.')
 
+        resps = ctx.get_resps()
+        if resps:
+            ctx.answer_path = 'exact'
+
         #
         # ask neural net if we did not find an answer
         #
 
-        resps = ctx.get_resps()
-        if not resps and self.nlp_model:
+        nlp_model = self.nlp_models.get(ctx.lang)
+
+        if not resps and nlp_model:
             
-            from nlp_model import _START, _STOP, _OR
+            from nlp_inference import split_commands
 
             logging.debug('trying neural net on: %s' % repr(inp))
 
@@ -611,41 +1092,26 @@ class AIKernal(object):
 
                 # import pdb; pdb.set_trace()
 
-                predicted_ids = self.nlp_model.predict(inp)
-
-                # x = self.nlp_model.compute_x(inp)
-
-                # # logging.debug("x: %s -> %s" % (utterance, x))
+                t0 = time.time()
+                hyps = self.nn_predict(nlp_model, ctx.lang, tokens)
+                self.record_timing(ctx, 'nn_predict', time.time()-t0)
 
-                # source, source_len, dest, dest_len = self.nlp_model._prepare_batch ([[x, []]], offset=0)
+                # run the codes of each hypothesis (best first) until one of them yields responses,
+                # codes already tried for a better hypothesis are skipped
 
-                # # predicted_ids: GreedyDecoder; [batch_size, max_time_step, 1]
-                # # BeamSearchDecoder; [batch_size, max_time_step, beam_width]
-                # predicted_ids = self.tf_model.predict(self.tf_session, encoder_inputs=source, 
-                #                                       encoder_inputs_length=source_len)
+                tried = set()
+                for score, predicted_ids in hyps:
 
-                # # for seq_batch in predicted_ids:
-                # #     for k in range(5):
-                # #         logging.debug('--------- k: %d ----------' % k)
-                # #         seq = seq_batch[:,k]
-                # #         for p in seq:
-                # #             if p == -1:
-                # #                 break
-                # #             decoded = self.inv_output_dict[p]
-                # #             logging.debug (u'%s: %s' %(p, decoded))
+                    logging.debug('hypothesis %f: %s' % (score, repr(predicted_ids)))
 
-                # extract best codes, run them all to see which ones yield the highest scoring responses
+                    for cmd in split_commands(predicted_ids):
 
-                cmd = []
-                # for p in predicted_ids[0][:,0]:
-                for decoded in predicted_ids:
-                    # if p in self.inv_output_dict:
-                    #     decoded = self.inv_output_dict[p]
-                    # else:
-                    #     decoded = p
-
-                    if decoded == _STOP or decoded == _OR:
+                        if cmd in tried:
+                            continue
+                        tried.add(cmd)
 
+                        n_resps = ctx.num_resps
+                        t0      = time.time()
                         try:
                             logging.debug('trying cmd: %s' % repr(cmd))
                             afn, acode = self.dte.lookup_code(cmd[0])
@@ -657,21 +1123,29 @@ class AIKernal(object):
 
                             logging.debug(ecode)
 
+                            if self.lazy_skills:
+                                self.consult_code_skill(cmd[0])
+                            if self.prolog_profiling:
+                                self.current_skill = self.lookup_code_skill(cmd[0])
                             exec (ecode, globals(), locals())
                         except:
                             logging.debug('EXCEPTION CAUGHT %s' % traceback.format_exc())
+                        dt = time.time()-t0
+                        self.record_timing(ctx, 'nn_exec', dt, cmd[0])
+                        self.code_stats.record(cmd[0], dt, ctx.num_resps-n_resps)
 
-                        cmd = []
-                        if decoded == _STOP:
-                            break
-                    else:
-                        cmd.append(decoded)
+                    if ctx.get_resps():
+                        break
 
             except:
                 # probably ok (prolog code generated by neural network might not always work)
                 logging.error('EXCEPTION CAUGHT %s' % traceback.format_exc())
 
+            if ctx.get_resps():
+                ctx.answer_path = 'nn'
+
         pyxsb_command("notrace.")
+        self.current_skill = None
 
         #
         # extract highest-scoring responses
@@ -682,9 +1156,17 @@ class AIKernal(object):
         if not resps and do_eliza:
             logging.debug ('producing ELIZA-style response for input %s' % inp)
 
+            t0 = time.time()
+            if self.lazy_skills:
+                self.consult_skill('psychology')
             from psychology import psychology
+            self.current_skill = 'psychology'
             psychology.do_eliza(ctx)
+            self.current_skill = None
+            self.record_timing(ctx, 'eliza', time.time()-t0)
             resps = ctx.get_resps()
+            if resps:
+                ctx.answer_path = 'eliza'
 
         #
         # pick random response
@@ -693,18 +1175,22 @@ class AIKernal(object):
         if len(resps)>0:
             i = random.randrange(0, len(resps))
             out, score, action, action_arg = resps[i]
+
+            t0 = time.time()
             ctx.commit_resp(i)
+            self.record_timing(ctx, 'commit', time.time()-t0)
 
             logging.debug(u'picked resp #%d (score: %f): %s' % (i, score, out))
 
-            logging.debug(u'MEM: %s' % ctx.realm)
-            memd = self.mem_dump(ctx.realm)
-            for k, v, score in memd:
-                logging.debug(u'MEM:    %-20s: %s (%f)' % (k, v, score))
-            logging.debug(u'MEM: %s' % ctx.user)
-            memd = self.mem_dump(ctx.user)
-            for k, v, score in memd:
-                logging.debug(u'MEM:    %-20s: %s (%f)' % (k, v, score))
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug(u'MEM: %s' % ctx.realm)
+                memd = self.mem_dump(ctx.realm)
+                for k, v, score in memd:
+                    logging.debug(u'MEM:    %-20s: %s (%f)' % (k, v, score))
+                logging.debug(u'MEM: %s' % ctx.user)
+                memd = self.mem_dump(ctx.user)
+                for k, v, score in memd:
+                    logging.debug(u'MEM:    %-20s: %s (%f)' % (k, v, score))
 
         else:
             out        = u''
@@ -712,12 +1198,128 @@ class AIKernal(object):
             logging.debug(u'No response found.')
 
         action = self.mem_get (ctx.realm, 'action')
+
+        if not ctx.answer_path:
+            ctx.answer_path = 'none'
+        self.stage_stats.count_path(ctx.answer_path)
+        self.record_timing(ctx, 'total', time.time()-t_start)
+
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(u'process_input timings (path: %s):' % ctx.answer_path)
+            for stage, detail, dt in ctx.timings:
+                logging.debug(u'    %-12s %9.2fms %s' % (stage, dt*1000.0, detail if detail else ''))
+
         return out, score, action
 
-    def train (self, num_epochs=DEFAULT_NUM_EPOCHS, incremental=False):
+    def train (self, num_epochs=DEFAULT_NUM_EPOCHS, incremental=False, lang=None):
+
+        lang = lang if lang else self.lang
+
+        self.setup_nlp_model (restore=incremental, lang=lang, engine='keras')
+        self.nlp_models[lang].train(num_epochs, incremental)
+        self.nn_cache_clear()
+
+    def nlp_export (self, lang=None):
+
+        """ export trained NLP model weights for the numpy inference engine """
+
+        lang = lang if lang else self.lang
+
+        self.setup_nlp_model (restore=True, lang=lang, engine='keras')
+        self.nlp_models[lang].export_numpy()
+
+    def retrieval_build (self, lang=None):
+
+        """ build the embedding retrieval index (engine = retrieval) from the training data """
+
+        from nlp_retrieval import RetrievalModel
+
+        lang = lang if lang else self.lang
+
+        retrieval_model = RetrievalModel(lang=lang, session=self.session, model_args=self._lang_model_args(self.nlp_model_args, lang))
+        retrieval_model.build()
+
+        if isinstance(self.nlp_models.get(lang), RetrievalModel):
+            self.nlp_models[lang].restore()
+            self.nn_cache_clear()
+
+    def nn_eval (self, lang=None, holdout=False):
+
+        """ evaluate the NN fallback (engine from nlp model args) on the inputs of all test cases of lang:
+            an input counts as a hit if its best hypothesis (best: any of the beam_width ones) contains
+            a command of its exact training data match.
+            holdout: leave-one-out, training inputs identical to the test input are ignored
+            (retrieval engine only, the seq2seq models have seen them in training)
+            returns num_inputs, num_best, num_any, seconds per input """
+
+        from nlp_inference import split_commands
+
+        lang = lang if lang else self.lang
+
+        if not lang in self.nlp_models:
+            self.setup_nlp_model(lang=lang)
+        nlp_model = self.nlp_models[lang]
+
+        inps     = []
+        expected = []
+        for tc in self.session.query(model.TestCase).filter(model.TestCase.lang==lang):
+            for test_inp, test_out, test_action, test_action_arg in json.loads(tc.rounds):
+                cmds = set()
+                for l, d, md5s, args, src_fn, src_line in self.dte.lookup_data_train (test_inp, lang):
+                    cmds.add(tuple([md5s] + [json.dumps(arg) for arg in args]))
+                if cmds:
+                    inps.append(test_inp)
+                    expected.append(cmds)
+
+        beam_width = self.nlp_model_args.get('beam_width', 1)
+
+        t0 = time.time()
+        if holdout:
+            from nlp_retrieval import RetrievalModel
+            if not isinstance(nlp_model, RetrievalModel):
+                raise Exception ('holdout evaluation is supported by the retrieval engine only.')
+            hyps = nlp_model.predict_batch(inps, beam_width=beam_width, holdout=True)
+        else:
+            hyps = nlp_model.predict_batch(inps, beam_width=beam_width)
+        dt = time.time() - t0
+
+        num_best = 0
+        num_any  = 0
+        for inp, cmds, inp_hyps in zip(inps, expected, hyps):
+
+            found = [bool(cmds.intersection(split_commands(decoded))) for score, decoded in inp_hyps]
 
-        self.setup_nlp_model (restore=incremental)
-        self.nlp_model.train(num_epochs, incremental)
+            if found and found[0]:
+                num_best += 1
+            if any(found):
+                num_any += 1
+            else:
+                logging.debug('nn_eval miss: %s' % repr(inp))
+
+        return len(inps), num_best, num_any, dt / len(inps) if inps else 0.0
+
+    def build_embeddings (self, lang=None, num_extra=0):
+
+        """ build pruned word embeddings for lang (default: kernal lang) restricted to the tokens
+            of its training data plus the num_extra most frequent words """
+
+        from word_embeddings import build_pruned_embeddings
+
+        lang = lang if lang else self.lang
+
+        words = set()
+        for td in self.session.query(model.TrainingData).filter(model.TrainingData.lang==lang):
+            for token in tokenize(td.inp, lang=lang):
+                words.add(unicode(token))
+
+        logging.info ('training data vocabulary (%s): %d words' % (lang, len(words)))
+
+        model_dirs = set([self._lang_model_args(self.nlp_model_args, lang)['model_dir'],
+                          self._lang_model_args(self.uttclass_model_args, lang)['model_dir']])
+
+        for model_dir in sorted(model_dirs):
+            num_words, num_oov = build_pruned_embeddings(model_dir, words, num_extra=num_extra)
+            logging.info ('%s: %d words in pruned embeddings, %d training data words have no vector.' % (model_dir, num_words, num_oov))
 
     def dump_utterances (self, num_utterances, dictfn, skill):
 
@@ -785,7 +1387,7 @@ class AIKernal(object):
 
         stats = {}
 
-        for skill_name in self.all_skills:    
+        for skill_name in self.load_all_skills():    
             stats[skill_name] = {}
             for lang in LANGUAGES:
                 cnt = self.session.query(model.TrainingData).filter(model.TrainingData.skill==skill_name,
@@ -794,10 +1396,80 @@ class AIKernal(object):
 
         return stats
 
+    def mem_restore(self, batch_size=DEFAULT_MEM_RESTORE_BATCH):
+
+        """ assert persisted memory entries into the prolog KB. rows are streamed from the
+            db in chunks and asserted in bounded batches, so neither python nor XSB ever
+            have to handle the whole memory in one piece """
+
+        t0       = time.time()
+        t_report = t0
+        total    = self.session.query(model.Mem).count()
+
+        logging.debug ('restoring %d memory entries...' % total)
+
+        cnt   = 0
+        batch = []
+        for m in self.session.query(model.Mem).yield_per(batch_size):
+
+            batch.append(u"assertz(%s)" % pl_goal('memory', [m.realm, m.k, json_to_xsb(m.v), m.score]))
+
+            if len(batch) >= batch_size:
+                pyxsb_command(u', '.join(batch) + u'.')
+                cnt  += len(batch)
+                batch = []
+
+                if time.time() - t_report > MEM_RESTORE_REPORT_INTERVAL:
+                    t_report = time.time()
+                    logging.info ('restoring memory: %d/%d entries, %.1fs' % (cnt, total, t_report - t0))
+
+        if batch:
+            pyxsb_command(u', '.join(batch) + u'.')
+            cnt += len(batch)
+
+        if not cnt:
+            pyxsb_command(u'assertz(memory(self, self, self, 1.0)).')
+
+        logging.info ('restoring memory done: %d entries in %.2fs' % (cnt, time.time() - t0))
+
+    def mem_touch(self, realm):
+        """ make sure realm's memory is in the KB (re-hydrate it if evicted), record access time """
+        self.mem_backend.load(realm)
+        self.mem_access[realm] = time.time()
+
+    def mem_evict(self, ttl=None):
+
+        """ drop memory of realms not accessed for ttl (default: mem_ttl) seconds from the KB.
+            pending changes are persisted first, evicted realms are re-hydrated from the
+            db on their next access. returns list of evicted realms """
+
+        ttl = ttl if ttl is not None else self.mem_ttl
+
+        now     = time.time()
+        evicted = []
+        for realm, t in list(self.mem_access.items()):
+
+            if now - t < ttl:
+                continue
+
+            self.mem_backend.evict(realm)
+            self.prolog_query(u"retractall(%s)." % pl_goal('memory', [realm, Var(), Var(), Var()]))
+
+            del self.mem_access[realm]
+            evicted.append(realm)
+
+        self.mem_last_evict = now
+
+        if evicted:
+            logging.info ('evicted memory of %d inactive realm(s), %d realm(s) active.' % (len(evicted), len(self.mem_access)))
+
+        return evicted
+
     def mem_clear(self, realm):
         if not isinstance(realm, basestring):
             raise Exception ("mem_set: realm must be string-typed.")
-        q = u"retractall(memory('%s', _, _, _))." % realm
+        self.mem_backend.changed_realm(realm)
+        q = u"retractall(%s)." % pl_goal('memory', [realm, Var(), Var(), Var()])
         # logging.debug (q)
         self.prolog_query(q)
 
@@ -807,9 +1479,7 @@ class AIKernal(object):
 
         entries = []
 
-        q = u"memory('%s', K, V, S)." % realm
-        # logging.debug (q)
-        res = self.prolog_query(q)
+        res = self.query('memory', [realm, Var('K'), Var('V'), Var('S')])
         if res:
             for r in res:
                 k     = r[0]
@@ -824,22 +1494,13 @@ class AIKernal(object):
         if not isinstance(realm, basestring) or not isinstance(k, basestring):
             raise Exception ("mem_set: realm and key must be string-typed.")
 
-        q = u"retractall(memory('%s', '%s', _, _))" % (realm, k)
-        if v:
-            q += u", assertz(memory('%s', '%s', %s, 1.0))." % (realm, k, unicode(v))
-        else:
-            q += '.' 
-        # logging.debug (q)
-
-        self.prolog_query(q)
+        self.mem_put(realm, k, [(v, 1.0)] if v else [])
 
     def mem_get(self, realm, k):
         if not isinstance(realm, basestring) or not isinstance(k, basestring):
             raise Exception ("mem_set: realm and key must be string-typed.")
 
-        q = u"memory('%s', '%s', V, S)." % (realm, k)
-        # logging.debug (q)
-        res = self.prolog_query(q)
+        res = self.query('memory', [realm, k, Var('V'), Var('S')])
         if not res:
             return None
 
@@ -858,9 +1519,7 @@ class AIKernal(object):
 
         entries = []
 
-        q = u"memory('%s', '%s', V, S)." % (realm, k)
-        # logging.debug (q)
-        res = self.prolog_query(q)
+        res = self.query('memory', [realm, k, Var('V'), Var('S')])
         if res:
             for r in res:
                 score = r[1]
@@ -873,92 +1532,301 @@ class AIKernal(object):
         if not isinstance(realm, basestring) or not isinstance(k, basestring):
             raise Exception ("mem_set: realm and key must be string-typed.")
 
-        entries = [(1.0, v)]
+        entries = [(v, 1.0)]
+
+        self.mem_backend.changed(realm, k)
 
         # re-score existing entries
 
-        q = u"memory('%s', '%s', V, S)." % (realm, k)
-        # logging.debug (q)
-        res = self.prolog_query(q)
+        res = self.query('memory', [realm, k, Var('V'), Var('S')])
         if res:
             for r in res:
                 score = r[1]
                 v     = r[0]
                 if score < 0.125:
                     continue
-                entries.append((score/2, v))
+                entries.append((v, score/2))
+
+        self.mem_put(realm, k, entries)
+
+    def mem_put (self, realm, k, entries, track=True):
 
-        # put all entries into the KB
-        q = u"retractall(memory('%s', '%s', _, _))" % (realm, k)
-        for score, v in entries:
+        """ replace all entries of realm/k by entries, a list of (v, score) tuples.
+            track: report the change to the memory backend (before it is made) """
+
+        if track:
+            self.mem_backend.changed(realm, k)
+
+        q = u"retractall(%s)" % pl_goal('memory', [realm, k, Var(), Var()])
+        for v, score in entries:
             if v:
-                q += u", assertz(memory('%s', '%s', %s, %f))" % (realm, k, unicode(v), score)
+                q += u", assertz(%s)" % pl_goal('memory', [realm, k, v, score])
         q += u'.'
         # logging.debug (q)
 
         self.prolog_query(q)
 
+    def _is_static_query(self, query):
+        functors = pl_functors(query)
+        if not functors:
+            return False
+        # arity 0 goals have no functor call syntax, any but the control atoms may be dynamic
+        if pl_atom_goals(query, CACHE_META_PREDICATES) - CACHE_META_PREDICATES:
+            return False
+        for f in functors:
+            if not f in self.static_predicates and not f in CACHE_META_PREDICATES:
+                return False
+        return True
+
+    def nn_cache_clear(self):
+        if self.nn_cache is not None:
+            self.nn_cache.clear()
+
+    def nn_predict(self, nlp_model, lang, tokens):
+
+        """ decoded (score, tokens) hypotheses for an input, best first, cached per model version """
+
+        key = (lang, tuple(tokens), nlp_model.version)
+
+        if self.nn_cache is not None:
+            hyps = self.nn_cache.get(key)
+            if hyps is not None:
+                return hyps
+
+        hyps = nlp_model.predict_batch([u' '.join(tokens)], beam_width=self.nlp_model_args.get('beam_width', 1))[0]
+
+        if self.nn_cache is not None:
+            self.nn_cache.put(key, hyps)
+
+        return hyps
+
+    def query_cache_clear(self):
+        if self.query_cache is not None:
+            self.query_cache.clear()
+        self.label_index    = None
+        self.label_entities = None
+
+    def _entity_key(self, entity):
+        return entity.name if hasattr(entity, 'name') else unicode(entity)
+
+    def _label_text(self, label):
+        return label.value if hasattr(label, 'value') else unicode(label)
+
+    def build_label_index(self):
+
+        """ build in-process index of all rdfsLabel/3 facts of the consulted KB """
+
+        logging.info('building rdfsLabel index...')
+
+        self.label_index    = {}
+        self.label_entities = {}
+
+        cnt = 0
+        for e, lang, label in pyxsb_query('rdfsLabel(E, LANG, L).'):
+
+            ek = self._entity_key(e)
+            lk = self._entity_key(lang)
+
+            if not ek in self.label_index:
+                self.label_index[ek] = {}
+            if not lk in self.label_index[ek]:
+                self.label_index[ek][lk] = label   # first solution, like query_one
+
+            lt = self._label_text(label)
+            if not lt in self.label_entities:
+                self.label_entities[lt] = set()
+            self.label_entities[lt].add(ek)
+
+            cnt += 1
+
+        logging.info('building rdfsLabel index done. %d labels of %d entities.' % (cnt, len(self.label_index)))
+
+    def label(self, entity, lang):
+
+        """ rdfsLabel lookup, served from the label index if enabled (label_index in zamiaai.ini) """
+
+        if not self.use_label_index:
+            return self.query_one('rdfsLabel', [entity, lang, Var('L')])
+
+        if self.label_index is None:
+            self.build_label_index()
+
+        ll = self.label_index.get(self._entity_key(entity))
+        if not ll:
+            return None
+        return ll.get(self._entity_key(lang))
+
+    def lookup_label_entities(self, label):
+
+        """ reverse rdfsLabel lookup: set of entities carrying label (in any language) """
+
+        if isinstance(label, basestring):
+            label = XSBString(label)
+
+        if not self.use_label_index:
+            return set([self._entity_key(r[0]) for r in self.query('rdfsLabel', [Var('E'), Var('LANG'), label])])
+
+        if self.label_index is None:
+            self.build_label_index()
+
+        return self.label_entities.get(self._label_text(label), set())
+
+    def _pyxsb_query(self, query):
+
+        # queries over static KB predicates only are answered from the cache
+        # (solution lists are shared between callers and must not be modified)
+
+        if self.prolog_profiling:
+            t0 = time.time()
+
+        cacheable = self.query_cache is not None and self._is_static_query(query)
+        res       = self.query_cache.get(query, _MISS) if cacheable else _MISS
+        cached    = res is not _MISS
+
+        if not cached:
+            res = pyxsb_query(query)
+            if cacheable:
+                self.query_cache.put(query, res)
+
+        # cache hits are profiled as well (and counted separately)
+
+        if self.prolog_profiling:
+            self.prolog_profiler.record(query, self.current_skill, time.time()-t0, len(res) if res else 0, cached=cached)
+
+        return res
+
+    def prolog_profile(self, enable=True):
+        """ enable/disable per-pattern profiling of prolog_query, prolog_query_one and prolog_check calls """
+        self.prolog_profiling = enable
+
+    def prolog_profile_reset(self):
+        self.prolog_profiler.reset()
+
+    def prolog_profile_report(self, limit=0):
+        return self.prolog_profiler.report(limit=limit)
+
     def prolog_query(self, query):
+        """ list of solutions (lists of variable bindings) of query. results of cached static queries
+            are returned by reference: callers must copy them before modifying them """
         logging.debug ('prolog_query: %s' % query)
-        return pyxsb_query(query)
+        return self._pyxsb_query(query)
+
+    def query(self, functor, args):
+        """ parameterized query, e.g. kernal.query('rdfsLabel', [entity, lang, Var('L')]), 
+            returns all solutions like prolog_query """
+        return self.prolog_query(pl_goal(functor, args) + u'.')
+
+    def query_first(self, functor, args):
+        return self.prolog_query_first(pl_goal(functor, args) + u'.')
+
+    def query_one(self, functor, args, idx=0):
+        return self.prolog_query_one(pl_goal(functor, args) + u'.', idx=idx)
+
+    def query_check(self, functor, args):
+        return self.prolog_check(pl_goal(functor, args) + u'.')
+
+    def _pl_goal(self, query):
+        """ strip terminating full stop so query can be wrapped in a meta-call """
+        query = query.rstrip()
+        if query.endswith('.'):
+            query = query[:-1]
+        return query
+
+    def prolog_query_first(self, query):
+        """ like prolog_query, but stop after the first solution (empty list if there is none) """
+        logging.debug ('prolog_query_first: %s' % query)
+        res = self._pyxsb_query(u'once((%s)).' % self._pl_goal(query))
+        return res if res else []
+
+    def prolog_query_limit(self, query, limit):
+        """ like prolog_query, but stop after limit solutions """
+        logging.debug ('prolog_query_limit: %d %s' % (limit, query))
+        if limit < 1:
+            return []
+        if limit == 1:
+            return self.prolog_query_first(query)
+        res = self._pyxsb_query(u'zamia_limit(%d, (%s)).' % (limit, self._pl_goal(query)))
+        return res if res else []
+
+    def prolog_query_multi(self, queries, first=False):
+
+        """ run independent queries in a single XSB round trip, returns one solution
+            list per query (first solution or None per query if first is set), e.g.
+
+            hl, bp = kernal.prolog_query_multi(['rdfsLabel(wdeAngelaMerkel, en, L).', 
+                                                'wdpdPlaceOfBirth(wdeAngelaMerkel, BP).'], first=True) """
+
+        logging.debug ('prolog_query_multi: %s' % repr(queries))
+
+        if not queries:
+            return []
+
+        # one findall per query collecting the bindings of its variables,
+        # ZAMIA_MULTI comes first so its binding is the first one returned
+
+        goals = []
+        rvars = []
+        for i, query in enumerate(queries):
+            goal = self._pl_goal(query)
+            if first:
+                goal = u'once((%s))' % goal
+            rvar = u'ZAMIA_MULTI_%d' % i
+            goals.append(u'findall([%s], (%s), %s)' % (u', '.join(pl_variables(goal)), goal, rvar))
+            rvars.append(rvar)
+
+        res = self._pyxsb_query(u'ZAMIA_MULTI = [%s], %s.' % (u', '.join(rvars), u', '.join(goals)))
+        if not res:
+            return [None] * len(queries) if first else [[] for q in queries]
+
+        results = res[0][0]
+        if first:
+            return [r[0] if r else None for r in results]
+        return results
 
     def prolog_check(self, query):
         logging.debug ('prolog_check: %s' % query)
-        res = pyxsb_query(query)
+        res = self._pyxsb_query(u'once((%s)).' % self._pl_goal(query))
         return len(res)>0
 
     def prolog_query_one(self, query, idx=0):
         logging.debug ('prolog_query_one: %s' % query)
-        solutions = pyxsb_query(query)
+        solutions = self._pyxsb_query(u'once((%s)).' % self._pl_goal(query))
         if not solutions:
             return None
         return solutions[0][idx]
 
     def prolog_persist(self):
-        """ persist all currently asserted dynamic memory predicates from the prolog KB """
-
-        # q = 'predicate_property(Head, (dynamic)), clause(Head,Bod).'
-        # for r in self.prolog_query(q):
-        #     logging.info(repr(r))
-        #     # print "%s" % repr(r)
-
-        self.session.query(model.Mem).delete()
-
-        q = u'memory(REALM, K, V, S).'
-        for r in self.prolog_query(q):
-            # logging.info(repr(r))
-
-            realm = r[0].name
-            k     = r[1].name
-            v     = xsb_to_json(r[2])
-            score = r[3]
-
-            m = model.Mem(realm=realm, k=k, v=v, score=score)
-            self.session.add(m)
-
-        # import pdb; pdb.set_trace()
-        self.session.commit()
+        """ write memory changes back to the memory backend (called after each committed response) """
+        self.mem_backend.persist()
 
     # FIXME: this will work only on the first call
-    def setup_uttclass_model (self, restore=True):
+    def setup_uttclass_model (self, restore=True, lang=None):
+
+        lang = lang if lang else self.lang
 
-        if self.nlp_model:
+        if lang in self.uttclass_models:
             raise Exception ('Tensorflow model can be set up only once.')
 
         from utt_class_model import UttClassModel
 
-        self.uttclass_model = UttClassModel(lang=self.lang, session=self.session, model_args=self.uttclass_model_args)
+        self.uttclass_models[lang] = UttClassModel(lang=lang, session=self.session, 
+                                                   model_args=self._lang_model_args(self.uttclass_model_args, lang))
 
         if restore:
-            self.uttclass_model.restore()
+            self.uttclass_models[lang].restore()
+
+    def uttclass_train (self, num_epochs=DEFAULT_NUM_EPOCHS, incremental=False, lang=None):
+
+        lang = lang if lang else self.lang
 
-    def uttclass_train (self, num_epochs=DEFAULT_NUM_EPOCHS, incremental=False):
+        self.setup_uttclass_model (restore=incremental, lang=lang)
+        self.uttclass_models[lang].train (num_epochs, incremental)
 
-        self.setup_uttclass_model (restore=incremental)
-        self.uttclass_model.train (num_epochs, incremental)
+    def uttclass_predict (self, utterances, lang=None):
 
-    def uttclass_predict (self, utterances):
+        lang = lang if lang else self.lang
 
-        self.setup_uttclass_model (restore=True)
-        self.uttclass_model.predict (utterances)
+        if not lang in self.uttclass_models:
+            self.setup_uttclass_model (restore=True, lang=lang)
+        self.uttclass_models[lang].predict (utterances)
 
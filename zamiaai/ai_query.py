@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# Copyright 2018 Guenter Bartsch
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#
+# parameterized prolog queries: build goals from a functor and python argument
+# values instead of %-formatting prolog source by hand
+#
+# kernal.query('rdfsLabel', [entity, lang, Var('L')])
+#
+# note: only the goal's format string is cached (per functor and variable positions),
+# argument values are still quoted and formatted into the query source on every call.
+# XSB parses each distinct query text anew, nothing is compiled ahead of time on its side.
+#
+
+import re
+import math
+
+from six import string_types, integer_types, text_type
+
+_VAR_RE  = re.compile(r'^[A-Z_][A-Za-z0-9_]*$')
+_ATOM_RE = re.compile(r'^[a-z][A-Za-z0-9_]*$')
+
+class Var(object):
+
+    """ prolog variable in a parameterized query, Var() is the anonymous variable """
+
+    def __init__(self, name='_'):
+        if not _VAR_RE.match(name):
+            raise Exception ('invalid prolog variable name: %s' % repr(name))
+        self.name = name
+
+    def __repr__(self):
+        return 'Var(%s)' % repr(self.name)
+
+def pl_quote(s):
+    """ python string -> quoted prolog atom """
+    return u"'%s'" % s.replace(u'\\', u'\\\\').replace(u"'", u"''")
+
+def pl_float(f):
+
+    """ python float -> prolog float syntax: the mantissa always has a fraction (1.0e20, not 1e+20) """
+
+    if math.isinf(f) or math.isnan(f):
+        raise Exception ('%s cannot be used as a prolog query argument' % repr(f))
+
+    mantissa, e, exp = repr(f).partition('e')
+    if not '.' in mantissa:
+        mantissa += '.0'
+
+    return u'%s%s%s' % (mantissa, e, exp.lstrip('+'))
+
+def pl_arg(a):
+
+    """ python value -> prolog source of the corresponding term """
+
+    if isinstance(a, Var):
+        return a.name
+    if isinstance(a, string_types):
+        return pl_quote(a)
+    if isinstance(a, bool):
+        return u'true' if a else u'false'
+    if isinstance(a, integer_types):
+        return u'%d' % a
+    if isinstance(a, float):
+        return pl_float(a)
+    if isinstance(a, (list, tuple)):
+        return u'[%s]' % u', '.join(map(pl_arg, a))
+    if a is None:
+        raise Exception ('None cannot be used as a prolog query argument')
+
+    # XSBAtom, XSBString, XSBFunctor, ... know their own prolog syntax
+    return text_type(a)
+
+# (functor, arity, var names (None for bound args)) -> goal format string
+
+_templates = {}
+
+def pl_goal(functor, args):
+
+    """ build prolog goal source for functor(args), the format template for each
+        combination of functor and variable positions is computed once and cached """
+
+    key = (functor, tuple(a.name if isinstance(a, Var) else None for a in args))
+
+    tmpl = _templates.get(key)
+    if tmpl is None:
+
+        f = functor if _ATOM_RE.match(functor) else pl_quote(functor).replace(u'%', u'%%')
+        if args:
+            tmpl = u'%s(%s)' % (f, u', '.join(a.name if isinstance(a, Var) else u'%s' for a in args))
+        else:
+            tmpl = f
+
+        _templates[key] = tmpl
+
+    return tmpl % tuple(pl_arg(a) for a in args if not isinstance(a, Var))
+
+#
+# query source analysis (AIKernal query cache, batched queries)
+#
+
+_QUOTED_RE  = re.compile(r"'(?:[^'\\]|\\.|'')*'" + r'|"(?:[^"\\]|\\.)*"')
+_FUNCTOR_RE = re.compile(r'(?<![A-Za-z0-9_])([a-z][A-Za-z0-9_]*)\(')
+_PLVAR_RE   = re.compile(r'(?<![A-Za-z0-9_])([A-Z_][A-Za-z0-9_]*)')
+_TOKEN_RE   = re.compile(r'[a-z][A-Za-z0-9_]*\(|[A-Za-z0-9_]+|\\\+|->|\S')
+
+_GOAL_BEFORE = set([None, u',', u';', u'(', u'->', u'\\+', u'.'])
+_GOAL_AFTER  = set([None, u',', u';', u')', u'->', u'.'])
+
+def pl_functors(query):
+    """ set of functor names called in query source, quoted atoms and strings are skipped """
+    return set(_FUNCTOR_RE.findall(_QUOTED_RE.sub(u"''", query)))
+
+def pl_atom_goals(query, meta_predicates=()):
+
+    """ set of atoms called as goals (arity 0) in query source: atoms at the top level, in
+        parenthesized conjunctions/disjunctions or inside arguments of meta_predicates """
+
+    tokens = _TOKEN_RE.findall(_QUOTED_RE.sub(u"''", query))
+
+    res   = set()
+    goals = []   # per open parenthesis: do its arguments hold goals?
+    prev  = None
+
+    for i, tok in enumerate(tokens):
+
+        if tok == u'(':
+            goals.append(True)
+        elif tok.endswith(u'('):
+            goals.append(tok[:-1] in meta_predicates)
+            tok = u'('
+        elif tok == u')':
+            if goals:
+                goals.pop()
+        elif tok[0].islower() and all(goals) and prev in _GOAL_BEFORE:
+            nxt = tokens[i+1] if i+1 < len(tokens) else None
+            if nxt in _GOAL_AFTER:
+                res.add(tok)
+
+        prev = tok
+
+    return res
+
+def pl_variables(query):
+    """ named variables of query source in order of first occurrence (the order pyxsb returns bindings in) """
+    res = []
+    for v in _PLVAR_RE.findall(_QUOTED_RE.sub(u"''", query)):
+        if v != u'_' and not v in res:
+            res.append(v)
+    return res
+
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# Copyright 2018 Guenter Bartsch
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#
+# runtime statistics: per-stage latency histograms, answer path counters,
+# prolog query profiler, skill code execution profiler
+#
+
+from __future__ import print_function
+
+import re
+
+# histogram bucket upper bounds in seconds, last bucket catches everything above
+
+LATENCY_BUCKETS = [0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0]
+
+PROCESS_STAGES  = ['tokenize', 'lookup', 'code_lookup', 'exec', 'nn_predict', 'nn_exec', 'eliza', 'commit', 'persist', 'total']
+ANSWER_PATHS    = ['exact', 'nn', 'eliza', 'none']
+
+class LatencyHistogram(object):
+
+    def __init__(self):
+        self.count   = 0
+        self.total   = 0.0
+        self.max     = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS)+1)
+
+    def add(self, dt):
+
+        self.count += 1
+        self.total += dt
+        if dt > self.max:
+            self.max = dt
+
+        for i, ub in enumerate(LATENCY_BUCKETS):
+            if dt <= ub:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def avg(self):
+        if not self.count:
+            return 0.0
+        return self.total / self.count
+
+class StageStats(object):
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.stages = {}   # stage -> LatencyHistogram
+        self.paths  = {}   # answer path -> count
+        for p in ANSWER_PATHS:
+            self.paths[p] = 0
+
+    def record(self, stage, dt):
+        if not stage in self.stages:
+            self.stages[stage] = LatencyHistogram()
+        self.stages[stage].add(dt)
+
+    def count_path(self, path):
+        self.paths[path] = self.paths.get(path, 0) + 1
+
+    def report(self):
+
+        """ human readable report lines: one histogram line per stage followed by path counters """
+
+        lines = []
+
+        hdr = '%-12s %7s %9s %9s' % ('stage', 'n', 'avg ms', 'max ms')
+        for ub in LATENCY_BUCKETS:
+            hdr += ' %6s' % ('<%g' % (ub * 1000.0))
+        hdr += ' %6s' % 'more'
+        lines.append(hdr)
+
+        stages = [s for s in PROCESS_STAGES if s in self.stages]
+        stages.extend(sorted([s for s in self.stages if not s in PROCESS_STAGES]))
+
+        for stage in stages:
+            h = self.stages[stage]
+            l = '%-12s %7d %9.2f %9.2f' % (stage, h.count, h.avg() * 1000.0, h.max * 1000.0)
+            for n in h.buckets:
+                l += ' %6d' % n
+            lines.append(l)
+
+        total = sum(self.paths.values())
+        for p in ANSWER_PATHS:
+            n = self.paths.get(p, 0)
+            lines.append('path %-7s %7d (%5.1f%%)' % (p, n, n*100.0/total if total else 0.0))
+
+        return lines
+
+#
+# prolog query profiler
+#
+
+# quoted atoms/strings, numbers, functors, plain atoms, variables
+_PL_TOKEN_RE = re.compile(r"""'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.)*"|\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|[a-z][A-Za-z0-9_]*(?=\()|[a-z][A-Za-z0-9_]*|[A-Z_][A-Za-z0-9_]*""")
+
+PL_OPERATOR_ATOMS = set(['is', 'mod', 'rem', 'xor', 'div', 'rdiv', 'not'])
+
+def _pl_pattern_token(m):
+
+    t = m.group(0)
+
+    c = t[0]
+    if c.isupper() or c == '_':
+        return t                            # variable
+    if c.islower():
+        end = m.end()
+        if end < len(m.string) and m.string[end] == '(':
+            return t                        # functor
+        if t in PL_OPERATOR_ATOMS:
+            return t
+    return '_'                              # constant
+
+def query_pattern(query):
+
+    """ normalize a prolog query to a pattern by replacing constants with placeholders, e.g.
+        "rdfsLabel(wdeAngelaMerkel, en, L)." -> "rdfsLabel(_, _, L)." """
+
+    return u' '.join(_PL_TOKEN_RE.sub(_pl_pattern_token, query).split())
+
+class QueryStats(object):
+
+    def __init__(self):
+        self.count     = 0
+        self.total     = 0.0
+        self.max       = 0.0
+        self.solutions = 0
+        self.cached    = 0  # calls answered from the query cache
+
+    def add(self, dt, num_solutions, cached=False):
+        self.count     += 1
+        self.total     += dt
+        self.solutions += num_solutions
+        if cached:
+            self.cached += 1
+        if dt > self.max:
+            self.max = dt
+
+    def format(self):
+        return '%7d calls %7d cached %10.2fms total %8.2fms max %8.1f sols/call' % (self.count, self.cached,
+                                                                                   self.total * 1000.0, 
+                                                                                   self.max * 1000.0, 
+                                                                                   float(self.solutions) / self.count)
+
+class PrologProfiler(object):
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.patterns = {} # pattern -> QueryStats
+        self.callers  = {} # pattern -> skill -> QueryStats
+
+    def record(self, query, caller, dt, num_solutions, cached=False):
+
+        """ cached: answered from the query cache """
+
+        pattern = query_pattern(query)
+
+        if not pattern in self.patterns:
+            self.patterns[pattern] = QueryStats()
+            self.callers[pattern]  = {}
+        self.patterns[pattern].add(dt, num_solutions, cached)
+
+        caller = caller if caller else '?'
+        if not caller in self.callers[pattern]:
+            self.callers[pattern][caller] = QueryStats()
+        self.callers[pattern][caller].add(dt, num_solutions, cached)
+
+    def report(self, limit=0):
+
+        """ human readable report lines, patterns sorted by total time spent, most expensive first """
+
+        lines = []
+
+        pats = sorted(self.patterns, key=lambda p: self.patterns[p].total, reverse=True)
+        if limit:
+            pats = pats[:limit]
+
+        for pattern in pats:
+            lines.append(u'%s %s' % (self.patterns[pattern].format(), pattern))
+
+            callers = self.callers[pattern]
+            for caller in sorted(callers, key=lambda c: callers[c].total, reverse=True):
+                lines.append(u'    %s   by %s' % (callers[caller].format(), caller))
+
+        return lines
+
+#
+# skill code execution profiler
+#
+
+class CodeStats(object):
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.code = {} # md5s -> QueryStats (solutions count c.resp calls here)
+
+    def record(self, md5s, dt, num_resps):
+        if not md5s in self.code:
+            self.code[md5s] = QueryStats()
+        self.code[md5s].add(dt, num_resps)
+
+    def report(self, locate, limit=0):
+
+        """ human readable report lines, slowest code snippets (by total time) first.
+            locate: md5s -> (skill, loc_fn, loc_line) """
+
+        lines = []
+
+        md5ss = sorted(self.code, key=lambda m: self.code[m].total, reverse=True)
+        if limit:
+            md5ss = md5ss[:limit]
+
+        for md5s in md5ss:
+            cs = self.code[md5s]
+            skill, loc_fn, loc_line = locate(md5s)
+            lines.append(u'%7d calls %10.2fms total %8.2fms avg %8.2fms max %6.1f resps/call %s %-12s %s:%s' % 
+                         (cs.count, cs.total * 1000.0, cs.total * 1000.0 / cs.count, cs.max * 1000.0, 
+                          float(cs.solutions) / cs.count, md5s, skill, loc_fn, loc_line))
+
+        return lines
+
@@ -107,6 +107,22 @@ class DataEngine(object):
             raise Exception ('Code %s not found.' % md5s)
         return cd.fn, cd.code
 
+    def lookup_code_skill(self, md5s):
+        cd = self.session.query(model.Code).filter(model.Code.md5s==md5s).first()
+        if not cd:
+            return None
+        return cd.skill
+
+    def lookup_code_location(self, md5s):
+
+        """ map code md5s back to (skill, loc_fn, loc_line) of a training data entry using it """
+
+        td = self.session.query(model.TrainingData).filter(model.TrainingData.md5s==md5s).first()
+        if td:
+            return td.skill, td.loc_fn, td.loc_line
+
+        return self.lookup_code_skill(md5s), '?', 0
+
     def lookup_data_train(self, inp, lang):
         res = []
 
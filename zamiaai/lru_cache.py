@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# Copyright 2018 Guenter Bartsch
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#
+# simple size-bounded least recently used cache with hit/miss counters
+#
+
+from collections import OrderedDict
+
+class LRUCache(object):
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries  = OrderedDict()
+        self.hits     = 0
+        self.misses   = 0
+
+    def get(self, key, default=None):
+        try:
+            v = self.entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self.entries[key] = v
+        self.hits += 1
+        return v
+
+    def put(self, key, value):
+        if key in self.entries:
+            del self.entries[key]
+        elif len(self.entries) >= self.max_size:
+            self.entries.popitem(last=False)
+        self.entries[key] = value
+
+    def clear(self):
+        self.entries.clear()
+
+    def reset_stats(self):
+        self.hits   = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def report(self):
+        total = self.hits + self.misses
+        return '%d/%d entries, %d hits, %d misses (%5.1f%% hit rate)' % (len(self.entries), self.max_size, 
+                                                                       self.hits, self.misses, 
+                                                                       self.hits * 100.0 / total if total else 0.0)
+
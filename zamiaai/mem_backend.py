@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# Copyright 2018 Guenter Bartsch
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#
+# memory backends: where the memory/4 facts behind the kernal's mem_* API are persisted
+#
+# the live copy of memory always is the XSB KB of the kernal process, backends decide
+# what gets restored at startup, what gets loaded on demand and how changes are written back.
+# evict(realm) is called before a realm's facts are dropped from the KB (see AIKernal.mem_evict)
+#
+
+import json
+import logging
+
+from collections    import OrderedDict
+
+from sqlalchemy.exc import IntegrityError
+from pyxsb          import pyxsb_command, xsb_to_json, json_to_xsb
+
+from zamiaai        import model
+
+MEM_BACKENDS      = ['local', 'sql']
+MEM_WRITE_RETRIES = 5  # attempts to write a key other kernals keep modifying
+
+class LocalMemBackend(object):
+
+    """ memory is owned by this kernal process and mirrored into the mem table.
+        without a memory TTL everything is restored at startup, with a TTL realms
+        are loaded on first access (and again after they have been evicted) """
+
+    def __init__(self, kernal, session):
+        self.kernal  = kernal
+        self.session = session
+        self.loaded  = None   # realms present in the KB, None: all of them
+        self.dirty   = set()  # realms changed since last persist()
+
+    def restore(self):
+        if self.kernal.mem_ttl:
+            pyxsb_command(u'dynamic(memory/4).')
+            self.loaded = set()
+        else:
+            self.kernal.mem_restore()
+
+    def load(self, realm):
+
+        if self.loaded is None or realm in self.loaded:
+            return
+
+        entries = {}
+        for m in self.session.query(model.Mem).filter(model.Mem.realm==realm):
+            if not m.k in entries:
+                entries[m.k] = []
+            entries[m.k].append((json_to_xsb(m.v), m.score))
+
+        for k in entries:
+            self.kernal.mem_put(realm, k, entries[k], track=False)
+
+        self.loaded.add(realm)
+
+    def changed(self, realm, k):
+
+        # called before the change is made: persisting rewrites the whole realm,
+        # so realms never loaded into the KB are loaded first
+
+        self.load(realm)
+        self.dirty.add(realm)
+
+    def changed_realm(self, realm):
+        self.load(realm)
+        self.dirty.add(realm)
+
+    def _persist_realm(self, realm):
+
+        self.session.query(model.Mem).filter(model.Mem.realm==realm).delete()
+
+        for k, v, score in self.kernal.mem_dump(realm):
+            m = model.Mem(realm=realm, k=k.name, v=xsb_to_json(v), score=score)
+            self.session.add(m)
+
+    def persist(self):
+
+        """ rewrite the mem table rows of all realms changed since the last call """
+
+        for realm in self.dirty:
+            self._persist_realm(realm)
+        self.session.commit()
+
+        self.dirty = set()
+
+    def evict(self, realm):
+
+        if realm in self.dirty:
+            self._persist_realm(realm)
+            self.session.commit()
+            self.dirty.discard(realm)
+
+        if self.loaded is not None:
+            self.loaded.discard(realm)
+
+def _merge_entries(base, ours, theirs):
+
+    """ three way merge of memory entry lists ([v json, score] pairs): the changes we made
+        to base (added, removed and re-scored values) applied on top of theirs """
+
+    def index(entries):
+        return OrderedDict([(json.dumps(vj, sort_keys=True), (vj, score)) for vj, score in entries])
+
+    b = index(base)
+    o = index(ours)
+    res = index(theirs)
+
+    for vk in b:
+        if not vk in o:
+            res.pop(vk, None)
+    for vk in o:
+        if b.get(vk) != o[vk]:
+            res[vk] = o[vk]
+
+    return [[vj, score] for vj, score in res.values()]
+
+class SQLMemBackend(object):
+
+    """ memory shared between kernals through the mem_shared table. realms are loaded
+        (and refreshed if another kernal updated them) on demand, changed keys are written
+        back as row level upserts guarded by a per key version. a write that lost against
+        another kernal's is merged into the other kernal's entries and retried.
+
+        uses a session of its own: conflicts roll back, which must never discard
+        pending work of the kernal's session """
+
+    def __init__(self, kernal, session):
+        self.kernal   = kernal
+        self.session  = session
+        self.versions = {}     # (realm, k) -> version of our copy
+        self.base     = {}     # (realm, k) -> entries of that version, base of conflict merges
+        self.dirty    = set()  # (realm, k) changed since last persist()
+
+    def restore(self):
+        # nothing up front, realms are loaded on first use
+        pyxsb_command(u'dynamic(memory/4).')
+
+    def load(self, realm):
+
+        """ bring our copy of realm up to date with the shared store """
+
+        seen = set()
+        for row in self.session.query(model.MemShared).filter(model.MemShared.realm==realm):
+
+            key = (realm, row.k)
+            seen.add(key)
+            if key in self.dirty or self.versions.get(key) == row.version:
+                continue
+
+            entries = json.loads(row.entries)
+            self.kernal.mem_put(realm, row.k, [(json_to_xsb(vj), score) for vj, score in entries], track=False)
+            self.versions[key] = row.version
+            self.base[key]     = entries
+
+        # keys deleted by another kernal
+
+        for key in [key for key in self.versions if key[0] == realm and not key in seen and not key in self.dirty]:
+            self.kernal.mem_put(realm, key[1], [], track=False)
+            del self.versions[key]
+            self.base.pop(key, None)
+
+        # end the read transaction so the next load() sees what other kernals committed meanwhile
+
+        self.session.commit()
+
+    def changed(self, realm, k):
+        self.dirty.add((realm, k))
+
+    def changed_realm(self, realm):
+        for key in self.versions:
+            if key[0] == realm:
+                self.dirty.add(key)
+
+    def _row(self, realm, k):
+        return self.session.query(model.MemShared).filter(model.MemShared.realm==realm, model.MemShared.k==k).first()
+
+    def _update(self, realm, k, entries, version):
+
+        """ conditional update, returns number of rows updated (0 on version conflict) """
+
+        q = self.session.query(model.MemShared).filter(model.MemShared.realm==realm, model.MemShared.k==k,
+                                                       model.MemShared.version==version)
+
+        return q.update({model.MemShared.entries: entries,
+                         model.MemShared.version: model.MemShared.version + 1}, synchronize_session=False)
+
+    def _write(self, realm, k, entries):
+
+        """ write entries of realm/k if the shared row still is the version we know,
+            returns False on conflict """
+
+        key     = (realm, k)
+        version = self.versions.get(key)
+
+        if entries:
+
+            if version is None:
+                try:
+                    self.session.add(model.MemShared(realm=realm, k=k, entries=json.dumps(entries), version=1))
+                    self.session.commit()
+                except IntegrityError:
+                    # created by another kernal in the meantime
+                    self.session.rollback()
+                    return False
+                version = 1
+
+            else:
+                if not self._update(realm, k, json.dumps(entries), version):
+                    self.session.rollback()
+                    return False
+                self.session.commit()
+                version += 1
+
+            self.versions[key] = version
+            self.base[key]     = entries
+            return True
+
+        # no entries left: delete
+
+        if version is not None:
+            q = self.session.query(model.MemShared).filter(model.MemShared.realm==realm, model.MemShared.k==k,
+                                                           model.MemShared.version==version)
+            if not q.delete(synchronize_session=False) and self._row(realm, k):
+                self.session.rollback()
+                return False
+            self.session.commit()
+
+        self.versions.pop(key, None)
+        self.base.pop(key, None)
+        return True
+
+    def _persist_key(self, realm, k):
+
+        key     = (realm, k)
+        entries = [[xsb_to_json(v), score] for v, score in self.kernal.mem_get_multi(realm, k)]
+        merged  = False
+
+        for attempt in range(MEM_WRITE_RETRIES):
+
+            if self._write(realm, k, entries):
+                if merged:
+                    self.kernal.mem_put(realm, k, [(json_to_xsb(vj), score) for vj, score in entries], track=False)
+                return
+
+            # another kernal wrote realm/k since we read it: merge our changes into its entries, retry
+
+            logging.info('memory %s/%s has been modified by another kernal, merging.' % (realm, k))
+
+            row    = self._row(realm, k)
+            theirs = json.loads(row.entries) if row else []
+            self.session.commit()
+
+            entries = _merge_entries(self.base.get(key, []), entries, theirs)
+            merged  = True
+
+            if row:
+                self.versions[key] = row.version
+                self.base[key]     = theirs
+            else:
+                self.versions.pop(key, None)
+                self.base.pop(key, None)
+
+        raise Exception ('memory %s/%s: too many concurrent modifications, giving up.' % (realm, k))
+
+    def persist(self):
+
+        for realm, k in self.dirty:
+            self._persist_key(realm, k)
+
+        self.dirty = set()
+
+    def evict(self, realm):
+
+        for key in [key for key in self.dirty if key[0] == realm]:
+            self._persist_key(*key)
+            self.dirty.discard(key)
+
+        # forget our copy, the next load() fetches all keys of realm again
+
+        for key in [key for key in self.versions if key[0] == realm]:
+            del self.versions[key]
+            self.base.pop(key, None)
+
+def create_mem_backend(name, kernal, session):
+
+    if name == 'local':
+        return LocalMemBackend(kernal, session)
+    if name == 'sql':
+        return SQLMemBackend(kernal, kernal.Session())
+
+    raise Exception ('unknown memory backend: %s (supported: %s)' % (name, ', '.join(MEM_BACKENDS)))
+
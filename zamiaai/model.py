@@ -115,6 +115,22 @@ class Mem(Base):
 
     __table_args__    = (Index('idx_mem_realm_k', "realm", "k"), )
 
+class MemShared(Base):
+
+    # memory shared between kernals (SQLMemBackend): one row per realm/key holding all
+    # (value, score) entries as json, version is incremented on every update
+
+    __tablename__ = 'mem_shared'
+
+    id                = Column(Integer, primary_key=True)
+
+    realm             = Column(String(255), index=True)
+    k                 = Column(String(255))
+    entries           = Column(Text)
+    version           = Column(Integer)
+
+    __table_args__    = (Index('idx_mem_shared_realm_k', "realm", "k", unique=True), )
+
 
 def data_engine_setup(db_url, echo=False):
     engine = create_engine(db_url, echo=echo)
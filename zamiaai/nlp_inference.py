@@ -0,0 +1,348 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# Copyright 2018 Guenter Bartsch
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#
+# tensorflow-free inference for the seq2seq nlp model: encoder/decoder LSTM and
+# dense weights exported by NLPModel.export_numpy() (seq2seq.npz in model_dir) are
+# run using numpy only, so serving processes never have to import tensorflow
+#
+
+import os
+import codecs
+import logging
+
+import numpy as np
+
+from nltools.tokenizer import tokenize
+from word_embeddings   import load_word_embeddings
+
+# extra decoder symbols
+
+_START   = '_START'
+_STOP    = '_STOP'
+_OR      = '__OR__'
+
+START_ID = 0
+STOP_ID  = 1
+OR_ID    = 2
+
+NUMPY_WEIGHTS_FN = 'seq2seq.npz'
+
+def load_decoder_dict(decoder_dict_fn):
+
+    """ read decoder dict csv as written by NLPModel, returns max_resp_len, decoder_dict, reverse_decoder_dict """
+
+    with codecs.open(decoder_dict_fn, 'r', 'utf8') as f:
+
+        max_resp_len = int(f.readline().rstrip())
+
+        decoder_dict = {}
+
+        while True:
+            line = f.readline()
+            if not line:
+                break
+
+            line = line.lstrip().rstrip()
+
+            parts = line.split(';')
+
+            decoder_dict[parts[1]] = int(parts[0])
+
+    logging.info ('%s read, %d entries, max_resp_len=%d.' % (decoder_dict_fn, len(decoder_dict), max_resp_len))
+
+    reverse_decoder_dict = dict( (i, token) for token, i in decoder_dict.items() )
+
+    return max_resp_len, decoder_dict, reverse_decoder_dict
+
+def _sigmoid(x, out):
+    np.negative(x, out=out)
+    np.exp(out, out=out)
+    out += 1.0
+    np.reciprocal(out, out=out)
+    return out
+
+def _hard_sigmoid(x, out):
+    np.multiply(x, 0.2, out=out)
+    out += 0.5
+    np.clip(out, 0.0, 1.0, out=out)
+    return out
+
+RECURRENT_ACTIVATIONS = {'sigmoid': _sigmoid, 'hard_sigmoid': _hard_sigmoid}
+
+def log_softmax(logits):
+    m = logits.max(axis=1, keepdims=True)
+    return logits - (m + np.log(np.exp(logits - m).sum(axis=1, keepdims=True)))
+
+def beam_search(step, h, c, max_len, beam_width=1):
+
+    """ batched beam search (beam_width=1: greedy decoding) for all sequences of a batch at once.
+
+        step(tokens, h, c) -> log_probs (n, vocab), h, c runs one decoder step for n = batch*beam_width rows,
+        h, c: encoder states (batch, units).
+
+        finished hypotheses (STOP_ID produced) are masked: they can only be extended by STOP_ID at
+        no cost, so they keep their score and position in the beam until all rows are done or
+        max_len is reached.
+
+        returns ids (batch, beam_width, steps), scores (batch, beam_width), best hypothesis first """
+
+    batch_size = h.shape[0]
+    k          = beam_width
+    n          = batch_size * k
+
+    h = np.repeat(h, k, axis=0)
+    c = np.repeat(c, k, axis=0)
+
+    # all beams start out identical: only the first one may be expanded in the first step
+
+    scores        = np.zeros((batch_size, k), dtype='float32')
+    scores[:, 1:] = -np.inf
+    scores        = scores.ravel()
+
+    res    = np.full((n, max_len), STOP_ID, dtype='int32')
+    done   = np.zeros(n, dtype=bool)
+    tokens = np.full(n, START_ID, dtype='int32')
+    offset = np.repeat(np.arange(batch_size) * k, k)
+
+    for t in range(max_len):
+
+        log_probs, h, c = step(tokens, h, c)
+
+        log_probs[done]          = -np.inf
+        log_probs[done, STOP_ID] = 0.0
+
+        if k == 1:
+            tokens  = np.argmax(log_probs, axis=1)
+            scores += log_probs[np.arange(n), tokens]
+        else:
+            num_tokens = log_probs.shape[1]
+            cand       = (scores[:, None] + log_probs).reshape(batch_size, k * num_tokens)
+            best       = np.argpartition(-cand, k-1, axis=1)[:, :k]
+            order      = np.argsort(-np.take_along_axis(cand, best, axis=1), axis=1)
+            best       = np.take_along_axis(best, order, axis=1)
+
+            rows    = offset + (best // num_tokens).ravel()
+            tokens  = (best % num_tokens).ravel()
+            scores  = np.take_along_axis(cand, best, axis=1).ravel()
+
+            h    = h[rows]
+            c    = c[rows]
+            res  = res[rows]
+            done = done[rows]
+
+        res[:, t] = tokens
+        done |= tokens == STOP_ID
+        if done.all():
+            res = res[:, :t+1]
+            break
+
+    return res.reshape(batch_size, k, -1), scores.reshape(batch_size, k)
+
+def split_commands(decoded):
+
+    """ decoded token sequence -> list of commands (code md5s, json args...) separated by _OR,
+        commands not terminated by _OR or _STOP are dropped """
+
+    res = []
+    cmd = []
+    for token in decoded:
+        if token == _STOP or token == _OR:
+            if cmd:
+                res.append(tuple(cmd))
+            cmd = []
+            if token == _STOP:
+                break
+        else:
+            cmd.append(token)
+
+    return res
+
+def decode_hypotheses(ids, scores, reverse_decoder_dict):
+
+    """ beam_search() output -> one list of (score, decoded token sequence) per input, best first """
+
+    res = []
+
+    for seqs, seq_scores in zip(ids, scores):
+        hyps = []
+        for seq, score in zip(seqs, seq_scores):
+            if score == -np.inf:
+                continue
+            decoded = []
+            for token_id in seq:
+                decoded.append(reverse_decoder_dict[token_id])
+                if token_id == STOP_ID:
+                    break
+            hyps.append((float(score), decoded))
+        res.append(hyps)
+
+    return res
+
+class NumpyLSTM(object):
+
+    """ keras LSTM cell (gate order i, f, c, o; tanh activation) """
+
+    def __init__(self, kernel, recurrent_kernel, bias, recurrent_activation):
+        self.kernel           = kernel
+        self.recurrent_kernel = recurrent_kernel
+        self.bias             = bias
+        self.units            = recurrent_kernel.shape[0]
+        self.ract             = RECURRENT_ACTIVATIONS[recurrent_activation]
+
+    def step(self, xw, h, c, z, g):
+
+        """ one time step for a batch. xw: input already multiplied by kernel,
+            h, c: states (updated in place), z, g: preallocated (batch, 4*units) buffers """
+
+        u = self.units
+
+        np.dot(h, self.recurrent_kernel, out=z)
+        z += xw
+        z += self.bias
+
+        self.ract(z[:, :2*u], g[:, :2*u])          # i, f
+        np.tanh(z[:, 2*u:3*u], out=g[:, 2*u:3*u])  # candidate
+        self.ract(z[:, 3*u:], g[:, 3*u:])          # o
+
+        c *= g[:, u:2*u]
+        c += g[:, :u] * g[:, 2*u:3*u]
+        np.tanh(c, out=h)
+        h *= g[:, 3*u:]
+
+class NumpySeq2Seq(object):
+
+    def __init__(self, weights_fn):
+
+        w = np.load(weights_fn)
+
+        ract = str(w['recurrent_activation'])
+
+        self.encoder     = NumpyLSTM(w['enc_kernel'], w['enc_recurrent_kernel'], w['enc_bias'], ract)
+        self.decoder     = NumpyLSTM(w['dec_kernel'], w['dec_recurrent_kernel'], w['dec_bias'], ract)
+        self.dense_w     = w['dense_kernel']
+        self.dense_b     = w['dense_bias']
+        self.units       = self.encoder.units
+
+    def encode(self, x):
+
+        """ x: (batch, time, embed_dim) -> encoder states h, c """
+
+        batch_size, num_steps, embed_dim = x.shape
+        u = self.units
+
+        # input projections of all time steps in one matrix multiplication
+
+        xw = np.dot(x.reshape(batch_size * num_steps, embed_dim), self.encoder.kernel).reshape(batch_size, num_steps, 4*u)
+
+        h = np.zeros((batch_size, u), dtype='float32')
+        c = np.zeros((batch_size, u), dtype='float32')
+        z = np.empty((batch_size, 4*u), dtype='float32')
+        g = np.empty((batch_size, 4*u), dtype='float32')
+
+        for t in range(num_steps):
+            self.encoder.step(xw[:, t], h, c, z, g)
+
+        return h, c
+
+    def decoder_logits(self, tokens, h, c, z, g, logits):
+
+        """ one decoder step for a batch of previous tokens. the one-hot decoder input
+            times the kernel is just the kernel row of each token. """
+
+        self.decoder.step(self.decoder.kernel[tokens], h, c, z, g)
+        np.dot(h, self.dense_w, out=logits)
+        logits += self.dense_b
+        return logits
+
+    def decode(self, h, c, max_len, beam_width=1):
+
+        """ batched greedy / beam search decoding, see beam_search() """
+
+        n = h.shape[0] * beam_width
+        u = self.units
+
+        z      = np.empty((n, 4*u), dtype='float32')
+        g      = np.empty((n, 4*u), dtype='float32')
+        logits = np.empty((n, self.dense_w.shape[1]), dtype='float32')
+
+        def step(tokens, h, c):
+            # h, c are beam_search()'s own copies of the states, safe to update in place
+            self.decoder_logits(tokens, h, c, z, g, logits)
+            return log_softmax(logits), h, c
+
+        return beam_search(step, h, c, max_len, beam_width)
+
+class NumpyNLPModel(object):
+
+    """ inference-only drop-in for NLPModel (restore(), predict()) running on numpy """
+
+    def __init__(self, lang, session, model_args ):
+
+        self.model_dir       = model_args['model_dir']
+        self.lang            = lang
+        self.session         = session
+        self.max_inp_len     = model_args['max_input_len']
+        self.batch_size      = model_args['batch_size']
+
+        self.decoder_dict_fn = '%s/decoder_dict.csv' % (self.model_dir)
+        self.weights_fn      = '%s/%s' % (self.model_dir, NUMPY_WEIGHTS_FN)
+        self.version         = None # weights file mtime, identifies the trained model in prediction caches
+
+    def restore(self):
+
+        self.embedding_dict = load_word_embeddings(self.model_dir)
+        self.embed_dim      = self.embedding_dict.embed_dim
+
+        self.max_resp_len, self.decoder_dict, self.reverse_decoder_dict = load_decoder_dict(self.decoder_dict_fn)
+
+        self.seq2seq = NumpySeq2Seq(self.weights_fn)
+        self.version = os.path.getmtime(self.weights_fn)
+
+        logging.info ('%s loaded, lstm latent dim: %d' % (self.weights_fn, self.seq2seq.units))
+
+    def _encoder_input(self, inps):
+
+        x = np.zeros( (len(inps), self.max_inp_len, self.embed_dim), dtype='float32')
+
+        for i, inp in enumerate(inps):
+            for j, token in enumerate(tokenize(inp, lang=self.lang)[:self.max_inp_len]):
+                if unicode(token) in self.embedding_dict:
+                    x[i, j] = self.embedding_dict[unicode(token)]
+
+        return x
+
+    def predict_batch (self, inps, beam_width=1):
+
+        """ decode a list of inputs, returns one list of up to beam_width (score, decoded token sequence)
+            hypotheses per input, best first. scores are log probabilities. """
+
+        res = []
+
+        for offset in range(0, len(inps), self.batch_size):
+
+            h, c        = self.seq2seq.encode(self._encoder_input(inps[offset:offset+self.batch_size]))
+            ids, scores = self.seq2seq.decode(h, c, self.max_resp_len+1, beam_width)
+
+            res.extend(decode_hypotheses(ids, scores, self.reverse_decoder_dict))
+
+        return res
+
+    def predict (self, inp):
+        return self.predict_batch([inp])[0][0][1]
+
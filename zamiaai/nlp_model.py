@@ -42,27 +42,101 @@ import tensorflow as tf
 
 from tensorflow        import keras
 from time              import time
-from random            import randint, random
+from random            import randint, random, shuffle
 from copy              import deepcopy
 
 import model
 
 from nltools.tokenizer import tokenize
 from nltools.misc      import mkdirs
+from word_embeddings   import load_word_embeddings
+from train_checkpoint  import TrainingCheckpoint
 
-# extra decoder symbols
+# extra decoder symbols, decoder dict format and numpy inference live in nlp_inference (no tensorflow there)
 
-_START   = '_START'
-_STOP    = '_STOP' 
-_OR      = '__OR__'
-
-START_ID = 0
-STOP_ID  = 1
-OR_ID    = 2
+from nlp_inference     import _START, _STOP, _OR, START_ID, STOP_ID, OR_ID, NUMPY_WEIGHTS_FN, load_decoder_dict
+from nlp_inference     import beam_search, decode_hypotheses
 
 DEBUG_LIMIT                = 0
 # DEBUG_LIMIT                = 1000
 
+TRAINING_DATA_YIELD_PER    = 1000 # rows fetched from the db at a time
+VALIDATION_SPLIT           = 0.2
+REPLAY_FACTOR              = 4    # decoder dict growth: fine-tune on up to this many old samples per new one
+
+def _glorot_uniform(shape, fan_in, fan_out):
+    limit = math.sqrt(6.0 / (fan_in + fan_out))
+    return np.random.uniform(-limit, limit, shape).astype('float32')
+
+class TrainingSequence(keras.utils.Sequence):
+
+    """ streams training batches, computed on the fly from token lists so memory use is bounded
+        by the batch size: encoder inputs are looked up in the word embeddings, the decoder
+        input is one-hot encoded per batch, targets are sparse (token ids) with a temporal
+        sample weight of 0 masking the padding after _STOP
+
+        batches are bucketed by response length: samples are sorted by response length (in
+        random order within each length) before they are cut into batches, and each batch is
+        padded to its longest response only. the order of the batches is shuffled each epoch. """
+
+    def __init__(self, nlp_model, samples, batch_size, do_shuffle):
+
+        self.nlp_model  = nlp_model
+        self.samples    = samples    # list of (input tokens, response token id array)
+        self.batch_size = batch_size
+        self.do_shuffle = do_shuffle
+
+        self._make_batches()
+
+    def _make_batches(self):
+
+        order = list(range(len(self.samples)))
+        if self.do_shuffle:
+            shuffle(order)
+        order.sort(key=lambda i: len(self.samples[i][1]))
+
+        self.batches = [order[i:i+self.batch_size] for i in range(0, len(order), self.batch_size)]
+        if self.do_shuffle:
+            shuffle(self.batches)
+
+    def __len__(self):
+        return len(self.batches)
+
+    def __getitem__(self, idx):
+
+        m     = self.nlp_model
+        batch = [self.samples[i] for i in self.batches[idx]]
+
+        # decoder steps: the response without its final _STOP is fed to the decoder,
+        # the response without its initial _START is the target
+
+        num_steps = max([len(resp) for inp, resp in batch]) - 1
+
+        encoder_input_data  = np.zeros( (len(batch), m.max_inp_len, m.embed_dim), dtype='float32')
+        decoder_input_data  = np.zeros( (len(batch), num_steps, len(m.decoder_dict)), dtype='float32')
+        decoder_target_data = np.zeros( (len(batch), num_steps, 1), dtype='int32')
+        sample_weights      = np.zeros( (len(batch), num_steps), dtype='float32')
+
+        for i, (inp, resp) in enumerate(batch):
+
+            # the encoder input is always padded to max_inp_len: the trailing padding steps
+            # influence the final encoder state, inference pads the same way
+
+            for j, token in enumerate(inp):
+                if unicode(token) in m.embedding_dict:
+                    encoder_input_data[i, j] = m.embedding_dict[unicode(token)]
+
+            l = len(resp) - 1
+            decoder_input_data[i, np.arange(l), resp[:-1]] = 1.
+            decoder_target_data[i, :l, 0] = resp[1:]
+            sample_weights[i, :l] = 1.
+
+        return [encoder_input_data, decoder_input_data], decoder_target_data, sample_weights
+
+    def on_epoch_end(self):
+        if self.do_shuffle:
+            self._make_batches()
+
 class NLPModel(object):
 
     def __init__(self, lang, session, model_args ):
@@ -73,6 +147,7 @@ class NLPModel(object):
         self.max_inp_len     = model_args['max_input_len']
         self.lstm_latent_dim = model_args['lstm_latent_dim']
         self.batch_size      = model_args['batch_size']
+        self.patience        = model_args['patience']
 
 
         # if global_step>0:
@@ -82,6 +157,8 @@ class NLPModel(object):
         self.weights_fn      = '%s/weights.h5' % (self.model_dir)
         # self.in_dict_fn  = '%s/in_dict.csv' % (self.model_dir)
         self.decoder_dict_fn = '%s/decoder_dict.csv' % (self.model_dir)
+        self.numpy_fn        = '%s/%s' % (self.model_dir, NUMPY_WEIGHTS_FN)
+        self.version         = None # weights file mtime, identifies the trained model in prediction caches
 
 
     def _compute_2d_diagram(self):
@@ -136,120 +213,108 @@ class NLPModel(object):
 
         self.reverse_decoder_dict = dict( (i, token) for token, i in self.decoder_dict.items() )
 
-    def _save_decoder_dict(self):
+    def _grow_decoder_dict(self):
 
-        with codecs.open(self.decoder_dict_fn, 'w', 'utf8') as f:
+        """ add response tokens of the training data missing from the loaded decoder dict (new skills),
+            new tokens get the next free ids. returns the number of tokens added. """
 
-            f.write("%d\n" % self.max_resp_len)
+        num_old_tokens = len(self.decoder_dict)
 
-            for k in sorted(self.decoder_dict):
+        for inp, resp in self.training_data:
+            for pred in resp:
+                if not pred in self.decoder_dict:
+                    self.decoder_dict[pred] = len(self.decoder_dict)
 
-                f.write(u"%d;%s\n" % (self.decoder_dict[k], k))
+        self.reverse_decoder_dict = dict( (i, token) for token, i in self.decoder_dict.items() )
 
-        logging.info ('%s written.', self.decoder_dict_fn)
+        num_new_tokens = len(self.decoder_dict) - num_old_tokens
 
-    def _load_decoder_dict(self):
-        with codecs.open(self.decoder_dict_fn, 'r', 'utf8') as f:
+        logging.info ('decoder dict: %d new entries, %d total.' % (num_new_tokens, len(self.decoder_dict)))
 
-            self.max_resp_len = int(f.readline().rstrip())
+        return num_new_tokens
 
-            self.decoder_dict = {}
+    def _save_decoder_dict(self):
 
-            while True:
-                line = f.readline()
-                if not line:
-                    break
+        with codecs.open(self.decoder_dict_fn, 'w', 'utf8') as f:
 
-                line = line.lstrip().rstrip()
+            f.write("%d\n" % self.max_resp_len)
 
-                parts = line.split(';')
+            for k in sorted(self.decoder_dict):
 
-                self.decoder_dict[parts[1]] = int(parts[0])
+                f.write(u"%d;%s\n" % (self.decoder_dict[k], k))
 
-        logging.info ('%s read, %d entries, max_resp_len=%d.' % (self.decoder_dict_fn, len(self.decoder_dict), self.max_resp_len))
+        logging.info ('%s written.', self.decoder_dict_fn)
 
-        self.reverse_decoder_dict = dict( (i, token) for token, i in self.decoder_dict.items() )
+    def _load_decoder_dict(self):
+        self.max_resp_len, self.decoder_dict, self.reverse_decoder_dict = load_decoder_dict(self.decoder_dict_fn)
 
     def _load_word_embeddings(self):
 
-        embdfn = '%s/word_embeddings.vec' % self.model_dir
-        logging.info('loading word embeddings from %s ...' % embdfn)
-
-        self.embedding_dict = {}
-        self.embed_dim      = 0
-
-        with codecs.open(embdfn, encoding='utf-8') as embdf:
-            first_line = True
-            for line in embdf:
-                if first_line:
-                    first_line = False
-                    continue
-                values = line.rstrip().rsplit(' ')
-                word = values[0]
-                coefs = np.asarray(values[1:], dtype='float32')
-                self.embedding_dict[word] = coefs
-                if not self.embed_dim: 
-                    self.embed_dim = coefs.shape[0]
-        nb_words = len(self.embedding_dict)
-        logging.info('found %s word vectors of dimension %d.' % (nb_words, self.embed_dim))
+        self.embedding_dict = load_word_embeddings(self.model_dir)
+        self.embed_dim      = self.embedding_dict.embed_dim
 
     def restore(self):
         self._load_word_embeddings()
         self._load_decoder_dict()
         self._create_keras_model()
         self.keras_model_train.load_weights(self.weights_fn)
+        self.version = os.path.getmtime(self.weights_fn)
 
 
-    def predict (self, inp):
+    def _encoder_input(self, inps):
+
+        x = np.zeros( (len(inps), self.max_inp_len, self.embed_dim), dtype='float32')
+
+        for i, inp in enumerate(inps):
+            for j, token in enumerate(tokenize(inp, lang=self.lang)[:self.max_inp_len]):
+                if unicode(token) in self.embedding_dict:
+                    x[i, j] = self.embedding_dict[unicode(token)]
+
+        return x
+
+    def predict_batch (self, inps, beam_width=1):
+
+        """ decode a list of inputs, returns one list of up to beam_width (score, decoded token sequence)
+            hypotheses per input, best first. scores are log probabilities.
+
+            each batch is encoded once, decoding runs for all its sequences (and beams) together,
+            see nlp_inference.beam_search() """
 
-        td_inp  = tokenize(inp, lang=self.lang)
         num_decoder_tokens = len (self.decoder_dict)
 
-        encoder_input_data  = np.zeros( (1, self.max_inp_len, self.embed_dim), dtype='float32')
+        res = []
 
-        for j, token in enumerate(td_inp):
-            if unicode(token) in self.embedding_dict:
-                encoder_input_data[0, j] = self.embedding_dict[unicode(token)]
+        for offset in range(0, len(inps), self.batch_size):
 
-        logging.debug('encoder_input_data[0]: %s' % str(encoder_input_data[0])) 
+            encoder_input_data = self._encoder_input(inps[offset:offset+self.batch_size])
 
-        # import pdb; pdb.set_trace()
+            h, c = self.keras_model_encoder.predict(encoder_input_data)
 
-        # Encode the input as state vectors.
-        states_value = self.keras_model_encoder.predict(encoder_input_data)
+            # one-hot decoder input, reused across steps: only the previous tokens' entries are reset
 
-        # Generate empty target sequence of length 1.
-        target_seq = np.zeros((1, 1, num_decoder_tokens))
-        # Populate the first token of target sequence with the start token.
-        target_seq[0, 0, self.decoder_dict[_START]] = 1.
+            n          = h.shape[0] * beam_width
+            target_seq = np.zeros((n, 1, num_decoder_tokens), dtype='float32')
+            rows       = np.arange(n)
+            prev       = np.zeros(n, dtype='int32')
 
-        # Sampling loop for a batch of sequences
-        # (to simplify, here we assume a batch of size 1).
-        stop_condition = False
-        decoded_sequence = []
-        while not stop_condition:
-            output_tokens, h, c = self.keras_model_decoder.predict([target_seq] + states_value)
+            def step(tokens, h, c):
+                target_seq[rows, 0, prev] = 0.
+                target_seq[rows, 0, tokens] = 1.
+                prev[:] = tokens
+                output_tokens, h, c = self.keras_model_decoder.predict([target_seq, h, c], batch_size=n)
+                return np.log(np.maximum(output_tokens[:, -1, :], 1e-30)), h, c
 
-            # Sample a token
-            sampled_token_index = np.argmax(output_tokens[0, -1, :])
-            sampled_token = self.reverse_decoder_dict[sampled_token_index]
-            decoded_sequence.append(sampled_token)
+            ids, scores = beam_search(step, h, c, self.max_resp_len+1, beam_width)
 
-            logging.debug('sampled_token_index=%d, sampled_token=%s' % (sampled_token_index, sampled_token)) 
+            res.extend(decode_hypotheses(ids, scores, self.reverse_decoder_dict))
 
-            # Exit condition: either hit max length
-            # or find stop token.
-            if (sampled_token == _STOP or len(decoded_sequence) > self.max_resp_len):
-                stop_condition = True
+        return res
 
-            # Update the target sequence (of length 1).
-            target_seq = np.zeros((1, 1, num_decoder_tokens))
-            target_seq[0, 0, sampled_token_index] = 1.
+    def predict (self, inp):
 
-            # Update states
-            states_value = [h, c]
+        """ greedy decoding of a single input, returns the decoded token sequence """
 
-        return decoded_sequence
+        return self.predict_batch([inp])[0][0][1]
 
     def _ascii_art(self, n):
 
@@ -266,13 +331,13 @@ class NLPModel(object):
 
         return 'X'
 
-    def _create_keras_model(self):
+    def _create_keras_model(self, num_decoder_tokens=None):
 
         # for an explanation on how this works, see:
         # https://blog.keras.io/a-ten-minute-introduction-to-sequence-to-sequence-learning-in-keras.html
 
         num_encoder_tokens = self.embed_dim
-        num_decoder_tokens = len (self.decoder_dict)
+        num_decoder_tokens = num_decoder_tokens if num_decoder_tokens else len (self.decoder_dict)
 
         # Define an input sequence and process it.
         encoder_inputs = keras.layers.Input(shape=(None, num_encoder_tokens))
@@ -292,12 +357,17 @@ class NLPModel(object):
         decoder_dense = keras.layers.Dense(num_decoder_tokens, activation='softmax')
         decoder_outputs = decoder_dense(decoder_outputs)
 
+        self.encoder_lstm  = encoder
+        self.decoder_lstm  = decoder_lstm
+        self.decoder_dense = decoder_dense
+
         # training
 
         # `encoder_input_data` & `decoder_input_data` into `decoder_target_data`
         self.keras_model_train = keras.Model([encoder_inputs, decoder_inputs], decoder_outputs)
 
-        self.keras_model_train.compile(optimizer='rmsprop', loss='categorical_crossentropy')
+        self.keras_model_train.compile(optimizer='rmsprop', loss='sparse_categorical_crossentropy',
+                                       sample_weight_mode='temporal')
         self.keras_model_train.summary()
 
         # inference
@@ -315,6 +385,40 @@ class NLPModel(object):
 
 
 
+    def _grow_keras_model(self, num_old_tokens):
+
+        """ create the model for the grown decoder dict, initialized from the saved weights of the model
+            for the first num_old_tokens tokens: encoder weights and the decoder input / output rows of
+            existing tokens are kept, those of the new tokens are initialized the way keras does
+            (glorot uniform kernels, zero bias). the grown weights are saved right away so decoder
+            dict and weights file stay consistent. """
+
+        self._create_keras_model(num_old_tokens)
+        self.keras_model_train.load_weights(self.weights_fn)
+
+        enc_weights                                = self.encoder_lstm.get_weights()
+        dec_kernel, dec_recurrent_kernel, dec_bias = self.decoder_lstm.get_weights()
+        dense_kernel, dense_bias                   = self.decoder_dense.get_weights()
+
+        num_tokens     = len(self.decoder_dict)
+        num_new_tokens = num_tokens - num_old_tokens
+        units4         = dec_kernel.shape[1]
+        units          = dense_kernel.shape[0]
+
+        dec_kernel   = np.concatenate([dec_kernel, _glorot_uniform((num_new_tokens, units4), num_tokens, units4)], axis=0)
+        dense_kernel = np.concatenate([dense_kernel, _glorot_uniform((units, num_new_tokens), units, num_tokens)], axis=1)
+        dense_bias   = np.concatenate([dense_bias, np.zeros(num_new_tokens, dtype=dense_bias.dtype)])
+
+        self._create_keras_model()
+
+        self.encoder_lstm.set_weights(enc_weights)
+        self.decoder_lstm.set_weights([dec_kernel, dec_recurrent_kernel, dec_bias])
+        self.decoder_dense.set_weights([dense_kernel, dense_bias])
+
+        self.keras_model_train.save_weights(self.weights_fn)
+
+        logging.info("model grown from %d to %d decoder tokens, weights written to %s ." % (num_old_tokens, num_tokens, self.weights_fn))
+
     def train(self, num_epochs, incremental):
 
         # load discourses from db, resolve non-unique inputs (implicit or of responses)
@@ -322,7 +426,7 @@ class NLPModel(object):
         logging.info('load discourses from db...')
 
         drs      = {} 
-        for dr in self.session.query(model.TrainingData).filter(model.TrainingData.lang==self.lang):
+        for dr in self.session.query(model.TrainingData).filter(model.TrainingData.lang==self.lang).yield_per(TRAINING_DATA_YIELD_PER):
 
             if not dr.inp in drs:
                 drs[dr.inp] = set()
@@ -404,9 +508,19 @@ class NLPModel(object):
         # load or create decoder dict
         #
 
+        num_new_tokens = 0
+
         if incremental:
             logging.info("loading decoder dict...")
+            max_resp_len = self.max_resp_len
             self._load_decoder_dict()
+            self.max_resp_len = max(self.max_resp_len, max_resp_len)
+
+            # a grown decoder dict is saved along with the grown model weights below
+
+            num_new_tokens = self._grow_decoder_dict()
+            if not num_new_tokens and self.max_resp_len > max_resp_len:
+                self._save_decoder_dict()
 
         else:
             logging.info("computing decoder dict...")
@@ -414,52 +528,98 @@ class NLPModel(object):
             self._save_decoder_dict()
 
         #
-        # compute datasets
+        # set up streaming datasets, last VALIDATION_SPLIT of the samples are used for validation
         #
 
-        logging.info("computing datasets...")
+        samples = []
+        for inp, resp in self.training_data:
+            samples.append((inp, np.array([self.decoder_dict[token] for token in resp], dtype='int32')))
+
+        if num_new_tokens:
 
-        num_decoder_tokens = len (self.decoder_dict)
+            # decoder dict grew: fine-tune on the samples using new tokens (their ids are the highest ones)
+            # plus a random selection of old samples replayed so the model does not forget them
 
-        encoder_input_data  = np.zeros( (len(self.training_data), self.max_inp_len,  self.embed_dim),
-                                        dtype='float32')
-        decoder_input_data  = np.zeros( (len(self.training_data), self.max_resp_len, num_decoder_tokens),
-                                        dtype='float32')
-        decoder_target_data = np.zeros( (len(self.training_data), self.max_resp_len, num_decoder_tokens),
-                                        dtype='float32')
+            num_old_tokens = len(self.decoder_dict) - num_new_tokens
 
+            new_samples = [s for s in samples if s[1].max() >= num_old_tokens]
+            old_samples = [s for s in samples if s[1].max() <  num_old_tokens]
 
-        for i, (inp, resp) in enumerate(self.training_data):
+            shuffle(old_samples)
+            samples = new_samples + old_samples[:len(new_samples) * REPLAY_FACTOR]
+            shuffle(samples)
 
-            for j, token in enumerate(inp):
-                if unicode(token) in self.embedding_dict:
-                    encoder_input_data[i, j] = self.embedding_dict[unicode(token)]
-
-            for j, token in enumerate(resp):
-                # decoder_target_data is ahead of decoder_input_data by one timestep
-                decoder_input_data[i, j, self.decoder_dict[token]] = 1.
-                if j > 0:
-                    # decoder_target_data will be ahead by one timestep
-                    # and will not include the start character.
-                    decoder_target_data[i, j - 1, self.decoder_dict[token]] = 1.
-
-        logging.info("computing datasets done. encoder_input_data.shape=%s" % repr(encoder_input_data.shape))
-        # print(encoder_input_data[42,2])
-        # print (decoder_input_data[42,0])
-        # print (decoder_input_data[42,1])
-        # print (decoder_input_data[42,2])
+            logging.info("fine-tuning on %d new and %d replayed samples." % (len(new_samples), len(samples)-len(new_samples)))
+
+        num_val       = int(len(samples) * VALIDATION_SPLIT)
+        train_samples = samples[:len(samples)-num_val]
+        val_samples   = samples[len(samples)-num_val:]
+
+        train_seq = TrainingSequence(self, train_samples, self.batch_size, do_shuffle=True)
+        val_seq   = TrainingSequence(self, val_samples,   self.batch_size, do_shuffle=False) if val_samples else None
+
+        logging.info("datasets: %d training, %d validation samples, %d batches/epoch." % (len(train_samples), len(val_samples), len(train_seq)))
 
         #
         # seq2seq model setup and training starts here
         #
 
-        self._create_keras_model()
+        # best weights are saved by the checkpoint callback, incremental training resumes
+        # after the last finished epoch of the previous run (num_epochs counts from its start)
+        # unless the decoder dict grew: the old optimizer state does not fit the grown model then
 
-        self.keras_model_train.fit([encoder_input_data, decoder_input_data], decoder_target_data,
-                             batch_size=self.batch_size,
-                             epochs=num_epochs,
-                             validation_split=0.2)
+        checkpoint    = TrainingCheckpoint(self.weights_fn, self.patience)
+        initial_epoch = 0
 
-        self.keras_model_train.save_weights(self.weights_fn)
+        if num_new_tokens:
+            self._grow_keras_model(len(self.decoder_dict) - num_new_tokens)
+            self._save_decoder_dict()
+            checkpoint.clear()
+
+        else:
+            self._create_keras_model()
+
+        if not incremental:
+            checkpoint.clear()
+
+        elif not num_new_tokens:
+            if checkpoint.can_resume():
+                initial_epoch = checkpoint.resume(self.keras_model_train, train_seq[0])
+            else:
+                self.keras_model_train.load_weights(self.weights_fn)
+
+        if initial_epoch < num_epochs:
+            self.keras_model_train.fit_generator(train_seq,
+                                                 epochs=num_epochs,
+                                                 initial_epoch=initial_epoch,
+                                                 validation_data=val_seq,
+                                                 callbacks=[checkpoint],
+                                                 shuffle=False)
+        else:
+            logging.info("%d epochs already trained." % initial_epoch)
+
+        checkpoint.restore_best(self.keras_model_train)
+
+        logging.info("best weights (epoch %d) in %s ." % (checkpoint.state['best_epoch'], self.weights_fn))
+
+        self.version = os.path.getmtime(self.weights_fn)
+
+        self.export_numpy()
+
+    def export_numpy(self):
+
+        """ export encoder/decoder LSTM and dense weights for tensorflow-free inference (nlp_inference.NumpyNLPModel) """
+
+        enc_kernel, enc_recurrent_kernel, enc_bias = self.encoder_lstm.get_weights()
+        dec_kernel, dec_recurrent_kernel, dec_bias = self.decoder_lstm.get_weights()
+        dense_kernel, dense_bias                   = self.decoder_dense.get_weights()
+
+        ract = self.encoder_lstm.get_config()['recurrent_activation']
+
+        np.savez(self.numpy_fn,
+                 enc_kernel=enc_kernel, enc_recurrent_kernel=enc_recurrent_kernel, enc_bias=enc_bias,
+                 dec_kernel=dec_kernel, dec_recurrent_kernel=dec_recurrent_kernel, dec_bias=dec_bias,
+                 dense_kernel=dense_kernel, dense_bias=dense_bias,
+                 recurrent_activation=np.array(ract))
 
-        logging.info("weights written to %s ." % self.weights_fn)
+        logging.info("numpy weights written to %s ." % self.numpy_fn)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# Copyright 2018 Guenter Bartsch
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#
+# embedding retrieval fallback (nlpmodel engine = retrieval): every distinct training
+# data input is represented by its pooled, normalized word vectors. an unknown input is
+# answered with the codes of its nearest training inputs (one matrix-vector product,
+# top-k selection) instead of seq2seq decoding, no tensorflow needed.
+#
+# model_dir/retrieval.npy   normalized input vectors (one row per distinct input)
+# model_dir/retrieval.json  inputs and their response tokens, in matrix row order
+#
+
+import os
+import io
+import json
+import codecs
+import logging
+
+import numpy as np
+
+from time              import time
+
+import model
+
+from nltools.tokenizer import tokenize
+from word_embeddings   import load_word_embeddings
+from nlp_inference     import _STOP, _OR
+
+TRAINING_DATA_YIELD_PER = 1000
+
+class RetrievalModel(object):
+
+    """ inference-only drop-in for NLPModel (restore(), predict(), predict_batch()) """
+
+    def __init__(self, lang, session, model_args ):
+
+        self.model_dir      = model_args['model_dir']
+        self.lang           = lang
+        self.session        = session
+        self.batch_size     = model_args['batch_size']
+        self.min_similarity = model_args.get('min_similarity', 0.0)
+
+        self.matrix_fn      = '%s/retrieval.npy' % (self.model_dir)
+        self.data_fn        = '%s/retrieval.json' % (self.model_dir)
+        self.version        = None # matrix file mtime, identifies the model in prediction caches
+
+    def _load_word_embeddings(self):
+
+        self.embedding_dict = load_word_embeddings(self.model_dir)
+        self.embed_dim      = self.embedding_dict.embed_dim
+
+    def _embed(self, tokens, out):
+
+        """ pool word vectors of tokens into out (normalized sum, the direction of their mean),
+            out stays zero if none of the tokens has a word vector """
+
+        out[:] = 0.0
+        for token in tokens:
+            if unicode(token) in self.embedding_dict:
+                out += self.embedding_dict[unicode(token)]
+
+        norm = np.linalg.norm(out)
+        if norm > 0.0:
+            out /= norm
+
+    def build(self):
+
+        """ embed all distinct training data inputs of our language, write matrix and response tokens """
+
+        logging.info('load discourses from db...')
+
+        drs = {}
+        for dr in self.session.query(model.TrainingData).filter(model.TrainingData.lang==self.lang).yield_per(TRAINING_DATA_YIELD_PER):
+
+            if not dr.inp in drs:
+                drs[dr.inp] = set()
+
+            resp = [dr.md5s]
+
+            args = json.loads(dr.args)
+            if args:
+                for arg in args:
+                    resp.append(json.dumps(arg))
+
+            drs[dr.inp].add(tuple(resp))
+
+        self._load_word_embeddings()
+
+        t0 = time()
+
+        inps   = []
+        resps  = []
+        matrix = np.zeros((len(drs), self.embed_dim), dtype='float32')
+
+        for inp in sorted(drs):
+
+            tokens = tokenize(inp, lang=self.lang)
+
+            self._embed(tokens, matrix[len(inps)])
+            if not matrix[len(inps)].any():
+                logging.debug('no word vectors for %s, skipped.' % repr(inp))
+                continue
+
+            # same token sequence NLPModel decodes: resp _OR resp ... _STOP
+
+            td_resp = []
+            for resp in sorted(drs[inp]):
+                if td_resp:
+                    td_resp.append(_OR)
+                td_resp.extend(resp)
+            td_resp.append(_STOP)
+
+            inps.append(u' '.join(tokens))
+            resps.append(td_resp)
+
+        # write under temporary names first so running kernals never see partial files
+
+        pid = os.getpid()
+
+        with open('%s.%d' % (self.matrix_fn, pid), 'wb') as f:
+            np.save(f, matrix[:len(inps)])
+        with codecs.open('%s.%d' % (self.data_fn, pid), 'w', 'utf8') as f:
+            f.write(json.dumps({'inps': inps, 'resps': resps}, ensure_ascii=False))
+
+        os.rename('%s.%d' % (self.data_fn, pid), self.data_fn)
+        os.rename('%s.%d' % (self.matrix_fn, pid), self.matrix_fn)
+
+        logging.info('%s written: %d of %d inputs, %.1fs.' % (self.matrix_fn, len(inps), len(drs), time()-t0))
+
+    def restore(self):
+
+        self._load_word_embeddings()
+
+        self.matrix = np.load(self.matrix_fn, mmap_mode='r')
+
+        with io.open(self.data_fn, 'r', encoding='utf8') as f:
+            data = json.loads(f.read())
+
+        self.inps    = data['inps']
+        self.resps   = data['resps']
+        self.inp_idx = dict( (inp, i) for i, inp in enumerate(self.inps) )
+        self.version = os.path.getmtime(self.matrix_fn)
+
+        logging.info ('%s loaded, %d inputs.' % (self.matrix_fn, len(self.inps)))
+
+    def predict_batch (self, inps, beam_width=1, holdout=False):
+
+        """ responses of the beam_width nearest training inputs (cosine similarity >= min_similarity)
+            for each input, as lists of (similarity, response tokens), best first.
+            holdout: ignore training inputs identical to the input (leave-one-out evaluation) """
+
+        k   = min(beam_width, len(self.inps))
+        res = []
+
+        for offset in range(0, len(inps), self.batch_size):
+
+            batch  = [tokenize(inp, lang=self.lang) for inp in inps[offset:offset+self.batch_size]]
+            q      = np.zeros((len(batch), self.embed_dim), dtype='float32')
+            for i, tokens in enumerate(batch):
+                self._embed(tokens, q[i])
+
+            sims = np.dot(q, self.matrix.T)
+
+            if holdout:
+                for i, tokens in enumerate(batch):
+                    j = self.inp_idx.get(u' '.join(tokens))
+                    if j is not None:
+                        sims[i, j] = -np.inf
+
+            if k < len(self.inps):
+                best = np.argpartition(-sims, k-1, axis=1)[:, :k]
+            else:
+                best = np.tile(np.arange(len(self.inps)), (len(batch), 1))
+
+            for i in range(len(batch)):
+                hyps = []
+                if not q[i].any():
+                    res.append(hyps)  # none of the words has a vector
+                    continue
+                for j in sorted(best[i], key=lambda j: -sims[i, j]):
+                    if sims[i, j] >= self.min_similarity:
+                        hyps.append((float(sims[i, j]), list(self.resps[j])))
+                res.append(hyps)
+
+        return res
+
+    def predict (self, inp):
+        hyps = self.predict_batch([inp])[0]
+        return hyps[0][1] if hyps else [_STOP]
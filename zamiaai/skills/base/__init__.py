@@ -25,6 +25,8 @@ DEPENDS    = [ 'config' ]
 
 PL_SOURCES = ['utils.pl']
 
+STATIC_PREDICATES = ['is_subclass_of', 'instances_of', 'is_entity', 'is_human', 'is_male', 'is_female', 'human_gender']
+
 # wikidata utils in python
 
 def transcribe_number (n, lang, flx):
@@ -23,6 +23,8 @@ PL_SOURCES  = [
                'config'
               ]
 
+STATIC_PREDICATES = [ 'forename', 'favMovie', 'favStation', 'favAuthor', 'favBook', 'idol' ]
+
 def get_data(kernal):
 
     #
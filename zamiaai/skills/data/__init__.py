@@ -28,3 +28,33 @@ PL_SOURCES = [
               'weather_base',
              ]
 
+# wikidata derived facts, never change between compiles -> query results may be cached
+
+STATIC_PREDICATES = [
+                     'rdfsLabel',
+                     'wdpdInstanceOf',
+                     'wdpdSubclassOf',
+                     'wdpdSexOrGender',
+                     'wdpdAuthor',
+                     'wdpdDirector',
+                     'wdpdPublicationDate',
+                     'wdpdNumericValue',
+                     'wdpdPlaceOfBirth',
+                     'wdpdDateOfBirth',
+                     'wdpdResidence',
+                     'wdpdOccupation',
+                     'wdpdCountry',
+                     'wdpdCapital',
+                     'wdpdPopulation',
+                     'wdpdArea',
+                     'wdpdLocatedIn',
+                     'wdpdPositionHeld',
+                     'wdpPositionHeld',
+                     'wdpsPositionHeld',
+                     'wdpqStartTime',
+                     'wdpqEndTime',
+                     'wboTimeValue',
+                     'owmCityId',
+                     'aiTimezone',
+                    ]
+
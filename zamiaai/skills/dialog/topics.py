@@ -59,7 +59,7 @@ def get_data(k):
 
         for entity, score in c.kernal.mem_get_multi(c.user, 'f1ent'):
 
-            for res in c.kernal.prolog_query("rdfsLabel(%s, %s, L)." % (entity, c.lang)):
+            for res in c.kernal.query('rdfsLabel', [entity, c.lang, Var('L')]):
 
                 s2 = res[0]
 
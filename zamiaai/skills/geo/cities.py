@@ -17,6 +17,8 @@
 # limitations under the License.
 #
 
+from zamiaai.ai_query import Var, pl_goal
+
 def get_data(k):
 
     k.dte.set_prefixes([u''])
@@ -28,7 +30,9 @@ def get_data(k):
 
     for lang in ['en', 'de']:
         cnt = 0
-        for res in k.prolog_query("instances_of(wdeCity, CITY), rdfsLabel(CITY, %s, LABEL)." % lang):
+        query = u', '.join([pl_goal('instances_of', ['wdeCity', Var('CITY')]),
+                            pl_goal('rdfsLabel', [Var('CITY'), lang, Var('LABEL')])]) + u'.'
+        for res in k.prolog_query(query):
             s_city  = res[0].name 
             s_label = res[1].value
             k.dte.ner(lang, 'city', s_city, s_label)
@@ -46,7 +50,7 @@ def get_data(k):
             if not f1ent:
                 return
             f1ent = f1ent[0][0]
-            if not c.kernal.prolog_check('instances_of(%s, %s).' % ('wdeCity', f1ent)):
+            if not c.kernal.query_check('instances_of', ['wdeCity', f1ent]):
                 return
 
         if ts>=0:
@@ -57,10 +61,10 @@ def get_data(k):
         # import pdb; pdb.set_trace()
 
         for city, score in fss:
-            clabel  = c.kernal.prolog_query_one(u'rdfsLabel(%s, %s, L).' % (city, c.lang))
-            country = c.kernal.prolog_query_one(u"wdpdCountry(%s, COUNTRY)." % city)
+            clabel  = c.kernal.label(city, c.lang)
+            country = c.kernal.query_one('wdpdCountry', [city, Var('COUNTRY')])
             if clabel and country:
-                cylabel = c.kernal.prolog_query_one(u'rdfsLabel(%s, %s, L).' % (country, c.lang))
+                cylabel = c.kernal.label(country, c.lang)
 
                 if c.lang=='de':
                     c.resp(u"%s ist eine Stadt in %s." % (clabel.value, cylabel.value), score=score, action=act, action_arg=city)
@@ -98,7 +102,7 @@ def get_data(k):
             if not f1ent:
                 return
             f1ent = f1ent[0][0]
-            if not c.kernal.prolog_check('instances_of(%s, %s).' % ('wdeCity', f1ent)):
+            if not c.kernal.query_check('instances_of', ['wdeCity', f1ent]):
                 return
 
         if ts>=0:
@@ -109,8 +113,8 @@ def get_data(k):
         # import pdb; pdb.set_trace()
 
         for city, score in fss:
-            clabel     = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (city, c.lang))
-            population = c.kernal.prolog_query_one("wdpdPopulation(%s, POPULATION)." % city)
+            clabel     = c.kernal.label(city, c.lang)
+            population = c.kernal.query_one('wdpdPopulation', [city, Var('POPULATION')])
             if clabel and population:
                 if c.lang=='de':
                     c.resp(u"%s hat %d Einwohner." % (clabel, population), score=score, action=act, action_arg=city)
@@ -142,7 +146,7 @@ def get_data(k):
             if not f1ent:
                 return
             f1ent = f1ent[0][0]
-            if not c.kernal.prolog_check('instances_of(%s, %s).' % ('wdeCity', f1ent)):
+            if not c.kernal.query_check('instances_of', ['wdeCity', f1ent]):
                 return
 
         if ts>=0:
@@ -153,8 +157,8 @@ def get_data(k):
         # import pdb; pdb.set_trace()
 
         for city, score in fss:
-            clabel = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (city, c.lang))
-            area   = c.kernal.prolog_query_one("wdpdArea(%s, AREA)." % city)
+            clabel = c.kernal.label(city, c.lang)
+            area   = c.kernal.query_one('wdpdArea', [city, Var('AREA')])
             if clabel and area:
                 if c.lang=='de':
                     c.resp(u"Die Fläche von %s ist %d Quadratkilometer." % (clabel, area), score=score, action=act, action_arg=city)
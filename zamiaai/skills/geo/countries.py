@@ -17,6 +17,8 @@
 # limitations under the License.
 #
 
+from zamiaai.ai_query import Var, pl_goal
+
 def get_data(k):
 
     k.dte.set_prefixes([u''])
@@ -24,7 +26,9 @@ def get_data(k):
     # NER, macros
 
     for lang in ['en', 'de']:
-        for res in k.prolog_query("instances_of(wdeCountry, COUNTRY), rdfsLabel(COUNTRY, %s, LABEL)." % lang):
+        query = u', '.join([pl_goal('instances_of', ['wdeCountry', Var('COUNTRY')]),
+                            pl_goal('rdfsLabel', [Var('COUNTRY'), lang, Var('LABEL')])]) + u'.'
+        for res in k.prolog_query(query):
             s_country = res[0].name 
             s_label   = res[1].value
             k.dte.ner(lang, 'country', s_country, s_label)
@@ -41,7 +45,7 @@ def get_data(k):
             if not f1ent:
                 return
             f1ent = f1ent[0][0]
-            if not c.kernal.prolog_check(u'instances_of(%s, %s).' % ('wdeCountry', f1ent)):
+            if not c.kernal.query_check('instances_of', ['wdeCountry', f1ent]):
                 return
 
         if ts>=0:
@@ -52,7 +56,7 @@ def get_data(k):
         # import pdb; pdb.set_trace()
 
         for country, score in fss:
-            clabel  = c.kernal.prolog_query_one(u'rdfsLabel(%s, %s, L).' % (country, c.lang))
+            clabel  = c.kernal.label(country, c.lang)
             if clabel:
                 if c.lang=='de':
                     c.resp(u"%s ist ein Staat auf dem Planeten Erde." % clabel, score=score, action=act, action_arg=country)
@@ -92,7 +96,7 @@ def get_data(k):
             if not f1ent:
                 return
             f1ent = f1ent[0][0]
-            if not c.kernal.prolog_check('instances_of(%s, %s).' % ('wdeCountry', f1ent)):
+            if not c.kernal.query_check('instances_of', ['wdeCountry', f1ent]):
                 return
 
         if ts>=0:
@@ -103,8 +107,8 @@ def get_data(k):
         # import pdb; pdb.set_trace()
 
         for country, score in fss:
-            clabel     = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (country, c.lang))
-            population = c.kernal.prolog_query_one("wdpdPopulation(%s, POPULATION)." % country)
+            clabel     = c.kernal.label(country, c.lang)
+            population = c.kernal.query_one('wdpdPopulation', [country, Var('POPULATION')])
             if clabel and population:
                 if c.lang=='de':
                     c.resp(u"%s hat %d Einwohner." % (clabel, population), score=score, action=act, action_arg=country)
@@ -136,7 +140,7 @@ def get_data(k):
             if not f1ent:
                 return
             f1ent = f1ent[0][0]
-            if not c.kernal.prolog_check('instances_of(%s, %s).' % ('wdeCountry', f1ent)):
+            if not c.kernal.query_check('instances_of', ['wdeCountry', f1ent]):
                 return
 
         if ts>=0:
@@ -147,8 +151,8 @@ def get_data(k):
         # import pdb; pdb.set_trace()
 
         for country, score in fss:
-            clabel = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (country, c.lang))
-            area   = c.kernal.prolog_query_one("wdpdArea(%s, AREA)." % country)
+            clabel = c.kernal.label(country, c.lang)
+            area   = c.kernal.query_one('wdpdArea', [country, Var('AREA')])
             if clabel and area:
                 if c.lang=='de':
                     c.resp(u"Die Fläche von %s ist %d Quadratkilometer." % (clabel, area), score=score, action=act, action_arg=country)
@@ -180,7 +184,7 @@ def get_data(k):
             if not f1ent:
                 return
             f1ent = f1ent[0][0]
-            if not c.kernal.prolog_check('instances_of(%s, %s).' % ('wdeCountry', f1ent)):
+            if not c.kernal.query_check('instances_of', ['wdeCountry', f1ent]):
                 return
 
         if ts>=0:
@@ -191,10 +195,10 @@ def get_data(k):
         # import pdb; pdb.set_trace()
 
         for country, score in fss:
-            clabel   = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (country, c.lang))
-            capital = c.kernal.prolog_query_one("wdpdCapital(%s, CAPITAL)." % country)
+            clabel   = c.kernal.label(country, c.lang)
+            capital = c.kernal.query_one('wdpdCapital', [country, Var('CAPITAL')])
             if clabel and capital:
-                caplabel = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (capital, c.lang))
+                caplabel = c.kernal.label(capital, c.lang)
 
                 if c.lang=='de':
                     c.resp(u"Die Hauptstadt von %s ist %s." % (clabel, caplabel), score=score, action=act, action_arg=(country, capital))
@@ -248,7 +252,7 @@ def get_data(k):
             if not f1ent:
                 return
             f1ent = f1ent[0][0]
-            if not c.kernal.prolog_check('instances_of(%s, %s).' % ('wdeFilm', f1ent)):
+            if not c.kernal.query_check('instances_of', ['wdeFilm', f1ent]):
                 return
 
         if ts>=0:
@@ -259,7 +263,7 @@ def get_data(k):
         # import pdb; pdb.set_trace()
 
         for country, score in fss:
-            clabel   = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (country, c.lang))
+            clabel   = c.kernal.label(country, c.lang)
             if c.lang=='de':
                 c.resp(u"Klar, %s." % clabel, score=score, action=act, action_arg=country)
             else:
@@ -17,6 +17,8 @@
 # limitations under the License.
 #
 
+from zamiaai.ai_query import Var, pl_goal
+
 def get_data(k):
 
     k.dte.set_prefixes([u''])
@@ -24,7 +26,9 @@ def get_data(k):
     # NER, macros
 
     for lang in ['en', 'de']:
-        for res in k.prolog_query("instances_of(wdeFederatedState, STATE), rdfsLabel(STATE, %s, LABEL)." % lang):
+        query = u', '.join([pl_goal('instances_of', ['wdeFederatedState', Var('STATE')]),
+                            pl_goal('rdfsLabel', [Var('STATE'), lang, Var('LABEL')])]) + u'.'
+        for res in k.prolog_query(query):
             s_state = res[0].name
             s_label = res[1].value
             k.dte.ner(lang, 'federated_state', s_state, s_label)
@@ -40,7 +44,7 @@ def get_data(k):
             if not f1ent:
                 return
             f1ent = f1ent[0][0]
-            if not c.kernal.prolog_check('instances_of(%s, %s).' % ('wdeFederatedState', f1ent)):
+            if not c.kernal.query_check('instances_of', ['wdeFederatedState', f1ent]):
                 return
 
         if ts>=0:
@@ -51,10 +55,10 @@ def get_data(k):
         # import pdb; pdb.set_trace()
 
         for federated_state, score in fss:
-            flabel  = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (federated_state, c.lang))
-            country = c.kernal.prolog_query_one("wdpdCountry(%s, COUNTRY)." % federated_state)
+            flabel  = c.kernal.label(federated_state, c.lang)
+            country = c.kernal.query_one('wdpdCountry', [federated_state, Var('COUNTRY')])
             if flabel and country:
-                cylabel = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (country, c.lang))
+                cylabel = c.kernal.label(country, c.lang)
 
                 if c.lang=='de':
                     c.resp(u"%s ist ein Land in %s." % (flabel, cylabel), score=score, action=act, action_arg=federated_state)
@@ -96,7 +100,7 @@ def get_data(k):
             if not f1ent:
                 return
             f1ent = f1ent[0][0]
-            if not c.kernal.prolog_check('instances_of(%s, %s).' % ('wdeFederatedState', f1ent)):
+            if not c.kernal.query_check('instances_of', ['wdeFederatedState', f1ent]):
                 return
 
         if ts>=0:
@@ -107,8 +111,8 @@ def get_data(k):
         # import pdb; pdb.set_trace()
 
         for federated_state, score in fss:
-            clabel     = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (federated_state, c.lang))
-            population = c.kernal.prolog_query_one("wdpdPopulation(%s, POPULATION)." % federated_state)
+            clabel     = c.kernal.label(federated_state, c.lang)
+            population = c.kernal.query_one('wdpdPopulation', [federated_state, Var('POPULATION')])
             if clabel and population:
                 if c.lang=='de':
                     c.resp(u"%s hat %d Einwohner." % (clabel, population), score=score, action=act, action_arg=federated_state)
@@ -140,7 +144,7 @@ def get_data(k):
             if not f1ent:
                 return
             f1ent = f1ent[0][0]
-            if not c.kernal.prolog_check('instances_of(%s, %s).' % ('wdeFederatedState', f1ent)):
+            if not c.kernal.query_check('instances_of', ['wdeFederatedState', f1ent]):
                 return
 
         if ts>=0:
@@ -151,8 +155,8 @@ def get_data(k):
         # import pdb; pdb.set_trace()
 
         for federated_state, score in fss:
-            clabel = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (federated_state, c.lang))
-            area   = c.kernal.prolog_query_one("wdpdArea(%s, AREA)." % federated_state)
+            clabel = c.kernal.label(federated_state, c.lang)
+            area   = c.kernal.query_one('wdpdArea', [federated_state, Var('AREA')])
             if clabel and area:
                 if c.lang=='de':
                     c.resp(u"Die Fläche von %s ist %d Quadratkilometer." % (clabel, area), score=score, action=act, action_arg=federated_state)
@@ -185,7 +189,7 @@ def get_data(k):
             if not f1ent:
                 return
             f1ent = f1ent[0][0]
-            if not c.kernal.prolog_check('instances_of(%s, %s).' % ('wdeFederatedState', f1ent)):
+            if not c.kernal.query_check('instances_of', ['wdeFederatedState', f1ent]):
                 return
 
         if ts>=0:
@@ -196,10 +200,10 @@ def get_data(k):
         # import pdb; pdb.set_trace()
 
         for state, score in fss:
-            slabel   = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (state, c.lang))
-            capital = c.kernal.prolog_query_one("wdpdCapital(%s, CAPITAL)." % state)
+            slabel   = c.kernal.label(state, c.lang)
+            capital = c.kernal.query_one('wdpdCapital', [state, Var('CAPITAL')])
             if slabel and capital:
-                caplabel = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (capital, c.lang))
+                caplabel = c.kernal.label(capital, c.lang)
 
                 if c.lang=='de':
                     c.resp(u"Die Hauptstadt von %s ist %s." % (slabel, caplabel), score=score, action=act, action_arg=(state, capital))
@@ -254,7 +258,7 @@ def get_data(k):
             if not f1ent:
                 return
             f1ent = f1ent[0][0]
-            if not c.kernal.prolog_check('instances_of(%s, %s).' % ('wdeFederatedState', f1ent)):
+            if not c.kernal.query_check('instances_of', ['wdeFederatedState', f1ent]):
                 return
 
         if ts>=0:
@@ -265,7 +269,7 @@ def get_data(k):
         # import pdb; pdb.set_trace()
 
         for federated_state, score in fss:
-            clabel   = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (federated_state, c.lang))
+            clabel   = c.kernal.label(federated_state, c.lang)
             if c.lang=='de':
                 c.resp(u"Klar, %s." % clabel, score=score, action=act, action_arg=federated_state)
             else:
@@ -17,7 +17,8 @@
 # limitations under the License.
 #
 
-from pyxsb import XSBString
+from pyxsb            import XSBString
+from zamiaai.ai_query import Var, pl_goal
 
 def get_data(k):
 
@@ -26,7 +27,10 @@ def get_data(k):
     # NER, macros
 
     for lang in ['en', 'de']:
-        for res in k.prolog_query("aiHomeLocation(HOME_LOCATION), rdfsLabel(HOME_LOCATION, %s, LABEL), aiPrepLoc(HOME_LOCATION, %s, PL)." % (lang, lang)):
+        query = u', '.join([pl_goal('aiHomeLocation', [Var('HOME_LOCATION')]),
+                            pl_goal('rdfsLabel', [Var('HOME_LOCATION'), lang, Var('LABEL')]),
+                            pl_goal('aiPrepLoc', [Var('HOME_LOCATION'), lang, Var('PL')])]) + u'.'
+        for res in k.prolog_query(query):
             s_loc   = res[0].name
             s_label = res[1].value
             s_pl    = res[2].value if isinstance(res[2], XSBString) else u""
@@ -17,6 +17,8 @@
 # limitations under the License.
 #
 
+from zamiaai.ai_query import Var, pl_goal
+
 def get_data(k):
 
     k.dte.set_prefixes([u''])
@@ -50,7 +52,9 @@ def get_data(k):
 
     for lang in ['en', 'de']:
         cnt = 0
-        for res in k.prolog_query("wdpdInstanceOf(HUMAN, wdeHuman), rdfsLabel(HUMAN, %s, LABEL)." % lang):
+        query = u', '.join([pl_goal('wdpdInstanceOf', [Var('HUMAN'), 'wdeHuman']),
+                            pl_goal('rdfsLabel', [Var('HUMAN'), lang, Var('LABEL')])]) + u'.'
+        for res in k.prolog_query(query):
             s_human = res[0].name 
             s_label = res[1].value
             k.dte.ner(lang, 'human', s_human, s_label)
@@ -63,10 +67,8 @@ def get_data(k):
         def act(c, entity):
             c.kernal.mem_push(c.user, 'f1ent', entity)
 
-        # import pdb; pdb.set_trace()
-
         for entity, score in c.ner(c.lang, 'human', ts, te):
-            if c.kernal.prolog_check('wdpdSexOrGender(%s, wdeMale),!.' % entity):
+            if c.kernal.query_check('wdpdSexOrGender', [entity, 'wdeMale']):
                 if c.lang=='en':
                     c.resp(u"His name sounds familiar.", score=score, action=act, action_arg=entity)
                     c.resp(u"Would you like to know more about him?", score=score, action=act, action_arg=entity)
@@ -123,14 +125,16 @@ def get_data(k):
         if ts>=0:
             hss = c.ner(c.lang, 'human', ts, te)
         else:
-            # import pdb; pdb.set_trace()
             hss = c.kernal.mem_get_multi(c.user, 'f1ent')
 
         for human, score in hss:
-            hlabel = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (human, c.lang))
-            bp = c.kernal.prolog_query_one("wdpdPlaceOfBirth(%s, BP)." % human)
-            if hlabel and bp:
-                bplabel = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (bp, c.lang))
+            # label, birthplace and birthplace label in one round trip
+            hl, bpl = c.kernal.prolog_query_multi([pl_goal('rdfsLabel', [human, c.lang, Var('L')]),
+                                                   pl_goal('wdpdPlaceOfBirth', [human, Var('BP')]) + u', ' + 
+                                                   pl_goal('rdfsLabel', [Var('BP'), c.lang, Var('BPL')])], first=True)
+            if hl and bpl:
+                hlabel      = hl[0]
+                bp, bplabel = bpl
                 if c.lang == 'en':
                     c.resp(u"%s was born in %s, I think." % (hlabel, bplabel), score=score, action=act, action_arg=(human, bp)) 
                     c.resp(u"I believe %s was born in %s." % (hlabel, bplabel), score=score, action=act, action_arg=(human, bp))
@@ -174,11 +178,12 @@ def get_data(k):
             hss = c.kernal.mem_get_multi(c.user, 'f1ent')
 
         for human, score in hss:
-            hlabel = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (human, c.lang))
-            # import pdb; pdb.set_trace()
-            cp = c.kernal.prolog_query_one('wdpdPlaceOfBirth(%s, BP), wdpdCountry(BP, COUNTRY).'% human, idx=1)
+            hlabel = c.kernal.label(human, c.lang)
+            query = u', '.join([pl_goal('wdpdPlaceOfBirth', [human, Var('BP')]),
+                                pl_goal('wdpdCountry', [Var('BP'), Var('COUNTRY')])]) + u'.'
+            cp = c.kernal.prolog_query_one(query, idx=1)
             if hlabel and cp:
-                cplabel = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (cp, c.lang))
+                cplabel = c.kernal.label(cp, c.lang)
                 if c.lang == 'en':
                     c.resp(u"%s was born in %s, I think." % (hlabel, cplabel), score=score, action=act, action_arg=(human, cp)) 
                     c.resp(u"I believe %s was born in %s." % (hlabel, cplabel), score=score, action=act, action_arg=(human, cp))
@@ -225,9 +230,8 @@ def get_data(k):
             hss = c.kernal.mem_get_multi(c.user, 'f1ent')
 
         for human, score in hss:
-            hlabel = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (human, c.lang))
-            # import pdb; pdb.set_trace()
-            bd = c.kernal.prolog_query_one('wdpdDateOfBirth(%s, BD).'% human)
+            hlabel = c.kernal.label(human, c.lang)
+            bd = c.kernal.query_one('wdpdDateOfBirth', [human, Var('BD')])
             if hlabel and bd:
                 bdlabel = base.transcribe_date(dateutil.parser.parse(bd.value), c.lang, 'dativ')
                 if c.lang == 'en':
@@ -273,14 +277,13 @@ def get_data(k):
         if ts>=0:
             hss = c.ner(c.lang, 'human', ts, te)
         else:
-            # import pdb; pdb.set_trace()
             hss = c.kernal.mem_get_multi(c.user, 'f1ent')
 
         for human, score in hss:
-            hlabel = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (human, c.lang))
-            residence = c.kernal.prolog_query_one("wdpdResidence(%s, RESIDENCE)." % human)
+            hlabel = c.kernal.label(human, c.lang)
+            residence = c.kernal.query_one('wdpdResidence', [human, Var('RESIDENCE')])
             if hlabel and residence:
-                residencelabel = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (residence, c.lang))
+                residencelabel = c.kernal.label(residence, c.lang)
                 if c.lang == 'en':
                     c.resp(u"%s lives %s, I think." % (hlabel, residencelabel), score=score, action=act, action_arg=(human, residence)) 
                     c.resp(u"I believe %s lives in %s." % (hlabel, residencelabel), score=score, action=act, action_arg=(human, residence))
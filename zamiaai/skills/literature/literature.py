@@ -17,6 +17,8 @@
 # limitations under the License.
 #
 
+from zamiaai.ai_query import Var, pl_goal
+
 def get_data(k):
 
     k.dte.set_prefixes([u''])
@@ -41,7 +43,9 @@ def get_data(k):
 
     for lang in ['en', 'de']:
         cnt = 0
-        for res in k.prolog_query("wdpdInstanceOf(BOOK, wdeBook), rdfsLabel(BOOK, %s, LABEL)." % lang):
+        query = u', '.join([pl_goal('wdpdInstanceOf', [Var('BOOK'), 'wdeBook']),
+                            pl_goal('rdfsLabel', [Var('BOOK'), lang, Var('LABEL')])]) + u'.'
+        for res in k.prolog_query(query):
             s_book  = res[0].name
             s_label = res[1].value
             k.dte.ner(lang, 'book', s_book, s_label)
@@ -62,7 +66,7 @@ def get_data(k):
             if not f1ent:
                 return
             f1ent = f1ent[0][0]
-            if not c.kernal.prolog_check('instances_of(%s, %s).' % ('wdeBook', f1ent)):
+            if not c.kernal.query_check('instances_of', ['wdeBook', f1ent]):
                 return
 
         if ts>=0:
@@ -72,10 +76,10 @@ def get_data(k):
             bss = c.kernal.mem_get_multi(c.user, 'f1ent')
 
         for book, score in bss:
-            blabel = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (book, c.lang))
-            human = c.kernal.prolog_query_one("wdpdAuthor(%s, HUMAN)." % book)
+            blabel = c.kernal.label(book, c.lang)
+            human = c.kernal.query_one('wdpdAuthor', [book, Var('HUMAN')])
             if blabel and human:
-                hlabel = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (human, c.lang))
+                hlabel = c.kernal.label(human, c.lang)
                 if c.lang == 'de':
                     c.resp(u"%s wurde von %s geschrieben, denke ich." % (blabel, hlabel), score=score, action=act, action_arg=(human, book)) 
                 else:
@@ -107,8 +111,8 @@ def get_data(k):
         # import pdb; pdb.set_trace()
 
         for entity, score in c.ner(c.lang, 'human', ts, te):
-            if c.kernal.prolog_check('wdpdAuthor(LITERATURE, %s),!.' % entity):
-                if c.kernal.prolog_check('wdpdSexOrGender(%s, wdeMale),!.' % entity):
+            if c.kernal.query_check('wdpdAuthor', [Var('LITERATURE'), entity]):
+                if c.kernal.query_check('wdpdSexOrGender', [entity, 'wdeMale']):
                     if c.lang=='de':
                         c.resp(u"Ist der nicht Buchautor?", score=score+10, action=act, action_arg=entity)
                     else:
@@ -141,7 +145,7 @@ def get_data(k):
             if not f1ent:
                 return
             f1ent = f1ent[0][0]
-            if not c.kernal.prolog_check('instances_of(%s, %s).' % ('wdeBook', f1ent)):
+            if not c.kernal.query_check('instances_of', ['wdeBook', f1ent]):
                 return
 
         if ts>=0:
@@ -153,8 +157,8 @@ def get_data(k):
         # import pdb; pdb.set_trace()
 
         for book, score in fss:
-            blabel   = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (book, c.lang))
-            pd       = c.kernal.prolog_query_one("wdpdPublicationDate(%s, PD)." % book)
+            blabel   = c.kernal.label(book, c.lang)
+            pd       = c.kernal.query_one('wdpdPublicationDate', [book, Var('PD')])
             if blabel and pd:
 
                 pd = dateutil.parser.parse(pd.value)
@@ -189,10 +193,10 @@ def get_data(k):
         bss = c.ner(c.lang, 'book', ts, te)
 
         for book, score in bss:
-            blabel = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (book, c.lang))
-            human = c.kernal.prolog_query_one("wdpdAuthor(%s, HUMAN)." % book)
+            blabel = c.kernal.label(book, c.lang)
+            human = c.kernal.query_one('wdpdAuthor', [book, Var('HUMAN')])
             if blabel and human:
-                hlabel = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (human, c.lang))
+                hlabel = c.kernal.label(human, c.lang)
                 if c.lang == 'de':
                     c.resp(u"Klar - das ist ein Buch von %s, richtig?" % hlabel, score=score, action=act, action_arg=(human, book)) 
                 else:
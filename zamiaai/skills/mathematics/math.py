@@ -48,7 +48,7 @@ def get_data(k):
         def action_set_ent_math(c):
             c.kernal.mem_push(c.user, 'f1ent', 'wdeMathematics')
         for n1e, score in c.ner(c.lang, 'natnum', n1_start, n1_end):
-            for row in c.kernal.prolog_query('wdpdNumericValue(%s, N1).' % unicode(n1e)):
+            for row in c.kernal.query_first('wdpdNumericValue', [n1e, Var('N1')]):
                 n1 = row[0]
                 res = n1 * n1
                 c.resp(u"%d" % res, score=score+100.0, action=action_set_ent_math)
@@ -65,10 +65,10 @@ def get_data(k):
         def action_set_ent_math(c):
             c.kernal.mem_push(c.user, 'f1ent', 'wdeMathematics')
         for n1e, s1 in c.ner(c.lang, 'natnum', n1_start, n1_end):
-            for row in c.kernal.prolog_query('wdpdNumericValue(%s, N1).' % unicode(n1e)):
+            for row in c.kernal.query_first('wdpdNumericValue', [n1e, Var('N1')]):
                 n1 = row[0]
             for n2e, s2 in c.ner(c.lang, 'natnum', n2_start, n2_end):
-                for row in c.kernal.prolog_query('wdpdNumericValue(%s, N2).' % unicode(n2e)):
+                for row in c.kernal.query_first('wdpdNumericValue', [n2e, Var('N2')]):
                     n2 = row[0]
                     res = n1 + n2
                     score = s1+s2
@@ -90,10 +90,10 @@ def get_data(k):
         def action_set_ent_math(c):
             c.kernal.mem_push(c.user, 'f1ent', 'wdeMathematics')
         for n1e, s1 in c.ner(c.lang, 'natnum', n1_start, n1_end):
-            for row in c.kernal.prolog_query('wdpdNumericValue(%s, N1).' % unicode(n1e)):
+            for row in c.kernal.query_first('wdpdNumericValue', [n1e, Var('N1')]):
                 n1 = row[0]
             for n2e, s2 in c.ner(c.lang, 'natnum', n2_start, n2_end):
-                for row in c.kernal.prolog_query('wdpdNumericValue(%s, N2).' % unicode(n2e)):
+                for row in c.kernal.query_first('wdpdNumericValue', [n2e, Var('N2')]):
                     n2 = row[0]
                     res = n1 - n2
                     score = s1+s2
@@ -116,10 +116,10 @@ def get_data(k):
         def action_set_ent_math(c):
             c.kernal.mem_push(c.user, 'f1ent', 'wdeMathematics')
         for n1e, s1 in c.ner(c.lang, 'natnum', n1_start, n1_end):
-            for row in c.kernal.prolog_query('wdpdNumericValue(%s, N1).' % unicode(n1e)):
+            for row in c.kernal.query_first('wdpdNumericValue', [n1e, Var('N1')]):
                 n1 = row[0]
             for n2e, s2 in c.ner(c.lang, 'natnum', n2_start, n2_end):
-                for row in c.kernal.prolog_query('wdpdNumericValue(%s, N2).' % unicode(n2e)):
+                for row in c.kernal.query_first('wdpdNumericValue', [n2e, Var('N2')]):
                     n2 = row[0]
                     res = n1 * n2
                     score = s1+s2
@@ -140,10 +140,10 @@ def get_data(k):
         def action_set_ent_math(c):
             c.kernal.mem_push(c.user, 'f1ent', 'wdeMathematics')
         for n1e, s1 in c.ner(c.lang, 'natnum', n1_start, n1_end):
-            for row in c.kernal.prolog_query('wdpdNumericValue(%s, N1).' % unicode(n1e)):
+            for row in c.kernal.query_first('wdpdNumericValue', [n1e, Var('N1')]):
                 n1 = row[0]
             for n2e, s2 in c.ner(c.lang, 'natnum', n2_start, n2_end):
-                for row in c.kernal.prolog_query('wdpdNumericValue(%s, N2).' % unicode(n2e)):
+                for row in c.kernal.query_first('wdpdNumericValue', [n2e, Var('N2')]):
                     n2 = row[0]
                     res = n1 / n2
                     score = s1+s2
@@ -17,6 +17,8 @@
 # limitations under the License.
 #
 
+from zamiaai.ai_query import Var, pl_goal
+
 def get_data(k):
 
     k.dte.set_prefixes([u''])
@@ -24,7 +26,9 @@ def get_data(k):
     # NER, macros
 
     for lang in ['en', 'de']:
-        for res in k.prolog_query("aiMediaSlot(STATION, SLOT), rdfsLabel(STATION, %s, LABEL)." % lang):
+        query = u', '.join([pl_goal('aiMediaSlot', [Var('STATION'), Var('SLOT')]),
+                            pl_goal('rdfsLabel', [Var('STATION'), lang, Var('LABEL')])]) + u'.'
+        for res in k.prolog_query(query):
             s_station = res[0].name 
             s_label   = res[2].value
             k.dte.ner(lang, 'media_station', s_station, s_label)
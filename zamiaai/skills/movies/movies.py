@@ -17,6 +17,8 @@
 # limitations under the License.
 #
 
+from zamiaai.ai_query import Var, pl_goal
+
 def get_data(k):
 
     k.dte.set_prefixes([u''])
@@ -68,7 +70,9 @@ def get_data(k):
 
     for lang in ['en', 'de']:
         cnt = 0
-        for res in k.prolog_query("wdpdInstanceOf(FILM, wdeFilm), rdfsLabel(FILM, %s, LABEL)." % lang):
+        query = u', '.join([pl_goal('wdpdInstanceOf', [Var('FILM'), 'wdeFilm']),
+                            pl_goal('rdfsLabel', [Var('FILM'), lang, Var('LABEL')])]) + u'.'
+        for res in k.prolog_query(query):
             s_film = res[0].name
             s_label = res[1].value
             k.dte.ner(lang, 'film', s_film, s_label)
@@ -89,7 +93,7 @@ def get_data(k):
             if not f1ent:
                 return
             f1ent = f1ent[0][0]
-            if not c.kernal.prolog_check('instances_of(%s, %s).' % ('wdeFilm', f1ent)):
+            if not c.kernal.query_check('instances_of', ['wdeFilm', f1ent]):
                 return
 
         if ts>=0:
@@ -100,10 +104,13 @@ def get_data(k):
         # import pdb; pdb.set_trace()
 
         for film, score in fss:
-            flabel   = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (film, c.lang))
-            director = c.kernal.prolog_query_one("wdpdDirector(%s, DIRECTOR)." % film)
-            if flabel and director:
-                dirlabel = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (director, c.lang))
+            # film label, director and director label in one round trip
+            fl, dl = c.kernal.prolog_query_multi([pl_goal('rdfsLabel', [film, c.lang, Var('L')]),
+                                                  pl_goal('wdpdDirector', [film, Var('DIRECTOR')]) + u', ' + 
+                                                  pl_goal('rdfsLabel', [Var('DIRECTOR'), c.lang, Var('DL')])], first=True)
+            if fl and dl:
+                flabel             = fl[0]
+                director, dirlabel = dl
 
                 if c.lang=='de':
                     c.resp(u"%s wurde von %s gedreht, glaube ich." % (flabel, dirlabel), score=score, action=act, action_arg=(film, director))
@@ -136,8 +143,8 @@ def get_data(k):
         # import pdb; pdb.set_trace()
 
         for entity, score in c.ner(c.lang, 'human', ts, te):
-            if c.kernal.prolog_check('wdpdDirector(MOVIE, %s),!.' % entity):
-                if c.kernal.prolog_check('wdpdSexOrGender(%s, wdeMale),!.' % entity):
+            if c.kernal.query_check('wdpdDirector', [Var('MOVIE'), entity]):
+                if c.kernal.query_check('wdpdSexOrGender', [entity, 'wdeMale']):
                     if c.lang=='de':
                         c.resp(u"Ist der nicht Regisseur?", score=score+10, action=act, action_arg=entity)
                     else:
@@ -170,7 +177,7 @@ def get_data(k):
             if not f1ent:
                 return
             f1ent = f1ent[0][0]
-            if not c.kernal.prolog_check('instances_of(%s, %s).' % ('wdeFilm', f1ent)):
+            if not c.kernal.query_check('instances_of', ['wdeFilm', f1ent]):
                 return
 
         if ts>=0:
@@ -182,8 +189,8 @@ def get_data(k):
         # import pdb; pdb.set_trace()
 
         for film, score in fss:
-            flabel   = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (film, c.lang))
-            pd       = c.kernal.prolog_query_one("wdpdPublicationDate(%s, PD)." % film)
+            flabel   = c.kernal.label(film, c.lang)
+            pd       = c.kernal.query_one('wdpdPublicationDate', [film, Var('PD')])
             if flabel and pd:
 
                 pd = dateutil.parser.parse(pd.value)
@@ -216,7 +223,7 @@ def get_data(k):
             if not f1ent:
                 return
             f1ent = f1ent[0][0]
-            if not c.kernal.prolog_check('instances_of(%s, %s).' % ('wdeFilm', f1ent)):
+            if not c.kernal.query_check('instances_of', ['wdeFilm', f1ent]):
                 return
 
         if ts>=0:
@@ -227,9 +234,9 @@ def get_data(k):
         # import pdb; pdb.set_trace()
 
         for film, score in fss:
-            director = c.kernal.prolog_query_one("wdpdDirector(%s, DIRECTOR)." % film)
+            director = c.kernal.query_one('wdpdDirector', [film, Var('DIRECTOR')])
             if director:
-                dirlabel = c.kernal.prolog_query_one('rdfsLabel(%s, %s, L).' % (director, c.lang))
+                dirlabel = c.kernal.label(director, c.lang)
 
                 if c.lang=='de':
                     c.resp(u"Klar - der ist von %s, stimmts?" % dirlabel, score=score, action=act, action_arg=film)
@@ -29,7 +29,11 @@ def get_data(k):
             c.kernal.mem_push(c.user, 'f1pat', movie)
             c.kernal.mem_push(c.user, 'f1age', director)
 
-        for res in c.kernal.prolog_query("favMovie(self, MOVIE), rdfsLabel(MOVIE, %s, MOVIE_LABEL), wdpdDirector(MOVIE, DIRECTOR), rdfsLabel(DIRECTOR, %s, DIRECTOR_LABEL)." % (c.lang, c.lang)):
+        query = u', '.join([pl_goal('favMovie', ['self', Var('MOVIE')]),
+                            pl_goal('rdfsLabel', [Var('MOVIE'), c.lang, Var('MOVIE_LABEL')]),
+                            pl_goal('wdpdDirector', [Var('MOVIE'), Var('DIRECTOR')]),
+                            pl_goal('rdfsLabel', [Var('DIRECTOR'), c.lang, Var('DIRECTOR_LABEL')])]) + u'.'
+        for res in c.kernal.prolog_query(query):
 
             s_movie          = res[0]
             s_movie_label    = res[1].value
@@ -64,7 +68,9 @@ def get_data(k):
         def act(c, author):
             c.kernal.mem_push(c.user, 'f1ent', author)
 
-        for res in c.kernal.prolog_query("favAuthor(self, AUTHOR), rdfsLabel(AUTHOR, %s, AUTHOR_LABEL)." % c.lang):
+        query = u', '.join([pl_goal('favAuthor', ['self', Var('AUTHOR')]),
+                            pl_goal('rdfsLabel', [Var('AUTHOR'), c.lang, Var('AUTHOR_LABEL')])]) + u'.'
+        for res in c.kernal.prolog_query(query):
 
             s_author       = res[0]
             s_author_label = res[1].value
@@ -90,7 +96,11 @@ def get_data(k):
             c.kernal.mem_push(c.user, 'f1pat', book)
             c.kernal.mem_push(c.user, 'f1age', author)
 
-        for res in c.kernal.prolog_query("favBook(self, BOOK), rdfsLabel(BOOK, %s, BOOK_LABEL), wdpdAuthor(BOOK, AUTHOR), rdfsLabel(AUTHOR, %s, AUTHOR_LABEL)." % (c.lang, c.lang)):
+        query = u', '.join([pl_goal('favBook', ['self', Var('BOOK')]),
+                            pl_goal('rdfsLabel', [Var('BOOK'), c.lang, Var('BOOK_LABEL')]),
+                            pl_goal('wdpdAuthor', [Var('BOOK'), Var('AUTHOR')]),
+                            pl_goal('rdfsLabel', [Var('AUTHOR'), c.lang, Var('AUTHOR_LABEL')])]) + u'.'
+        for res in c.kernal.prolog_query(query):
 
             s_book         = res[0]
             s_book_label   = res[1].value
@@ -124,7 +134,9 @@ def get_data(k):
         def act(c, idol):
             c.kernal.mem_push(c.user, 'f1ent', idol)
 
-        for res in c.kernal.prolog_query("idol(self, IDOL), rdfsLabel(IDOL, %s, IDOL_LABEL)." % c.lang):
+        query = u', '.join([pl_goal('idol', ['self', Var('IDOL')]),
+                            pl_goal('rdfsLabel', [Var('IDOL'), c.lang, Var('IDOL_LABEL')])]) + u'.'
+        for res in c.kernal.prolog_query(query):
 
             s_idol       = res[0]
             s_idol_label = res[1].value
@@ -23,7 +23,7 @@ def get_data(k):
 
     def myNameAsked(c):
 
-        self_label = c.kernal.prolog_query_one('rdfsLabel(self, %s, L).' % c.lang)
+        self_label = c.kernal.label('self', c.lang)
 
         if c.lang == 'de':
             c.resp("Ich heiße %s" % self_label)
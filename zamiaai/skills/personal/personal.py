@@ -104,7 +104,9 @@ def get_data(k):
         import base
         import dateutil.parser
 
-        for res in c.kernal.prolog_query("wdpdPlaceOfBirth(self, BP), rdfsLabel(BP, %s, BP_LABEL)." % c.lang):
+        query = u', '.join([pl_goal('wdpdPlaceOfBirth', ['self', Var('BP')]),
+                            pl_goal('rdfsLabel', [Var('BP'), c.lang, Var('BP_LABEL')])]) + u'.'
+        for res in c.kernal.prolog_query(query):
 
             bp       = res[0]
             bp_label = res[1]
@@ -133,7 +135,9 @@ def get_data(k):
         import base
         import dateutil.parser
 
-        for res in c.kernal.prolog_query("wdpdLocatedIn(self, LOC), rdfsLabel(LOC, %s, LOC_LABEL)." % c.lang):
+        query = u', '.join([pl_goal('wdpdLocatedIn', ['self', Var('LOC')]),
+                            pl_goal('rdfsLabel', [Var('LOC'), c.lang, Var('LOC_LABEL')])]) + u'.'
+        for res in c.kernal.prolog_query(query):
 
             loc       = res[0]
             loc_label = res[1]
@@ -17,6 +17,8 @@
 # limitations under the License.
 #
 
+from zamiaai.ai_query import Var, pl_goal
+
 def get_data(k):
 
     k.dte.set_prefixes([u''])
@@ -30,11 +32,15 @@ def get_data(k):
     # NER, macros
 
     for lang in ['en', 'de']:
-        for res in k.prolog_query("wdpdInstanceOf(NAME, wdeMaleGivenName), rdfsLabel(NAME, %s, LABEL)." % lang):
+        query = u', '.join([pl_goal('wdpdInstanceOf', [Var('NAME'), 'wdeMaleGivenName']),
+                            pl_goal('rdfsLabel', [Var('NAME'), lang, Var('LABEL')])]) + u'.'
+        for res in k.prolog_query(query):
             s_name  = res[0].name
             s_label = res[1].value
             k.dte.macro(lang, 'firstname', {'LABEL': s_label})
-        for res in k.prolog_query("wdpdInstanceOf(NAME, wdeFemalGivenName), rdfsLabel(NAME, %s, LABEL)." % lang):
+        query = u', '.join([pl_goal('wdpdInstanceOf', [Var('NAME'), 'wdeFemalGivenName']),
+                            pl_goal('rdfsLabel', [Var('NAME'), lang, Var('LABEL')])]) + u'.'
+        for res in k.prolog_query(query):
             s_name  = res[0].name
             s_label = res[1].value
             k.dte.macro(lang, 'firstname', {'LABEL': s_label})
@@ -44,7 +50,7 @@ def get_data(k):
         def act(c, user_name):
             c.kernal.mem_set(c.user, 'name', user_name)
 
-        self_label = c.kernal.prolog_query_one('rdfsLabel(self, %s, L).' % c.lang)
+        self_label = c.kernal.label('self', c.lang)
 
         user_name = u" ".join(tokenize(c.inp, lang=c.lang)[ts:te])
 
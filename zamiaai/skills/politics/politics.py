@@ -17,6 +17,8 @@
 # limitations under the License.
 #
 
+from zamiaai.ai_query import Var, pl_goal
+
 def get_data(k):
 
     k.dte.set_prefixes([u''])
@@ -24,15 +26,18 @@ def get_data(k):
     # NER, macros
 
     for lang in ['en', 'de']:
-        for res in k.prolog_query("wdpdPositionHeld(PERSON, wdePresidentOfTheUnitedStatesOfAmerica), rdfsLabel(PERSON, %s, LABEL)." % lang):
+        for res in k.prolog_query(u'%s, %s.' % (pl_goal('wdpdPositionHeld', [Var('PERSON'), 'wdePresidentOfTheUnitedStatesOfAmerica']),
+                                                  pl_goal('rdfsLabel', [Var('PERSON'), lang, Var('LABEL')]))):
             s_person = res[0].name
             s_label  = res[1].value
             k.dte.macro(lang, 'known_politicians', {'LABEL': s_label})
-        for res in k.prolog_query("wdpdPositionHeld(PERSON, wdePresidentOfGermany), rdfsLabel(PERSON, %s, LABEL)." % lang):
+        for res in k.prolog_query(u'%s, %s.' % (pl_goal('wdpdPositionHeld', [Var('PERSON'), 'wdePresidentOfGermany']),
+                                                  pl_goal('rdfsLabel', [Var('PERSON'), lang, Var('LABEL')]))):
             s_person = res[0].name
             s_label  = res[1].value
             k.dte.macro(lang, 'known_politicians', {'LABEL': s_label})
-        for res in k.prolog_query("wdpdPositionHeld(PERSON, wdeFederalChancellorOfGermany), rdfsLabel(PERSON, %s, LABEL)." % lang):
+        for res in k.prolog_query(u'%s, %s.' % (pl_goal('wdpdPositionHeld', [Var('PERSON'), 'wdeFederalChancellorOfGermany']),
+                                                  pl_goal('rdfsLabel', [Var('PERSON'), lang, Var('LABEL')]))):
             s_person = res[0].name
             s_label  = res[1].value
             k.dte.macro(lang, 'known_politicians', {'LABEL': s_label})
@@ -49,10 +54,15 @@ def get_data(k):
 
         for entity, score in c.ner(c.lang, 'human', ts, te):
 
+            held    = pl_goal('wdpPositionHeld', [entity, Var('OFFICE_STMT')])
+            current = u'not(%s)' % pl_goal('wdpqEndTime', [Var('OFFICE_STMT'), Var()])
+
             # president of the united states
 
-            if c.kernal.prolog_check('wdpPositionHeld(%s, OFFICE_STMT), wdpsPositionHeld(OFFICE_STMT, wdePresidentOfTheUnitedStatesOfAmerica), not(wdpqEndTime(OFFICE_STMT, _)).' % entity):
-                if c.kernal.prolog_check('wdpdSexOrGender(%s, wdeMale),!.' % entity):
+            office = pl_goal('wdpsPositionHeld', [Var('OFFICE_STMT'), 'wdePresidentOfTheUnitedStatesOfAmerica'])
+
+            if c.kernal.prolog_check(u'%s, %s, %s.' % (held, office, current)):
+                if c.kernal.query_check('wdpdSexOrGender', [entity, 'wdeMale']):
                     if c.lang=='de':
                         c.resp(u"Ist der nicht der US Präsident?", score=score+10, action=act, action_arg=entity)
                     else:
@@ -63,8 +73,8 @@ def get_data(k):
                     else:
                         c.resp(u"Isn't she the current US President?", score=score+10, action=act, action_arg=entity)
 
-            elif c.kernal.prolog_check('wdpPositionHeld(%s, OFFICE_STMT), wdpsPositionHeld(OFFICE_STMT, wdePresidentOfTheUnitedStatesOfAmerica).' % entity):
-                if c.kernal.prolog_check('wdpdSexOrGender(%s, wdeMale),!.' % entity):
+            elif c.kernal.prolog_check(u'%s, %s.' % (held, office)):
+                if c.kernal.query_check('wdpdSexOrGender', [entity, 'wdeMale']):
                     if c.lang=='de':
                         c.resp(u"War der nicht mal US Präsident?", score=score+10, action=act, action_arg=entity)
                     else:
@@ -77,8 +87,10 @@ def get_data(k):
 
             # german chancellor
 
-            if c.kernal.prolog_check('wdpPositionHeld(%s, OFFICE_STMT), wdpsPositionHeld(OFFICE_STMT, wdeFederalChancellorOfGermany), not(wdpqEndTime(OFFICE_STMT, _)).' % entity):
-                if c.kernal.prolog_check('wdpdSexOrGender(%s, wdeMale),!.' % entity):
+            office = pl_goal('wdpsPositionHeld', [Var('OFFICE_STMT'), 'wdeFederalChancellorOfGermany'])
+
+            if c.kernal.prolog_check(u'%s, %s, %s.' % (held, office, current)):
+                if c.kernal.query_check('wdpdSexOrGender', [entity, 'wdeMale']):
                     if c.lang=='de':
                         c.resp(u"Ist der nicht der Bundeskanzler?", score=score+10, action=act, action_arg=entity)
                     else:
@@ -89,8 +101,8 @@ def get_data(k):
                     else:
                         c.resp(u"Isn't she the current German chancellor?", score=score+10, action=act, action_arg=entity)
 
-            elif c.kernal.prolog_check('wdpPositionHeld(%s, OFFICE_STMT), wdpsPositionHeld(OFFICE_STMT, wdeFederalChancellorOfGermany).' % entity):
-                if c.kernal.prolog_check('wdpdSexOrGender(%s, wdeMale),!.' % entity):
+            elif c.kernal.prolog_check(u'%s, %s.' % (held, office)):
+                if c.kernal.query_check('wdpdSexOrGender', [entity, 'wdeMale']):
                     if c.lang=='de':
                         c.resp(u"War der nicht mal Bundeskanzler?", score=score+10, action=act, action_arg=entity)
                     else:
@@ -103,8 +115,10 @@ def get_data(k):
 
             # german president
 
-            if c.kernal.prolog_check('wdpPositionHeld(%s, OFFICE_STMT), wdpsPositionHeld(OFFICE_STMT, wdePresidentOfGermany), not(wdpqEndTime(OFFICE_STMT, _)).' % entity):
-                if c.kernal.prolog_check('wdpdSexOrGender(%s, wdeMale),!.' % entity):
+            office = pl_goal('wdpsPositionHeld', [Var('OFFICE_STMT'), 'wdePresidentOfGermany'])
+
+            if c.kernal.prolog_check(u'%s, %s, %s.' % (held, office, current)):
+                if c.kernal.query_check('wdpdSexOrGender', [entity, 'wdeMale']):
                     if c.lang=='de':
                         c.resp(u"Ist der nicht der Bundespräsident?", score=score+10, action=act, action_arg=entity)
                     else:
@@ -115,8 +129,8 @@ def get_data(k):
                     else:
                         c.resp(u"Isn't she the current German president?", score=score+10, action=act, action_arg=entity)
 
-            elif c.kernal.prolog_check('wdpPositionHeld(%s, OFFICE_STMT), wdpsPositionHeld(OFFICE_STMT, wdePresidentOfGermany).' % entity):
-                if c.kernal.prolog_check('wdpdSexOrGender(%s, wdeMale),!.' % entity):
+            elif c.kernal.prolog_check(u'%s, %s.' % (held, office)):
+                if c.kernal.query_check('wdpdSexOrGender', [entity, 'wdeMale']):
                     if c.lang=='de':
                         c.resp(u"War der nicht mal Bundespräsident?", score=score+10, action=act, action_arg=entity)
                     else:
@@ -150,7 +164,15 @@ def get_data(k):
         entity   = None
         start_dt = None
 
-        for res in c.kernal.prolog_query('wdpPositionHeld(ENTITY, OFFICE_STMT), wdpsPositionHeld(OFFICE_STMT, %s), not(wdpqEndTime(OFFICE_STMT, _)), rdfsLabel(%s, %s, POSITION_LABEL), rdfsLabel(ENTITY, %s, ENTITY_LABEL), wdpqStartTime(OFFICE_STMT, STV), wboTimeValue(STV, START_TIME).' % (position, position, c.lang, c.lang)):
+        query = u', '.join([pl_goal('wdpPositionHeld', [Var('ENTITY'), Var('OFFICE_STMT')]),
+                            pl_goal('wdpsPositionHeld', [Var('OFFICE_STMT'), position]),
+                            u'not(%s)' % pl_goal('wdpqEndTime', [Var('OFFICE_STMT'), Var()]),
+                            pl_goal('rdfsLabel', [position, c.lang, Var('POSITION_LABEL')]),
+                            pl_goal('rdfsLabel', [Var('ENTITY'), c.lang, Var('ENTITY_LABEL')]),
+                            pl_goal('wdpqStartTime', [Var('OFFICE_STMT'), Var('STV')]),
+                            pl_goal('wboTimeValue', [Var('STV'), Var('START_TIME')])]) + u'.'
+
+        for res in c.kernal.prolog_query(query):
             q_entity       = res[0] 
             q_pos_label    = res[3].value
             q_entity_label = res[4].value
@@ -239,7 +261,7 @@ def get_data(k):
             if not f1ent:
                 return
             f1ent = f1ent[0][0]
-            if not c.kernal.prolog_check('instances_of(%s, %s).' % ('wdeHuman', f1ent)):
+            if not c.kernal.query_check('instances_of', ['wdeHuman', f1ent]):
                 return
 
         if ts>=0:
@@ -249,8 +271,13 @@ def get_data(k):
 
         for position in ['wdePresidentOfTheUnitedStatesOfAmerica','wdePresidentOfGermany','wdeFederalChancellorOfGermany']:
             for human, score in fss:
-                query = 'wdpPositionHeld(%s, OFFICE_STMT), wdpsPositionHeld(OFFICE_STMT, %s), %s(OFFICE_STMT, PREDECESSOR), %s \= PREDECESSOR, rdfsLabel(%s, %s, POSLABEL), rdfsLabel(%s, %s, HLABEL), rdfsLabel(PREDECESSOR, %s, PLABEL).' \
-                         % (             human,                                    position, pred_succ,                  human,                    position, c.lang,               human, c.lang,                           c.lang)
+                query = u', '.join([pl_goal('wdpPositionHeld', [human, Var('OFFICE_STMT')]),
+                                    pl_goal('wdpsPositionHeld', [Var('OFFICE_STMT'), position]),
+                                    pl_goal(pred_succ, [Var('OFFICE_STMT'), Var('PREDECESSOR')]),
+                                    pl_goal('\\=', [human, Var('PREDECESSOR')]),
+                                    pl_goal('rdfsLabel', [position, c.lang, Var('POSLABEL')]),
+                                    pl_goal('rdfsLabel', [human, c.lang, Var('HLABEL')]),
+                                    pl_goal('rdfsLabel', [Var('PREDECESSOR'), c.lang, Var('PLABEL')])]) + u'.'
 
                 # logging.info(query)
 
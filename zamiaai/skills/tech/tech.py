@@ -17,34 +17,44 @@
 # limitations under the License.
 #
 
+from zamiaai.ai_query import Var, pl_goal
+
 def get_data(k):
     k.dte.set_prefixes([u''])
 
     # NER, macros
 
     for lang in ['en', 'de']:
-        for res in k.prolog_query("instances_of(wdeOperatingSystem, OS), rdfsLabel(OS, %s, LABEL)." % lang):
+        query = u', '.join([pl_goal('instances_of', ['wdeOperatingSystem', Var('OS')]),
+                            pl_goal('rdfsLabel', [Var('OS'), lang, Var('LABEL')])]) + u'.'
+        for res in k.prolog_query(query):
             s_os    = res[0].name
             s_label = res[1].value
             k.dte.ner(lang, 'operating_system', s_os, s_label)
             k.dte.macro(lang, 'operating_system', {'LABEL': s_label})
             # print s_os, s_label
 
-        for res in k.prolog_query("instances_of(wdeProgrammingLanguage1, L), rdfsLabel(L, %s, LABEL)." % lang):
+        query = u', '.join([pl_goal('instances_of', ['wdeProgrammingLanguage1', Var('L')]),
+                            pl_goal('rdfsLabel', [Var('L'), lang, Var('LABEL')])]) + u'.'
+        for res in k.prolog_query(query):
             s_l     = res[0].name
             s_label = res[1].value
             k.dte.ner(lang, 'programming_language', s_l, s_label)
             k.dte.macro(lang, 'programming_language', {'LABEL': s_label})
             # print s_l, s_label
 
-        for res in k.prolog_query("wdpdSubclassOf(HC, wdeHomeComputer), rdfsLabel(HC, %s, LABEL)." % lang):
+        query = u', '.join([pl_goal('wdpdSubclassOf', [Var('HC'), 'wdeHomeComputer']),
+                            pl_goal('rdfsLabel', [Var('HC'), lang, Var('LABEL')])]) + u'.'
+        for res in k.prolog_query(query):
             s_hc    = res[0].name
             s_label = res[1].value
             k.dte.ner(lang, 'home_computer', s_hc, s_label)
             k.dte.macro(lang, 'home_computer', {'LABEL': s_label})
             # print s_hc, s_label
 
-        for res in k.prolog_query("wdpdInstanceOf(HC, wdeHomeComputer), rdfsLabel(HC, %s, LABEL)." % lang):
+        query = u', '.join([pl_goal('wdpdInstanceOf', [Var('HC'), 'wdeHomeComputer']),
+                            pl_goal('rdfsLabel', [Var('HC'), lang, Var('LABEL')])]) + u'.'
+        for res in k.prolog_query(query):
             s_hc    = res[0].name
             s_label = res[1].value
             k.dte.ner(lang, 'home_computer', s_hc, s_label)
@@ -87,8 +97,8 @@ def get_data(k):
         # import pdb; pdb.set_trace()
 
         for entity, score in c.ner(c.lang, 'human', ts, te):
-            if c.kernal.prolog_check('wdpdOccupation(%s, wdeComputerScientist),!.' % entity):
-                if c.kernal.prolog_check('wdpdSexOrGender(%s, wdeMale),!.' % entity):
+            if c.kernal.query_check('wdpdOccupation', [entity, 'wdeComputerScientist']):
+                if c.kernal.query_check('wdpdSexOrGender', [entity, 'wdeMale']):
                     if c.lang=='de':
                         c.resp(u"Ist der nicht Informatiker?", score=score+10, action=act, action_arg=entity)
                     else:
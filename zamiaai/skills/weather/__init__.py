@@ -24,6 +24,7 @@ import json
 
 from datetime             import datetime, timedelta
 from nltools              import misc
+from zamiaai.ai_query     import Var
 
 import weather
 import base
@@ -73,7 +74,7 @@ def fetch_weather_data (c, cdt, loc, ts):
 
     api_key = c.kernal.skill_args['weather_api_key']
 
-    city_id = c.kernal.prolog_query_one('owmCityId(%s, CITY_ID).' % loc)
+    city_id = c.kernal.query_one('owmCityId', [loc, Var('CITY_ID')])
     if not city_id:
         return None
 
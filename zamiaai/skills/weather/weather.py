@@ -17,6 +17,8 @@
 # limitations under the License.
 #
 
+from zamiaai.ai_query import Var, pl_goal
+
 def get_data(k):
     k.dte.set_prefixes([u''])
 
@@ -26,7 +28,9 @@ def get_data(k):
     # NER, macros
 
     for lang in ['en', 'de']:
-        for res in k.prolog_query("owmCityId(LOC, CITYID), rdfsLabel(LOC, %s, LABEL)." % lang):
+        query = u', '.join([pl_goal('owmCityId', [Var('LOC'), Var('CITYID')]),
+                            pl_goal('rdfsLabel', [Var('LOC'), lang, Var('LABEL')])]) + u'.'
+        for res in k.prolog_query(query):
             s_loc   = res[0].name
             s_label = res[2].value
             k.dte.ner(lang, 'weather_location', s_loc, s_label)
@@ -70,7 +74,7 @@ def get_data(k):
 
         for loc, lscore in lss:
 
-            llabel = c.kernal.prolog_query_one('rdfsLabel(%s,%s,L).' % (loc, c.lang))
+            llabel = c.kernal.label(loc, c.lang)
             if not llabel:
                 continue
 
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# Copyright 2018 Guenter Bartsch
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#
+# early stopping and checkpointing for NLPModel / UttClassModel training:
+#
+# <weights>.h5                    best weights so far (by validation loss), what restore() loads
+# <weights>.latest.<epoch>.h5     weights after the last finished epoch
+# <weights>.optimizer.<epoch>.npz optimizer state after the last finished epoch
+# <weights>.state.json            epoch, best loss, epochs without improvement, the epoch also names
+#                                 the two files above
+#
+# so an interrupted (or early stopped) training run can be resumed where it stopped. the state file
+# is written last and replaced atomically, it always points to a complete set of epoch files.
+#
+
+import os
+import json
+import glob
+import logging
+
+import numpy as np
+
+from tensorflow import keras
+
+def _tmp_fn(fn):
+    # keep the extension, keras picks the weights file format by it
+    root, ext = os.path.splitext(fn)
+    return '%s.%d%s' % (root, os.getpid(), ext)
+
+def _epoch_fn(base, kind, epoch, ext):
+    return '%s.%s.%s.%s' % (base, kind, epoch, ext)
+
+class TrainingCheckpoint(keras.callbacks.Callback):
+
+    def __init__(self, weights_fn, patience=0):
+
+        """ weights_fn: where the best weights go, patience: number of epochs without improvement of the
+            validation loss after which training is stopped, 0: never stop early """
+
+        super(TrainingCheckpoint, self).__init__()
+
+        base = weights_fn[:-3] if weights_fn.endswith('.h5') else weights_fn
+
+        self.weights_fn   = weights_fn
+        self.base         = base
+        self.state_fn     = base + '.state.json'
+        self.patience     = patience
+
+        self.state        = {'epoch': 0, 'best_loss': None, 'best_epoch': 0, 'wait': 0}
+
+    def _epoch_fns(self, epoch):
+        return _epoch_fn(self.base, 'latest', epoch, 'h5'), _epoch_fn(self.base, 'optimizer', epoch, 'npz')
+
+    def _load_state(self):
+
+        if not os.path.exists(self.state_fn):
+            return None
+
+        with open(self.state_fn) as f:
+            return json.load(f)
+
+    def can_resume(self):
+
+        state = self._load_state()
+        if not state:
+            return False
+
+        latest_fn, optimizer_fn = self._epoch_fns(state['epoch'])
+
+        return os.path.exists(latest_fn) and os.path.exists(optimizer_fn)
+
+    def resume(self, model, batch):
+
+        """ load weights, optimizer state and training state of the last finished epoch into model (compiled),
+            batch: one training batch (x, y[, sample_weight]) used to build the optimizer,
+            returns the epoch to continue with """
+
+        self.state = self._load_state()
+
+        # early stopped runs continue with a fresh patience
+
+        self.state['wait'] = 0
+
+        latest_fn, optimizer_fn = self._epoch_fns(self.state['epoch'])
+
+        with np.load(optimizer_fn) as f:
+            weights = [f['arr_%d' % i] for i in range(len(f.files))]
+
+        # keras creates the optimizer variables on the first training step, the weights it changes
+        # are replaced by the checkpointed ones right after
+
+        model.train_on_batch(*batch)
+        model.load_weights(latest_fn)
+        model.optimizer.set_weights(weights)
+
+        logging.info('resuming training after epoch %d, best loss so far: %s from epoch %d' %
+                     (self.state['epoch'], self.state['best_loss'], self.state['best_epoch']))
+
+        return self.state['epoch']
+
+    def clear(self):
+
+        """ forget the checkpoint of the previous run (training from scratch or the model changed shape) """
+
+        if os.path.exists(self.state_fn):
+            os.unlink(self.state_fn)
+
+        for fn in glob.glob(_epoch_fn(self.base, 'latest', '*', 'h5')) + glob.glob(_epoch_fn(self.base, 'optimizer', '*', 'npz')):
+            os.unlink(fn)
+
+    def restore_best(self, model):
+        if os.path.exists(self.weights_fn):
+            model.load_weights(self.weights_fn)
+
+    def on_epoch_end(self, epoch, logs=None):
+
+        logs = logs or {}
+
+        # no validation data (tiny corpora): fall back to the training loss
+
+        cur_loss = logs.get('val_loss', logs.get('loss'))
+
+        self.state['epoch'] = epoch + 1
+
+        if self.state['best_loss'] is None or cur_loss < self.state['best_loss']:
+
+            self.state['best_loss']  = float(cur_loss)
+            self.state['best_epoch'] = epoch + 1
+            self.state['wait']       = 0
+
+            tmpfn = _tmp_fn(self.weights_fn)
+            self.model.save_weights(tmpfn)
+            os.rename(tmpfn, self.weights_fn)
+
+            logging.info("%3d *** BEST LOSS SO FAR: %f, weights written to %s" % (epoch+1, cur_loss, self.weights_fn))
+
+        else:
+
+            self.state['wait'] += 1
+
+            logging.info("%3d --- BEST LOSS SO FAR: %f FROM EPOCH %d" % (epoch+1, self.state['best_loss'], self.state['best_epoch']))
+
+            if self.patience and self.state['wait'] >= self.patience:
+                logging.info("no improvement for %d epochs, stopping." % self.state['wait'])
+                self.model.stop_training = True
+
+        # epoch files first, then the state file pointing to them: a run killed while saving
+        # leaves the previous checkpoint intact
+
+        prev_state = self._load_state()
+
+        latest_fn, optimizer_fn = self._epoch_fns(self.state['epoch'])
+
+        latest_tmp    = _tmp_fn(latest_fn)
+        optimizer_tmp = _tmp_fn(optimizer_fn)
+        state_tmp     = _tmp_fn(self.state_fn)
+
+        self.model.save_weights(latest_tmp)
+        os.rename(latest_tmp, latest_fn)
+
+        with open(optimizer_tmp, 'wb') as f:
+            np.savez(f, *self.model.optimizer.get_weights())
+        os.rename(optimizer_tmp, optimizer_fn)
+
+        with open(state_tmp, 'w') as f:
+            json.dump(self.state, f)
+        os.rename(state_tmp, self.state_fn)
+
+        if prev_state and prev_state['epoch'] != self.state['epoch']:
+            for fn in self._epoch_fns(prev_state['epoch']):
+                if os.path.exists(fn):
+                    os.unlink(fn)
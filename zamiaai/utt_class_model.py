@@ -44,17 +44,21 @@ import tensorflow as tf
 
 from tensorflow        import keras
 from time              import time
-from random            import randint, shuffle
+from random            import randint, Random
 from copy              import deepcopy
 
 import model
 
 from nltools.tokenizer import tokenize
 from nltools.misc      import mkdirs
+from word_embeddings   import load_word_embeddings
+from train_checkpoint  import TrainingCheckpoint
 
 DEBUG_LIMIT                = 0
 # DEBUG_LIMIT                = 1000
 
+TRAINING_DATA_SEED         = 42
+
 class UttClassModel(object):
 
     def __init__(self, lang, session, model_args ):
@@ -68,32 +72,15 @@ class UttClassModel(object):
         self.batch_size      = model_args['batch_size']
         self.optimizer       = model_args['optimizer']
         self.dropout         = model_args['dropout']
+        self.patience        = model_args['patience']
 
         self.weights_fn      = '%s/utt_class_weights.h5' % (self.model_dir)
         self.skills_dict_fn  = '%s/skills.csv' % (self.model_dir)
 
     def _load_word_embeddings(self):
 
-        embdfn = '%s/word_embeddings.vec' % self.model_dir
-        logging.info('loading word embeddings from %s ...' % embdfn)
-
-        self.embedding_dict = {}
-        self.embed_dim      = 0
-
-        with codecs.open(embdfn, encoding='utf-8') as embdf:
-            first_line = True
-            for line in embdf:
-                if first_line:
-                    first_line = False
-                    continue
-                values = line.rstrip().rsplit(' ')
-                word = values[0]
-                coefs = np.asarray(values[1:], dtype='float32')
-                self.embedding_dict[word] = coefs
-                if not self.embed_dim: 
-                    self.embed_dim = coefs.shape[0]
-        nb_words = len(self.embedding_dict)
-        logging.info('found %s word vectors of dimension %d.' % (nb_words, self.embed_dim))
+        self.embedding_dict = load_word_embeddings(self.model_dir)
+        self.embed_dim      = self.embedding_dict.embed_dim
 
     def _compute_skills_dict(self):
 
@@ -221,7 +208,7 @@ class UttClassModel(object):
 
         self.drs = {} 
         self.training_data = []
-        for dr in self.session.query(model.TrainingData).filter(model.TrainingData.lang==self.lang):
+        for dr in self.session.query(model.TrainingData).filter(model.TrainingData.lang==self.lang).order_by(model.TrainingData.id):
 
             self.drs[dr.inp] = dr.skill
             self.training_data.append((tokenize(dr.inp, lang=self.lang), dr.skill))
@@ -230,7 +217,9 @@ class UttClassModel(object):
                 logging.warn('  stopped loading discourses because DEBUG_LIMIT of %d was reached.' % DEBUG_LIMIT)
                 break
 
-        shuffle(self.training_data)
+        # fixed seed: the validation split has to stay the same when training is resumed
+
+        Random(TRAINING_DATA_SEED).shuffle(self.training_data)
  
         #
         # set up model dir
@@ -293,11 +282,28 @@ class UttClassModel(object):
 
         self._create_keras_model()
 
-        self.keras_model_train.fit([encoder_input_data], decoder_target_data,
-                                   batch_size=self.batch_size,
-                                   epochs=num_epochs,
-                                   validation_split=0.2)
+        checkpoint    = TrainingCheckpoint(self.weights_fn, self.patience)
+        initial_epoch = 0
+
+        if incremental:
+            if checkpoint.can_resume():
+                initial_epoch = checkpoint.resume(self.keras_model_train,
+                                                  ([encoder_input_data[:1]], decoder_target_data[:1]))
+            else:
+                self.keras_model_train.load_weights(self.weights_fn)
+        else:
+            checkpoint.clear()
+
+        if initial_epoch < num_epochs:
+            self.keras_model_train.fit([encoder_input_data], decoder_target_data,
+                                       batch_size=self.batch_size,
+                                       epochs=num_epochs,
+                                       initial_epoch=initial_epoch,
+                                       callbacks=[checkpoint],
+                                       validation_split=0.2)
+        else:
+            logging.info("%d epochs already trained." % initial_epoch)
 
-        self.keras_model_train.save_weights(self.weights_fn)
+        checkpoint.restore_best(self.keras_model_train)
 
-        logging.info("weights written to %s ." % self.weights_fn)
+        logging.info("best weights (epoch %d) in %s ." % (checkpoint.state['best_epoch'], self.weights_fn))
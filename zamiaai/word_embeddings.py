@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# Copyright 2018 Guenter Bartsch
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#
+# binary word embedding store: word_embeddings.vec (fastText text format) is converted
+# once into word_embeddings.npy (contiguous float32 matrix, memory mapped on load, so
+# its pages are shared between models and forked worker processes) plus
+# word_embeddings.vocab (one word per line, in matrix row order)
+#
+# optionally, a pruned store restricted to the training data vocabulary (plus the most
+# frequent words) is built into word_embeddings.pruned.{npy,vocab} and preferred on load
+#
+
+import io
+import os
+import codecs
+import logging
+
+import numpy as np
+
+from time import time
+
+EMBEDDINGS_BASENAME = 'word_embeddings'
+PRUNED_SUFFIX       = '.pruned'
+
+class WordEmbeddings(object):
+
+    """ word -> float32 vector lookup, supports the dict subset NLPModel and UttClassModel use.
+        fallback_dir: words missing from a pruned store are looked up in the full binary store
+        of this model dir (loaded on the first miss, if it exists there - the fallback never
+        converts a .vec file, that is left to zaicli embeddings) """
+
+    def __init__(self, vocab, matrix, fallback_dir=None):
+        self.vocab        = vocab   # word -> row
+        self.matrix       = matrix
+        self.embed_dim    = matrix.shape[1]
+        self.fallback_dir = fallback_dir
+        self.full         = None
+
+    def _full_store(self):
+
+        if self.fallback_dir:
+            base = os.path.join(self.fallback_dir, EMBEDDINGS_BASENAME)
+            if os.path.exists(base + '.npy') and os.path.exists(base + '.vocab'):
+                logging.info('word embeddings: OOV word, falling back to full store in %s' % self.fallback_dir)
+                self.full = load_word_embeddings(self.fallback_dir, pruned=False, convert=False)
+            else:
+                logging.warn('word embeddings: no full binary store in %s, words missing from the pruned store are OOV.' % self.fallback_dir)
+            self.fallback_dir = None
+
+        return self.full
+
+    def __contains__(self, word):
+        if word in self.vocab:
+            return True
+        full = self._full_store()
+        return full is not None and word in full
+
+    def __getitem__(self, word):
+        i = self.vocab.get(word)
+        if i is None:
+            full = self._full_store()
+            if full is None:
+                raise KeyError(word)
+            return full[word]
+        return self.matrix[i]
+
+    def __len__(self):
+        return len(self.vocab)
+
+    def get(self, word, default=None):
+        if not word in self:
+            return default
+        return self[word]
+
+def _write_store(npyfn, vocabfn, matrix, words):
+
+    # write under temporary names first so concurrently starting workers never see partial files
+
+    pid = os.getpid()
+
+    with open('%s.%d' % (npyfn, pid), 'wb') as f:
+        np.save(f, matrix)
+
+    # io with newline='\n': codecs would also split lines on unicode line separators
+
+    with io.open('%s.%d' % (vocabfn, pid), 'w', encoding='utf8', newline='\n') as f:
+        for word in words:
+            f.write(u'%s\n' % word)
+
+    os.rename('%s.%d' % (vocabfn, pid), vocabfn)
+    os.rename('%s.%d' % (npyfn, pid), npyfn)
+
+def convert_vec(vecfn, npyfn, vocabfn):
+
+    """ fastText .vec -> .npy matrix + .vocab file """
+
+    logging.info('converting word embeddings %s -> %s ...' % (vecfn, npyfn))
+    t0 = time()
+
+    with codecs.open(vecfn, encoding='utf-8') as embdf:
+
+        num_words, embed_dim = [int(n) for n in embdf.readline().split()]
+
+        matrix = np.zeros((num_words, embed_dim), dtype='float32')
+        words  = []
+
+        for line in embdf:
+            values = line.rstrip().rsplit(' ')
+            if len(values) != embed_dim + 1:
+                continue
+            matrix[len(words)] = np.asarray(values[1:], dtype='float32')
+            words.append(values[0])
+
+    _write_store(npyfn, vocabfn, matrix[:len(words)], words)
+
+    logging.info('converting word embeddings done. %d words of dimension %d, %.1fs.' % (len(words), embed_dim, time()-t0))
+
+def load_vocab(vocabfn):
+    with io.open(vocabfn, 'r', encoding='utf8', newline='\n') as f:
+        return dict((word.rstrip(u'\n'), i) for i, word in enumerate(f))
+
+# abspath of npy file -> WordEmbeddings, so models of one process share a single copy
+
+_loaded = {}
+
+def load_word_embeddings(model_dir, pruned=True, convert=True):
+
+    """ load the word embeddings of model_dir: the pruned store if there is one (and pruned is set),
+        the full store otherwise, converting word_embeddings.vec to the binary format first if needed
+        (and convert is set) """
+
+    base    = os.path.abspath(os.path.join(model_dir, EMBEDDINGS_BASENAME))
+    vecfn   = base + '.vec'
+    npyfn   = base + '.npy'
+    vocabfn = base + '.vocab'
+
+    fallback_dir = None
+    if pruned and os.path.exists(base + PRUNED_SUFFIX + '.npy'):
+        npyfn        = base + PRUNED_SUFFIX + '.npy'
+        vocabfn      = base + PRUNED_SUFFIX + '.vocab'
+        fallback_dir = model_dir
+
+    if npyfn in _loaded:
+        return _loaded[npyfn]
+
+    if convert and not fallback_dir and (not os.path.exists(npyfn) or (os.path.exists(vecfn) and os.path.getmtime(vecfn) > os.path.getmtime(npyfn))):
+        convert_vec(vecfn, npyfn, vocabfn)
+
+    t0 = time()
+
+    embeddings = WordEmbeddings(load_vocab(vocabfn), np.load(npyfn, mmap_mode='r'), fallback_dir=fallback_dir)
+
+    logging.info('loaded %d word vectors of dimension %d from %s in %.2fs.' % (len(embeddings), embeddings.embed_dim, npyfn, time()-t0))
+
+    _loaded[npyfn] = embeddings
+
+    return embeddings
+
+def build_pruned_embeddings(model_dir, words, num_extra=0):
+
+    """ write the pruned store of model_dir: vectors of words plus those of the num_extra most
+        frequent words of the full store (fastText sorts its vocabulary by frequency).
+        returns (number of words in the pruned store, number of words not found) """
+
+    full = load_word_embeddings(model_dir, pruned=False)
+
+    selected = {} # row -> word
+    num_oov  = 0
+    for word in words:
+        i = full.vocab.get(word)
+        if i is None:
+            num_oov += 1
+        else:
+            selected[i] = word
+
+    if num_extra:
+        for word, i in full.vocab.items():
+            if i < num_extra:
+                selected[i] = word
+
+    rows = sorted(selected)
+
+    base = os.path.abspath(os.path.join(model_dir, EMBEDDINGS_BASENAME)) + PRUNED_SUFFIX
+    _write_store(base + '.npy', base + '.vocab', full.matrix[rows], [selected[i] for i in rows])
+
+    _loaded.pop(base + '.npy', None)
+
+    logging.info('%s.npy written: %d of %d words.' % (base, len(rows), len(full)))
+
+    return len(rows), num_oov
+